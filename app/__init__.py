@@ -4,86 +4,122 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from config import config
+from app.utils.db_routing import RoutingSession, REPLICA_BIND
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
 
-def create_app(config_name='development'):
+def create_app(config_name='development', config_overrides=None):
     """Factory para crear la aplicación Flask"""
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     
+    # Permite ajustar la configuración (tests, benchmarks) sin nuevas clases
+    if config_overrides:
+        app.config.update(config_overrides)
+    
+    # IP y esquema reales del cliente detrás de proxies de confianza
+    if app.config['PROXY_FIX_X_FOR'] or app.config['PROXY_FIX_X_PROTO']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(
+            app.wsgi_app,
+            x_for=app.config['PROXY_FIX_X_FOR'],
+            x_proto=app.config['PROXY_FIX_X_PROTO']
+        )
+    
+    from app.utils.structured_logging import init_logging
+    init_logging(app)
+    
     # Inicializar extensiones
+    from app.utils.db_pool import use_instrumented_pool, instrument_engine
+    from app.utils.sqlite_mode import configure_sqlite_mode, apply_sqlite_pragmas
+    from app.utils.db_routing import init_read_routing
+    from app.utils.metrics import init_metrics, instrument_queries
+    from app.utils.profiling import init_profiling
+    from app.utils.query_inspector import init_query_inspector, instrument_query_inspector
+    use_instrumented_pool(app)
+    init_read_routing(app)
+    configure_sqlite_mode(app)
     db.init_app(app)
     jwt.init_app(app)
+    init_metrics(app)
+    init_profiling(app)
+    init_query_inspector(app)
+    
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            instrument_engine(engine)
+            instrument_queries(engine)
+            instrument_query_inspector(engine)
+            apply_sqlite_pragmas(app, engine, read_only=bind_key == REPLICA_BIND)
+    
+    from app.utils.hashing import password_hasher
+    password_hasher.init_app(app)
+    
+    from app.utils.rate_limit import init_rate_limiter
+    init_rate_limiter(app)
+    
+    from app.utils.cache import TTLCache
+    app.extensions['user_cache'] = TTLCache(
+        maxsize=app.config['USER_CACHE_SIZE'],
+        ttl=app.config['USER_CACHE_TTL']
+    )
+    app.extensions['tmdb_details_cache'] = TTLCache(
+        maxsize=app.config['TMDB_DETAILS_CACHE_SIZE'],
+        ttl=app.config['TMDB_DETAILS_CACHE_TTL']
+    )
+    
+    from app.services.token_service import TokenService
+    TokenService.init_app(app)
+    
+    from app.services.poster_service import PosterService
+    PosterService.init_app(app)
+    
+    from app.services.idempotency_service import IdempotencyService
+    IdempotencyService.init_app(app)
+    
+    from app.services.feed_service import FeedService
+    FeedService.init_app(app)
+    
+    from app.utils.jobs import init_jobs
+    init_jobs(app)
+    
+    from app.utils.admission import init_admission
+    init_admission(app)
+    
     CORS(app, origins=app.config['CORS_ORIGINS'].split(','))
     
+    from app.middleware import CompressionHandler, RequestLogger
+    CompressionHandler.setup_compression(app)
+    # Después de la compresión: sus after_request corren antes y ven el cuerpo original
+    RequestLogger.log_request(app)
+    
     # Registrar blueprints
     from app.routes.auth import auth_bp
     from app.routes.movies import movies_bp
+    from app.routes.internal import internal_bp
+    from app.routes.posters import posters_bp
+    from app.routes.collections import collections_bp
+    from app.routes.activity import activity_bp
+    from app.routes.social import social_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(movies_bp, url_prefix='/api/movies')
+    app.register_blueprint(internal_bp, url_prefix='/api/internal')
+    app.register_blueprint(posters_bp, url_prefix='/api/posters')
+    app.register_blueprint(collections_bp, url_prefix='/api/collections')
+    app.register_blueprint(activity_bp, url_prefix='/api')
+    app.register_blueprint(social_bp, url_prefix='/api')
     
-    # Crear tablas
-    with app.app_context():
-        db.create_all()
+    # Comandos de CLI (flask migrate, ...)
+    from app.cli import register_commands
+    register_commands(app)
+    
+    # Crear tablas solo si está habilitado; en producción se usa `flask migrate`
+    # (la réplica recibe el esquema por replicación)
+    if app.config['DB_CREATE_ALL_ON_STARTUP']:
+        with app.app_context():
+            db.create_all(bind_key=None)
     
     return app
 
-# app/models/__init__.py
-from app.models.user import User
-from app.models.movie import Movie
-
-__all__ = ['User', 'Movie']
-
-# app/routes/__init__.py
-from app.routes.auth import auth_bp
-from app.routes.movies import movies_bp
-
-__all__ = ['auth_bp', 'movies_bp']
-
-# app/schemas/__init__.py
-from app.schemas.user_schema import (
-    UserRegisterSchema,
-    UserLoginSchema,
-    UserResponseSchema
-)
-from app.schemas.movie_schema import (
-    MovieCreateSchema,
-    MovieResponseSchema
-)
-
-__all__ = [
-    'UserRegisterSchema',
-    'UserLoginSchema',
-    'UserResponseSchema',
-    'MovieCreateSchema',
-    'MovieResponseSchema'
-]
-
-# app/services/__init__.py
-from app.services.auth_service import AuthService
-from app.services.movie_service import MovieService
-from app.services.tmdb_service import TMDbService
-
-__all__ = ['AuthService', 'MovieService', 'TMDbService']
-
-# app/utils/__init__.py
-from app.utils.utils import (
-    Response,
-    Pagination,
-    handle_errors,
-    validate_request_data,
-    require_auth,
-    ensure_json_content_type
-)
-
-__all__ = [
-    'Response',
-    'Pagination',
-    'handle_errors',
-    'validate_request_data',
-    'require_auth',
-    'ensure_json_content_type'
-]
\ No newline at end of file
@@ -0,0 +1,196 @@
+import click
+from sqlalchemy import UniqueConstraint, inspect
+from sqlalchemy.schema import AddConstraint, CreateColumn, CreateTable
+from app import db
+
+
+def add_missing_columns(engine, metadata):
+    """
+    create_all no modifica tablas existentes: agregar con ALTER TABLE las
+    columnas nuevas que tengan server_default (las filas existentes toman
+    ese valor) o admitan nulos. Retorna los nombres "tabla.columna" agregados.
+    """
+    inspector = inspect(engine)
+    added = []
+    
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if column.server_default is None and not column.nullable:
+                    # NOT NULL sin default: las filas existentes no tendrían valor
+                    continue
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {ddl}')
+                added.append(f'{table.name}.{column.name}')
+    
+    return added
+
+
+def add_missing_indexes(engine, metadata):
+    """
+    create_all tampoco agrega índices a tablas existentes: crear los
+    declarados en los modelos que falten. Retorna sus nombres.
+    """
+    inspector = inspect(engine)
+    created = []
+    
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+                created.append(index.name)
+    
+    return created
+
+
+def sync_unique_constraints(engine, metadata):
+    """
+    create_all tampoco cambia las restricciones UNIQUE de tablas existentes:
+    crear las declaradas que falten y quitar las que el modelo ya no tiene
+    (p. ej. UNIQUE (imdb_id), hoy único por usuario). SQLite no altera
+    restricciones, así que ahí la tabla se reconstruye. Retorna los cambios
+    como "tabla: +UNIQUE (columnas)" / "tabla: -UNIQUE (columnas)".
+    """
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    changes = []
+    
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        
+        declared = {
+            frozenset(constraint.columns.keys()): constraint
+            for constraint in table.constraints if isinstance(constraint, UniqueConstraint)
+        }
+        declared_indexes = {frozenset(index.columns.keys()) for index in table.indexes if index.unique}
+        reflected = {
+            frozenset(unique['column_names']): unique['name']
+            for unique in inspector.get_unique_constraints(table.name)
+        }
+        reflected_indexes = {
+            frozenset(index['column_names'])
+            for index in inspector.get_indexes(table.name) if index['unique']
+        }
+        
+        stale = {
+            columns: name for columns, name in reflected.items()
+            if columns not in declared and columns not in declared_indexes
+        }
+        missing = {
+            columns: constraint for columns, constraint in declared.items()
+            if columns not in reflected and columns not in reflected_indexes
+        }
+        if not stale and not missing:
+            continue
+        
+        if engine.dialect.name == 'sqlite':
+            _rebuild_sqlite_table(engine, table, inspector)
+        else:
+            with engine.begin() as conn:
+                for name in stale.values():
+                    conn.exec_driver_sql(
+                        f'ALTER TABLE {preparer.format_table(table)} DROP CONSTRAINT {preparer.quote(name)}'
+                    )
+                for constraint in missing.values():
+                    conn.execute(AddConstraint(constraint))
+        
+        changes += [f"{table.name}: -UNIQUE ({', '.join(sorted(columns))})" for columns in stale]
+        changes += [f"{table.name}: +UNIQUE ({', '.join(sorted(columns))})" for columns in missing]
+    
+    return changes
+
+
+def _rebuild_sqlite_table(engine, table, inspector):
+    """
+    Reemplazar una tabla de SQLite por una con el esquema del modelo:
+    crearla con otro nombre, copiar las filas, borrar la vieja y renombrar
+    (el orden que recomienda SQLite para no tocar las claves foráneas de
+    otras tablas). Los índices se recrean desde el modelo.
+    """
+    existing = {column['name'] for column in inspector.get_columns(table.name)}
+    dropped = existing - set(table.columns.keys())
+    if dropped:
+        raise click.ClickException(
+            f"{table.name}: columnas fuera del modelo ({', '.join(sorted(dropped))}), "
+            'no se reconstruye la tabla'
+        )
+    
+    name = table.name
+    new_name = f'_{name}_rebuild'
+    ddl = str(CreateTable(table).compile(dialect=engine.dialect))
+    ddl = ddl.replace(f'CREATE TABLE {name} (', f'CREATE TABLE {new_name} (', 1)
+    columns = ', '.join(column.name for column in table.columns if column.name in existing)
+    
+    with engine.connect() as conn:
+        foreign_keys = conn.exec_driver_sql('PRAGMA foreign_keys').scalar()
+        conn.exec_driver_sql('PRAGMA foreign_keys = OFF')
+        try:
+            # BEGIN explícito: pysqlite no abre la transacción antes de un DDL
+            conn.exec_driver_sql('BEGIN')
+            conn.exec_driver_sql(f'DROP TABLE IF EXISTS {new_name}')
+            conn.exec_driver_sql(ddl)
+            conn.exec_driver_sql(f'INSERT INTO {new_name} ({columns}) SELECT {columns} FROM {name}')
+            conn.exec_driver_sql(f'DROP TABLE {name}')
+            conn.exec_driver_sql(f'ALTER TABLE {new_name} RENAME TO {name}')
+            for index in table.indexes:
+                index.create(bind=conn)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.exec_driver_sql(f"PRAGMA foreign_keys = {'ON' if foreign_keys else 'OFF'}")
+            conn.commit()
+
+
+def register_commands(app):
+    """Registrar comandos de CLI de la aplicación"""
+    
+    @app.cli.command('migrate')
+    def migrate():
+        """Crear las tablas y columnas que falten en la base de datos"""
+        import app.models  # noqa: F401  (registra todos los modelos)
+        
+        for name in add_missing_columns(db.engine, db.metadata):
+            click.echo(f'Columna agregada: {name}')
+        for change in sync_unique_constraints(db.engine, db.metadata):
+            click.echo(f'Restricción actualizada: {change}')
+        for name in add_missing_indexes(db.engine, db.metadata):
+            click.echo(f'Índice creado: {name}')
+        db.create_all(bind_key=None)
+        click.echo('Esquema de base de datos actualizado')
+    
+    @app.cli.command('reconcile-stats')
+    def reconcile_stats():
+        """Reconstruir los agregados por título desde ratings y watch_events"""
+        from app.services.activity_service import ActivityService
+        
+        fixed = ActivityService.reconcile()
+        click.echo(f'Títulos corregidos: {fixed}')
+    
+    @app.cli.command('purge-idempotency-keys')
+    def purge_idempotency_keys():
+        """Borrar las claves de idempotencia expiradas"""
+        from app.services.idempotency_service import IdempotencyService
+        
+        deleted = IdempotencyService.purge_expired()
+        click.echo(f'Claves eliminadas: {deleted}')
+    
+    @app.cli.command('repair-feed')
+    def repair_feed():
+        """Repetir los fan-outs y backfills del feed que no terminaron"""
+        from app.services.feed_service import FeedService
+        
+        movies, follows = FeedService.repair()
+        click.echo(f'Fan-outs repetidos: {movies}, backfills repetidos: {follows}')
@@ -1,7 +1,22 @@
+import gzip
+import hashlib
+import json
+import logging
+import random
+import time
+import zlib
 from functools import wraps
-from flask import request, jsonify
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
-from app.models import User
+from flask import request, jsonify, current_app, make_response, g, Response
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
+from app.services.auth_service import AuthService
+from app.services.idempotency_service import IdempotencyService
+from app.utils.rate_limit import get_rate_limit_store
+from app.utils.structured_logging import get_request_id
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se ofrece gzip
+    brotli = None
 
 def token_required(f):
     """
@@ -14,8 +29,8 @@ def token_required(f):
             verify_jwt_in_request()
             user_id = get_jwt_identity()
             
-            # Verificar que el usuario existe
-            user = User.query.get(user_id)
+            # Verificar que el usuario existe (caché por proceso o claims del JWT)
+            user = AuthService.resolve_user(user_id, get_jwt())
             if not user:
                 return jsonify({'error': 'Usuario no encontrado'}), 404
             
@@ -29,10 +44,14 @@ def token_required(f):
     
     return decorated
 
+def is_admin(user):
+    """Un usuario es administrador si su email está en ADMIN_EMAILS"""
+    return user.email in current_app.config.get('ADMIN_EMAILS', ())
+
 def admin_required(f):
     """
     Decorador para verificar que el usuario sea administrador.
-    Requiere que el usuario tenga un rol 'admin'.
+    Requiere que el email del usuario esté en ADMIN_EMAILS.
     """
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -40,13 +59,13 @@ def admin_required(f):
             verify_jwt_in_request()
             user_id = get_jwt_identity()
             
-            user = User.query.get(user_id)
+            user = AuthService.resolve_user(user_id, get_jwt())
             if not user:
                 return jsonify({'error': 'Usuario no encontrado'}), 404
             
-            # Verificar si el usuario es admin (opcional, según tus requisitos)
-            # if not user.is_admin:
-            #     return jsonify({'error': 'Se requieren permisos de administrador'}), 403
+            # Verificar si el usuario es admin (emails listados en ADMIN_EMAILS)
+            if not is_admin(user):
+                return jsonify({'error': 'Se requieren permisos de administrador'}), 403
             
             request.current_user = user
             
@@ -75,11 +94,29 @@ def validate_json(f):
     
     return decorated
 
+def _rate_limit_identity():
+    """Clave del cliente: id de usuario si hay un JWT válido, si no la IP"""
+    try:
+        verify_jwt_in_request(optional=True)
+        user_id = get_jwt_identity()
+    except Exception:
+        user_id = None
+    
+    if user_id is not None:
+        return f'user:{user_id}'
+    
+    return f'ip:{request.remote_addr}'
+
 def rate_limit(max_requests=100, window=3600):
     """
     Decorador para limitar el número de requests por usuario en una ventana de tiempo.
     Útil para prevenir abuso de API.
     
+    Usa GCRA (ventana deslizante con un solo valor guardado por clave) sobre el
+    almacenamiento configurado en RATELIMIT_STORAGE_URL. La clave es el usuario
+    del JWT o, si no hay token, la IP del cliente (tomada de X-Forwarded-For
+    si PROXY_FIX_X_FOR confía en los proxies delante de la app).
+    
     Parámetros:
     - max_requests: número máximo de requests permitidos
     - window: ventana de tiempo en segundos (default 1 hora)
@@ -87,35 +124,202 @@ def rate_limit(max_requests=100, window=3600):
     def decorator(f):
         @wraps(f)
         def decorated(*args, **kwargs):
-            # Para implementación completa, necesitarías usar Redis o similar
-            # Por ahora es un ejemplo básico
-            return f(*args, **kwargs)
+            if not current_app.config.get('RATELIMIT_ENABLED', True):
+                return current_app.ensure_sync(f)(*args, **kwargs)
+            
+            key = f'{request.endpoint}:{_rate_limit_identity()}'
+            result = get_rate_limit_store().hit(key, max_requests, window)
+            
+            if not result.allowed:
+                response = jsonify({
+                    'success': False,
+                    'error': 'Demasiadas solicitudes, intenta más tarde'
+                })
+                response.status_code = 429
+            else:
+                response = make_response(current_app.ensure_sync(f)(*args, **kwargs))
+            
+            response.headers.update(result.headers())
+            return response
         
         return decorated
     
     return decorator
 
+# Headers de la respuesta original que se repiten al reproducirla
+IDEMPOTENCY_REPLAY_HEADERS = ('Content-Type', 'ETag', 'Location')
+
+def _idempotency_scope():
+    """Dueño de la clave: el usuario del JWT o `anon` (registro)"""
+    try:
+        verify_jwt_in_request(optional=True)
+        user_id = get_jwt_identity()
+    except Exception:
+        user_id = None
+    
+    return f'user:{user_id}' if user_id is not None else 'anon'
+
+def _idempotency_error(message, status_code):
+    response = jsonify({
+        'success': False,
+        'error': message
+    })
+    response.status_code = status_code
+    return response
+
+def idempotent(f):
+    """
+    Decorador para POST que acepta el header Idempotency-Key.
+    
+    La primera respuesta de cada (usuario, clave) se guarda durante
+    IDEMPOTENCY_TTL segundos y los reintentos la reciben tal cual (con
+    `Idempotent-Replayed: true`) sin volver a ejecutar la vista. Un
+    duplicado que llega mientras el primero sigue en curso espera hasta
+    IDEMPOTENCY_WAIT_TIMEOUT segundos; luego responde 409. Si el primero
+    no termina en IDEMPOTENCY_LOCK_TIMEOUT segundos (su worker murió) un
+    reintento toma su lugar. Las respuestas
+    5xx y 429 no se guardan: el reintento vuelve a ejecutarse. Reutilizar la
+    clave con otro cuerpo responde 422.
+    
+    Va después de jwt_required y antes de rate_limit (las reproducciones no
+    consumen cuota).
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        config = current_app.config
+        
+        if not key or not config['IDEMPOTENCY_ENABLED']:
+            return current_app.ensure_sync(f)(*args, **kwargs)
+        
+        if len(key) > 255:
+            return _idempotency_error('Idempotency-Key demasiado larga (máximo 255 caracteres)', 400)
+        
+        scope = _idempotency_scope()
+        fingerprint = IdempotencyService.fingerprint(request.method, request.path, request.get_data())
+        IdempotencyService.schedule_purge()
+        deadline = time.monotonic() + config['IDEMPOTENCY_WAIT_TIMEOUT']
+        
+        while True:
+            record, created = IdempotencyService.begin(scope, key, fingerprint)
+            if created:
+                break
+            
+            if record.fingerprint != fingerprint:
+                return _idempotency_error('Idempotency-Key ya usada con otro request', 422)
+            
+            if not record.completed:
+                record = IdempotencyService.wait(scope, key, deadline)
+                if record is None or IdempotencyService.lease_expired(record):
+                    # El primer request falló y liberó la clave, o su worker
+                    # murió: ejecutar este
+                    continue
+                if not record.completed:
+                    response = _idempotency_error('Un request con esta Idempotency-Key sigue en curso', 409)
+                    response.headers['Retry-After'] = '1'
+                    return response
+            
+            response = Response(
+                record.response_body,
+                status=record.status_code,
+                headers=json.loads(record.response_headers or '{}')
+            )
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        
+        record_id, locked_until = record.id, record.locked_until
+        try:
+            response = make_response(current_app.ensure_sync(f)(*args, **kwargs))
+        except Exception:
+            IdempotencyService.release(record_id, locked_until)
+            raise
+        
+        if response.status_code >= 500 or response.status_code == 429:
+            IdempotencyService.release(record_id, locked_until)
+        else:
+            IdempotencyService.complete(record_id, locked_until, response, IDEMPOTENCY_REPLAY_HEADERS)
+        
+        return response
+    
+    return decorated
+
 class RequestLogger:
     """
-    Middleware para registrar todos los requests y responses de la API.
-    Útil para debugging y auditoría.
+    Middleware para registrar los requests de la API (auditoría).
+    
+    Cada request recibe un id (X-Request-ID del cliente o uno nuevo) que se
+    devuelve en la respuesta y acompaña a todos los logs emitidos durante
+    el request. Se registra una línea JSON en el logger `app.requests` para
+    una muestra de LOG_SAMPLE_RATE requests (y siempre para errores 5xx);
+    los cuerpos solo con LOG_BODIES y truncados a LOG_BODY_MAX_BYTES.
     """
     
     @staticmethod
     def log_request(app):
         """
-        Registra información de cada request en los logs.
+        Registra los hooks de logging de requests.
         """
+        logger = logging.getLogger(f'{app.logger.name}.requests')
+        config = app.config
+        
         @app.before_request
-        def log_request_info():
-            app.logger.debug(f'Headers: {dict(request.headers)}')
-            app.logger.debug(f'Body: {request.get_data()}')
+        def start_request_log():
+            g.pop('request_id', None)
+            get_request_id()
+            g.log_start = time.perf_counter()
         
         @app.after_request
         def log_response_info(response):
-            app.logger.debug(f'Status: {response.status}')
-            app.logger.debug(f'Response: {response.get_data()}')
+            response.headers['X-Request-ID'] = get_request_id()
+            
+            start = g.pop('log_start', None)
+            if start is None or not logger.isEnabledFor(logging.INFO):
+                return response
+            
+            sampled = random.random() < config['LOG_SAMPLE_RATE']
+            if not sampled and response.status_code < 500:
+                return response
+            
+            fields = {
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                'user_id': RequestLogger._user_id(),
+                'remote_addr': request.remote_addr,
+                'user_agent': request.user_agent.string or None,
+                'response_size': response.content_length,
+                'sql_queries': g.get('sql_queries'),
+                'sql_ms': round(g.sql_seconds * 1000, 3) if 'sql_seconds' in g else None
+            }
+            
+            if config['LOG_BODIES']:
+                limit = config['LOG_BODY_MAX_BYTES']
+                fields['request_body'] = RequestLogger._truncate(request.get_data(cache=True), limit)
+                if response.is_streamed or response.direct_passthrough:
+                    # No consumir el stream: se enviaría vacío al cliente
+                    fields['response_body'] = '<stream>'
+                else:
+                    fields['response_body'] = RequestLogger._truncate(response.get_data(), limit)
+            
+            logger.info('request', extra=fields)
             return response
+    
+    @staticmethod
+    def _user_id():
+        """Identidad del JWT si la vista lo verificó"""
+        try:
+            return get_jwt_identity()
+        except RuntimeError:
+            return None
+    
+    @staticmethod
+    def _truncate(data, limit):
+        text = data[:limit].decode('utf-8', errors='replace')
+        if len(data) > limit:
+            text += f'... ({len(data)} bytes)'
+        return text
 
 class CORSHandler:
     """
@@ -192,4 +396,117 @@ class ErrorHandler:
             return jsonify({
                 'error': 'Error interno del servidor',
                 'status': 500
-            }), 500
\ No newline at end of file
+            }), 500
+
+class CompressionHandler:
+    """
+    Middleware de compresión de respuestas (gzip y brotli).
+    
+    Negocia la codificación con Accept-Encoding, no comprime cuerpos menores
+    a COMPRESS_MIN_SIZE y guarda los bytes comprimidos de respuestas GET
+    indexados por el hash del cuerpo, así un payload que se repite (p. ej.
+    la misma biblioteca) no se vuelve a comprimir. Las respuestas en
+    streaming se comprimen por chunks.
+    """
+    
+    @staticmethod
+    def setup_compression(app):
+        """
+        Registra el hook de compresión si COMPRESS_ENABLED está activo.
+        """
+        if not app.config['COMPRESS_ENABLED']:
+            return
+        
+        from app.utils.cache import TTLCache
+        app.extensions['compression_cache'] = TTLCache(
+            maxsize=app.config['COMPRESS_CACHE_SIZE'],
+            ttl=app.config['COMPRESS_CACHE_TTL']
+        )
+        
+        @app.after_request
+        def compress_response(response):
+            return CompressionHandler.compress(response)
+    
+    @staticmethod
+    def choose_encoding(accept_encodings):
+        """Codificación preferida por el cliente entre las soportadas"""
+        candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+        best = max(candidates, key=lambda encoding: accept_encodings.quality(encoding))
+        return best if accept_encodings.quality(best) > 0 else None
+    
+    @staticmethod
+    def _compressible(response):
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return False
+        return response.mimetype in current_app.config['COMPRESS_MIMETYPES']
+    
+    @staticmethod
+    def compress(response):
+        """Comprimir la respuesta si corresponde"""
+        if not CompressionHandler._compressible(response):
+            return response
+        
+        # El resultado depende de Accept-Encoding aunque no se comprima
+        response.vary.add('Accept-Encoding')
+        
+        encoding = CompressionHandler.choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        
+        config = current_app.config
+        
+        if response.is_streamed:
+            response.response = CompressionHandler._compress_stream(
+                response.response, encoding, config
+            )
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < config['COMPRESS_MIN_SIZE']:
+                return response
+            
+            if request.method == 'GET':
+                cache = current_app.extensions['compression_cache']
+                key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+                data = cache.get(key)
+                if data is None:
+                    data = CompressionHandler._compress_bytes(body, encoding, config)
+                    cache.set(key, data)
+            else:
+                data = CompressionHandler._compress_bytes(body, encoding, config)
+            
+            response.set_data(data)
+        
+        response.headers['Content-Encoding'] = encoding
+        return response
+    
+    @staticmethod
+    def _compress_bytes(body, encoding, config):
+        if encoding == 'br':
+            return brotli.compress(body, quality=config['COMPRESS_BROTLI_QUALITY'])
+        return gzip.compress(body, compresslevel=config['COMPRESS_LEVEL'], mtime=0)
+    
+    @staticmethod
+    def _compress_stream(chunks, encoding, config):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=config['COMPRESS_BROTLI_QUALITY'])
+            compress, flush = compressor.process, compressor.finish
+        else:
+            # wbits=31: formato gzip
+            compressor = zlib.compressobj(config['COMPRESS_LEVEL'], zlib.DEFLATED, 31)
+            compress, flush = compressor.compress, compressor.flush
+        
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                data = compress(chunk)
+                if data:
+                    yield data
+            yield flush()
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
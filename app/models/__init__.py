@@ -1,4 +1,11 @@
 from app.models.user import User
 from app.models.movie import Movie
+from app.models.revoked_token import RevokedToken
+from app.models.collection import Collection, CollectionItem
+from app.models.activity import Rating, WatchEvent, TitleStats
+from app.models.social import Follow, TimelineEntry
+from app.models.idempotency import IdempotencyKey
 
-__all__ = ['User', 'Movie']
\ No newline at end of file
+__all__ = ['User', 'Movie', 'RevokedToken', 'Collection', 'CollectionItem',
+           'Rating', 'WatchEvent', 'TitleStats', 'Follow', 'TimelineEntry',
+           'IdempotencyKey']
@@ -0,0 +1,104 @@
+from app import db
+from datetime import datetime
+
+# Puntuaciones válidas; cada una tiene su columna de histograma en TitleStats
+RATING_SCORES = tuple(range(1, 11))
+
+
+class Rating(db.Model):
+    """Modelo de puntuación personal de una película (una por usuario y película)"""
+    __tablename__ = 'ratings'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'movie_id', name='uq_ratings_user_movie'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), nullable=False, index=True)
+    # TMDB ID de la película al puntuar: clave de los agregados por título
+    tmdb_id = db.Column(db.String(20), index=True)
+    score = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convertir puntuación a diccionario"""
+        return {
+            'id': self.id,
+            'movie_id': self.movie_id,
+            'tmdb_id': self.tmdb_id,
+            'score': self.score,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+
+class WatchEvent(db.Model):
+    """Modelo de visualización de una película (historial del usuario)"""
+    __tablename__ = 'watch_events'
+    __table_args__ = (
+        db.Index('ix_watch_events_user_history', 'user_id', 'watched_at', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), nullable=False, index=True)
+    tmdb_id = db.Column(db.String(20), index=True)
+    watched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convertir visualización a diccionario"""
+        return {
+            'id': self.id,
+            'movie_id': self.movie_id,
+            'tmdb_id': self.tmdb_id,
+            'watched_at': self.watched_at.isoformat(),
+            'created_at': self.created_at.isoformat()
+        }
+
+
+def _counter():
+    return db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+
+class TitleStats(db.Model):
+    """
+    Agregados por título de TMDB (de todos los usuarios).
+    
+    Se actualizan con incrementos atómicos en la misma transacción que cada
+    puntuación o visualización, así leer el promedio o el histograma de un
+    título es leer una fila. `flask reconcile-stats` los reconstruye.
+    """
+    __tablename__ = 'title_stats'
+    
+    tmdb_id = db.Column(db.String(20), primary_key=True)
+    rating_count = _counter()
+    rating_sum = _counter()
+    rating_1 = _counter()
+    rating_2 = _counter()
+    rating_3 = _counter()
+    rating_4 = _counter()
+    rating_5 = _counter()
+    rating_6 = _counter()
+    rating_7 = _counter()
+    rating_8 = _counter()
+    rating_9 = _counter()
+    rating_10 = _counter()
+    watch_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @staticmethod
+    def bucket(score):
+        """Nombre de la columna del histograma para una puntuación"""
+        return f'rating_{score}'
+    
+    def to_dict(self):
+        """Convertir agregados a diccionario"""
+        return {
+            'tmdb_id': self.tmdb_id,
+            'rating_count': self.rating_count,
+            'average_rating': round(self.rating_sum / self.rating_count, 2) if self.rating_count else None,
+            'histogram': {str(score): getattr(self, self.bucket(score)) for score in RATING_SCORES},
+            'watch_count': self.watch_count
+        }
@@ -0,0 +1,70 @@
+from app import db
+from datetime import datetime
+
+
+class Collection(db.Model):
+    """Modelo de Colección (lista ordenada de películas del usuario)"""
+    __tablename__ = 'collections'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convertir colección a diccionario"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'user_id': self.user_id,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+
+class CollectionItem(db.Model):
+    """
+    Película dentro de una colección.
+    
+    El orden lo da `rank`, una clave fraccionaria (ver app.utils.rank):
+    mover un elemento solo cambia su propia clave. El índice
+    (collection_id, rank, id) sirve la lectura paginada por orden.
+    """
+    __tablename__ = 'collection_items'
+    __table_args__ = (
+        db.UniqueConstraint('collection_id', 'movie_id', name='uq_collection_items_movie'),
+        db.Index('ix_collection_items_order', 'collection_id', 'rank', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    collection_id = db.Column(
+        db.Integer,
+        db.ForeignKey('collections.id', ondelete='CASCADE'),
+        nullable=False
+    )
+    movie_id = db.Column(
+        db.Integer,
+        db.ForeignKey('movies.id', ondelete='CASCADE'),
+        nullable=False,
+        index=True
+    )
+    rank = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Al borrar una película sale de todas sus colecciones
+    movie = db.relationship(
+        'Movie',
+        lazy='joined',
+        backref=db.backref('collection_items', cascade='all, delete-orphan')
+    )
+    
+    def to_dict(self):
+        """Convertir elemento a diccionario"""
+        return {
+            'id': self.id,
+            'collection_id': self.collection_id,
+            'movie_id': self.movie_id,
+            'rank': self.rank,
+            'created_at': self.created_at.isoformat()
+        }
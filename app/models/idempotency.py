@@ -0,0 +1,35 @@
+from app import db
+from datetime import datetime
+
+
+class IdempotencyKey(db.Model):
+    """
+    Respuesta guardada de un POST con header Idempotency-Key.
+    
+    Mientras status_code es None el primer request sigue en curso; los
+    duplicados esperan a que termine y reciben la misma respuesta hasta
+    expires_at. La reserva del request en curso vence en locked_until: si su
+    worker murió, un reintento la retoma.
+    """
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.UniqueConstraint('scope', 'key', name='uq_idempotency_scope_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # user:<id> con JWT; anon sin él (la IP cambia entre reintentos móviles)
+    scope = db.Column(db.String(64), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    # sha256 de método, ruta y cuerpo: la clave no puede reutilizarse con otro request
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    response_headers = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Nulo en filas anteriores a la columna: vale created_at + IDEMPOTENCY_LOCK_TIMEOUT
+    locked_until = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    @property
+    def completed(self):
+        return self.status_code is not None
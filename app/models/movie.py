@@ -5,6 +5,13 @@ from werkzeug.security import generate_password_hash, check_password_hash
 class Movie(db.Model):
     """Modelo de Película"""
     __tablename__ = 'movies'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'imdb_id', name='uq_movies_user_tmdb'),
+        # Feed: películas recientes de un autor (lectura de autores populares)
+        db.Index('ix_movies_user_created', 'user_id', 'created_at', 'id'),
+        # Reparación del feed: películas recientes sin fan-out terminado
+        db.Index('ix_movies_fanout_pending', 'fanned_out_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False, index=True)
@@ -12,10 +19,15 @@ class Movie(db.Model):
     director = db.Column(db.String(255), nullable=False)
     genre = db.Column(db.String(255), nullable=False)
     poster_url = db.Column(db.String(500))
-    imdb_id = db.Column(db.String(20), unique=True)
+    # TMDB ID: único por usuario (varios usuarios pueden tener el mismo título)
+    imdb_id = db.Column(db.String(20), index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Control de concurrencia optimista: cada UPDATE incrementa la versión (ETag)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Fin del fan-out al feed de los seguidores (NULL: pendiente o perdido)
+    fanned_out_at = db.Column(db.DateTime)
     
     def to_dict(self):
         """Convertir película a diccionario"""
@@ -29,5 +41,6 @@ class Movie(db.Model):
             'imdb_id': self.imdb_id,
             'user_id': self.user_id,
             'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'updated_at': self.updated_at.isoformat(),
+            'version': self.version
         }
\ No newline at end of file
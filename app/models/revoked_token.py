@@ -0,0 +1,22 @@
+from app import db
+from datetime import datetime
+
+
+class RevokedToken(db.Model):
+    """Modelo de token JWT revocado (por jti)"""
+    __tablename__ = 'revoked_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def to_dict(self):
+        """Convertir token revocado a diccionario"""
+        return {
+            'jti': self.jti,
+            'user_id': self.user_id,
+            'revoked_at': self.revoked_at.isoformat(),
+            'expires_at': self.expires_at.isoformat()
+        }
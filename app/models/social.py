@@ -0,0 +1,46 @@
+from app import db
+from datetime import datetime
+
+
+class Follow(db.Model):
+    """Modelo de seguimiento entre usuarios (follower sigue a followee)"""
+    __tablename__ = 'follows'
+    __table_args__ = (
+        # Fan-out: todos los seguidores de un autor
+        db.Index('ix_follows_followee', 'followee_id', 'follower_id'),
+    )
+    
+    follower_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    followee_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Fin de la copia de sus películas recientes al feed (NULL: pendiente o perdida)
+    backfilled_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        """Convertir seguimiento a diccionario"""
+        return {
+            'follower_id': self.follower_id,
+            'followee_id': self.followee_id,
+            'created_at': self.created_at.isoformat()
+        }
+
+
+class TimelineEntry(db.Model):
+    """
+    Fila del feed materializado de un usuario (fan-out on write).
+    
+    created_at es el de la película, así el orden del feed es el mismo para
+    filas materializadas y para las que se leen en el momento de autores
+    populares. El índice (user_id, created_at, movie_id) sirve la paginación.
+    """
+    __tablename__ = 'timeline_entries'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'movie_id', name='uq_timeline_user_movie'),
+        db.Index('ix_timeline_user_order', 'user_id', 'created_at', 'movie_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), nullable=False, index=True)
+    actor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
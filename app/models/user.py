@@ -1,6 +1,9 @@
 from app import db
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app.utils.hashing import password_hasher
 
 class User(db.Model):
     """Modelo de Usuario"""
@@ -12,17 +15,23 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Se mantiene con incrementos al seguir/dejar de seguir (feed: autores populares)
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relación con películas
     movies = db.relationship('Movie', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        """Hash de la contraseña"""
-        self.password_hash = generate_password_hash(password)
+        """Hash de la contraseña (se calcula en el pool de hashing)"""
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """Verificar contraseña"""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """Indica si el hash guardado usa parámetros KDF antiguos"""
+        return password_hasher.needs_rehash(self.password_hash)
     
     def to_dict(self):
         """Convertir usuario a diccionario"""
@@ -32,3 +41,33 @@ class User(db.Model):
             'email': self.email,
             'created_at': self.created_at.isoformat()
         }
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def record_changed_user(mapper, connection, target):
+    """
+    Anotar en la sesión los usuarios modificados o eliminados. La caché se
+    invalida al confirmar: si se borrara en el flush, un request concurrente
+    podría volver a cachear la fila vieja antes del commit.
+    """
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('changed_user_ids', set()).add(str(target.id))
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_cached_users(session):
+    """Invalidar la caché de usuarios de los cambios confirmados"""
+    user_ids = session.info.pop('changed_user_ids', None)
+    if user_ids and has_app_context():
+        cache = current_app.extensions.get('user_cache')
+        if cache is not None:
+            for user_id in user_ids:
+                cache.delete(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_changed_users(session):
+    """Los cambios deshechos no invalidan nada"""
+    session.info.pop('changed_user_ids', None)
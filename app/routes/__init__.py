@@ -1,4 +1,9 @@
 from app.routes.auth import auth_bp
 from app.routes.movies import movies_bp
+from app.routes.internal import internal_bp
+from app.routes.posters import posters_bp
+from app.routes.collections import collections_bp
+from app.routes.activity import activity_bp
+from app.routes.social import social_bp
 
-__all__ = ['auth_bp', 'movies_bp']
\ No newline at end of file
+__all__ = ['auth_bp', 'movies_bp', 'internal_bp', 'posters_bp', 'collections_bp', 'activity_bp', 'social_bp']
\ No newline at end of file
@@ -0,0 +1,234 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from marshmallow import ValidationError
+from app.schemas import RatingSchema, WatchEventSchema
+from app.services import ActivityService, MovieService
+from app.utils.db_routing import register_read_routing
+
+activity_bp = Blueprint('activity', __name__)
+
+# Las lecturas (GET) usan el bind de réplica si está configurado
+register_read_routing(activity_bp)
+
+rating_schema = RatingSchema()
+watch_event_schema = WatchEventSchema()
+
+
+def _movie_not_found():
+    return jsonify({
+        'success': False,
+        'error': 'Película no encontrada'
+    }), 404
+
+
+def _validation_error(err):
+    return jsonify({
+        'success': False,
+        'error': 'Validación fallida',
+        'details': err.messages
+    }), 400
+
+
+@activity_bp.route('/movies/<int:movie_id>/rating', methods=['PUT'])
+@jwt_required()
+def rate_movie(movie_id):
+    """Endpoint para puntuar una película (crea o reemplaza la puntuación)"""
+    try:
+        user_id = get_jwt_identity()
+        data = rating_schema.load(request.get_json())
+        
+        movie = MovieService.get_movie_by_id(movie_id, user_id)
+        if not movie:
+            return _movie_not_found()
+        
+        rating, created = ActivityService.rate_movie(movie, user_id, data['score'])
+        
+        return jsonify({
+            'success': True,
+            'data': rating.to_dict()
+        }), 201 if created else 200
+    
+    except ValidationError as err:
+        return _validation_error(err)
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al puntuar película'
+        }), 500
+
+
+@activity_bp.route('/movies/<int:movie_id>/rating', methods=['GET'])
+@jwt_required()
+def get_rating(movie_id):
+    """Endpoint para obtener la puntuación del usuario"""
+    try:
+        rating = ActivityService.get_rating(movie_id, get_jwt_identity())
+        
+        if not rating:
+            return jsonify({
+                'success': False,
+                'error': 'Puntuación no encontrada'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': rating.to_dict()
+        }), 200
+    
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al obtener puntuación'
+        }), 500
+
+
+@activity_bp.route('/movies/<int:movie_id>/rating', methods=['DELETE'])
+@jwt_required()
+def delete_rating(movie_id):
+    """Endpoint para eliminar la puntuación del usuario"""
+    try:
+        if not ActivityService.delete_rating(movie_id, get_jwt_identity()):
+            return jsonify({
+                'success': False,
+                'error': 'Puntuación no encontrada'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': 'Puntuación eliminada exitosamente'
+        }), 200
+    
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al eliminar puntuación'
+        }), 500
+
+
+@activity_bp.route('/movies/<int:movie_id>/watches', methods=['POST'])
+@jwt_required()
+def add_watch(movie_id):
+    """Endpoint para registrar que el usuario vio la película"""
+    try:
+        user_id = get_jwt_identity()
+        data = watch_event_schema.load(request.get_json(silent=True) or {})
+        
+        movie = MovieService.get_movie_by_id(movie_id, user_id)
+        if not movie:
+            return _movie_not_found()
+        
+        event = ActivityService.add_watch(movie, user_id, data.get('watched_at'))
+        
+        return jsonify({
+            'success': True,
+            'data': event.to_dict()
+        }), 201
+    
+    except ValidationError as err:
+        return _validation_error(err)
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al registrar visualización'
+        }), 500
+
+
+@activity_bp.route('/movies/<int:movie_id>/watches/<int:watch_id>', methods=['DELETE'])
+@jwt_required()
+def delete_watch(movie_id, watch_id):
+    """Endpoint para eliminar una visualización del historial"""
+    try:
+        if not ActivityService.delete_watch(movie_id, get_jwt_identity(), watch_id):
+            return jsonify({
+                'success': False,
+                'error': 'Visualización no encontrada'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': 'Visualización eliminada exitosamente'
+        }), 200
+    
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al eliminar visualización'
+        }), 500
+
+
+@activity_bp.route('/history', methods=['GET'])
+@jwt_required()
+def get_history():
+    """
+    Endpoint con el historial de visualizaciones del usuario (más reciente
+    primero). Paginación por cursor: ?limit=50&cursor=<next_cursor>
+    """
+    try:
+        config = current_app.config
+        limit = request.args.get('limit', config['HISTORY_PAGE_SIZE'], type=int)
+        limit = max(1, min(limit, config['HISTORY_MAX_PAGE_SIZE']))
+        
+        events, next_cursor = ActivityService.get_history(
+            get_jwt_identity(), limit, request.args.get('cursor')
+        )
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'watches': [event.to_dict() for event in events],
+                'next_cursor': next_cursor
+            }
+        }), 200
+    
+    except ValueError as err:
+        return jsonify({
+            'success': False,
+            'error': str(err)
+        }), 400
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al obtener historial'
+        }), 500
+
+
+@activity_bp.route('/titles/most-watched', methods=['GET'])
+def most_watched():
+    """Endpoint con los títulos de TMDB más vistos (?limit=10, máximo 100)"""
+    try:
+        limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+        
+        return jsonify({
+            'success': True,
+            'data': [stats.to_dict() for stats in ActivityService.most_watched(limit)]
+        }), 200
+    
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al obtener títulos más vistos'
+        }), 500
+
+
+@activity_bp.route('/titles/<tmdb_id>/stats', methods=['GET'])
+def get_title_stats(tmdb_id):
+    """Endpoint con la puntuación promedio, histograma y visualizaciones de un título"""
+    try:
+        stats = ActivityService.get_title_stats(tmdb_id)
+        
+        if not stats:
+            return jsonify({
+                'success': False,
+                'error': 'Título sin actividad'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': stats.to_dict()
+        }), 200
+    
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al obtener estadísticas del título'
+        }), 500
@@ -1,17 +1,26 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt, decode_token
 from marshmallow import ValidationError
-from app.schemas import UserRegisterSchema, UserLoginSchema, UserResponseSchema
-from app.services import AuthService
+from app.schemas import UserRegisterSchema, UserLoginSchema, UserResponseSchema, TokenRevokeSchema
+from app.services import AuthService, TokenService
+from app.utils.hashing import HashingBusyError
+from app.middleware import rate_limit, idempotent
+from app.utils.db_routing import register_read_routing
 
 auth_bp = Blueprint('auth', __name__)
 
+# Las lecturas (GET) usan el bind de réplica si está configurado
+register_read_routing(auth_bp)
+
 register_schema = UserRegisterSchema()
 login_schema = UserLoginSchema()
 user_response_schema = UserResponseSchema()
+token_revoke_schema = TokenRevokeSchema()
 
 
 @auth_bp.route('/register', methods=['POST'])
+@idempotent
+@rate_limit(max_requests=5, window=3600)
 def register():
     """Endpoint para registrar nuevo usuario"""
     try:
@@ -42,6 +51,13 @@ def register():
             'success': False,
             'error': str(err)
         }), 400
+    except HashingBusyError as err:
+        response = jsonify({
+            'success': False,
+            'error': str(err)
+        })
+        response.headers['Retry-After'] = '1'
+        return response, 503
     except Exception as err:
         return jsonify({
             'success': False,
@@ -50,6 +66,7 @@ def register():
 
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit(max_requests=10, window=60)
 def login():
     """Endpoint para iniciar sesión"""
     try:
@@ -69,7 +86,10 @@ def login():
             }), 401
         
         # Crear token JWT
-        access_token = create_access_token(identity=user.id)
+        access_token = create_access_token(
+            identity=user.id,
+            additional_claims=AuthService.token_claims(user)
+        )
         
         return jsonify({
             'success': True,
@@ -86,6 +106,13 @@ def login():
             'error': 'Validación fallida',
             'details': err.messages
         }), 400
+    except HashingBusyError as err:
+        response = jsonify({
+            'success': False,
+            'error': str(err)
+        })
+        response.headers['Retry-After'] = '1'
+        return response, 503
     except Exception as err:
         return jsonify({
             'success': False,
@@ -99,7 +126,7 @@ def get_current_user():
     """Endpoint para obtener usuario actual"""
     try:
         user_id = get_jwt_identity()
-        user = AuthService.get_user_by_id(user_id)
+        user = AuthService.resolve_user(user_id, get_jwt())
         
         if not user:
             return jsonify({
@@ -116,4 +143,65 @@ def get_current_user():
         return jsonify({
             'success': False,
             'error': 'Error al obtener usuario'
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    """Endpoint para cerrar sesión (revoca el token actual)"""
+    try:
+        TokenService.revoke_payload(get_jwt())
+        
+        return jsonify({
+            'success': True,
+            'message': 'Sesión cerrada exitosamente'
+        }), 200
+    
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al cerrar sesión'
+        }), 500
+
+
+@auth_bp.route('/revoke', methods=['POST'])
+@jwt_required()
+def revoke_token():
+    """Endpoint para revocar otro token del usuario (p. ej. uno robado)"""
+    try:
+        data = token_revoke_schema.load(request.get_json())
+        
+        try:
+            payload = decode_token(data['token'], allow_expired=True)
+        except Exception:
+            return jsonify({
+                'success': False,
+                'error': 'Token inválido'
+            }), 400
+        
+        identity_claim = current_app.config['JWT_IDENTITY_CLAIM']
+        if str(payload.get(identity_claim)) != str(get_jwt_identity()):
+            return jsonify({
+                'success': False,
+                'error': 'El token no pertenece al usuario'
+            }), 403
+        
+        TokenService.revoke_payload(payload)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Token revocado exitosamente'
+        }), 200
+    
+    except ValidationError as err:
+        return jsonify({
+            'success': False,
+            'error': 'Validación fallida',
+            'details': err.messages
+        }), 400
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al revocar token'
+        }), 500
@@ -0,0 +1,257 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from marshmallow import ValidationError
+from app.schemas import (
+    CollectionCreateSchema,
+    CollectionItemCreateSchema,
+    CollectionItemMoveSchema,
+    MovieResponseSchema
+)
+from app.services import CollectionService, CollectionError
+from app.utils.db_routing import register_read_routing
+
+collections_bp = Blueprint('collections', __name__)
+
+# Las lecturas (GET) usan el bind de réplica si está configurado
+register_read_routing(collections_bp)
+
+collection_create_schema = CollectionCreateSchema()
+item_create_schema = CollectionItemCreateSchema()
+item_move_schema = CollectionItemMoveSchema()
+movie_response_schema = MovieResponseSchema()
+
+
+def _item_dict(item):
+    return {**item.to_dict(), 'movie': movie_response_schema.dump(item.movie)}
+
+
+def _not_found():
+    return jsonify({
+        'success': False,
+        'error': 'Colección no encontrada'
+    }), 404
+
+
+def _validation_error(err):
+    return jsonify({
+        'success': False,
+        'error': 'Validación fallida',
+        'details': err.messages
+    }), 400
+
+
+def _collection_error(err):
+    return jsonify({
+        'success': False,
+        'error': str(err)
+    }), err.status_code
+
+
+@collections_bp.route('/', methods=['POST'])
+@jwt_required()
+def create_collection():
+    """Endpoint para crear colección"""
+    try:
+        data = collection_create_schema.load(request.get_json())
+        collection = CollectionService.create_collection(get_jwt_identity(), data['name'])
+        
+        return jsonify({
+            'success': True,
+            'message': 'Colección creada exitosamente',
+            'data': collection.to_dict()
+        }), 201
+    
+    except ValidationError as err:
+        return _validation_error(err)
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al crear colección'
+        }), 500
+
+
+@collections_bp.route('/', methods=['GET'])
+@jwt_required()
+def get_collections():
+    """Endpoint para obtener colecciones del usuario"""
+    try:
+        collections = CollectionService.get_user_collections(get_jwt_identity())
+        
+        return jsonify({
+            'success': True,
+            'data': [
+                {**collection.to_dict(), 'total_items': total}
+                for collection, total in collections
+            ]
+        }), 200
+    
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al obtener colecciones'
+        }), 500
+
+
+@collections_bp.route('/<int:collection_id>', methods=['DELETE'])
+@jwt_required()
+def delete_collection(collection_id):
+    """Endpoint para eliminar colección"""
+    try:
+        if not CollectionService.delete_collection(collection_id, get_jwt_identity()):
+            return _not_found()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Colección eliminada exitosamente'
+        }), 200
+    
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al eliminar colección'
+        }), 500
+
+
+@collections_bp.route('/<int:collection_id>/items', methods=['GET'])
+@jwt_required()
+def get_items(collection_id):
+    """
+    Endpoint para obtener los elementos de una colección en orden.
+    Paginación por cursor: ?limit=50&cursor=<next_cursor de la página anterior>
+    """
+    try:
+        collection = CollectionService.get_collection(collection_id, get_jwt_identity())
+        if not collection:
+            return _not_found()
+        
+        config = current_app.config
+        limit = request.args.get('limit', config['COLLECTION_PAGE_SIZE'], type=int)
+        limit = max(1, min(limit, config['COLLECTION_MAX_PAGE_SIZE']))
+        
+        items, next_cursor = CollectionService.get_items(
+            collection.id, limit, request.args.get('cursor')
+        )
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'collection': collection.to_dict(),
+                'items': [_item_dict(item) for item in items],
+                'next_cursor': next_cursor
+            }
+        }), 200
+    
+    except CollectionError as err:
+        return _collection_error(err)
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al obtener elementos de la colección'
+        }), 500
+
+
+@collections_bp.route('/<int:collection_id>/items', methods=['POST'])
+@jwt_required()
+def add_item(collection_id):
+    """
+    Endpoint para agregar una película a la colección.
+    Body: {"movie_id": 1, "after_item_id": 7}; sin after_item_id va al final.
+    """
+    try:
+        user_id = get_jwt_identity()
+        data = item_create_schema.load(request.get_json())
+        
+        collection = CollectionService.get_collection(collection_id, user_id)
+        if not collection:
+            return _not_found()
+        
+        item = CollectionService.add_item(
+            collection,
+            user_id,
+            data['movie_id'],
+            data.get('after_item_id', CollectionService.END)
+        )
+        
+        return jsonify({
+            'success': True,
+            'message': 'Película agregada a la colección',
+            'data': _item_dict(item)
+        }), 201
+    
+    except ValidationError as err:
+        return _validation_error(err)
+    except CollectionError as err:
+        return _collection_error(err)
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al agregar película a la colección'
+        }), 500
+
+
+@collections_bp.route('/<int:collection_id>/items/<int:item_id>/move', methods=['POST'])
+@jwt_required()
+def move_item(collection_id, item_id):
+    """
+    Endpoint para reordenar: ubica el elemento después de after_item_id
+    (null = al inicio; omitido = al final). Solo se escribe una fila.
+    """
+    try:
+        data = item_move_schema.load(request.get_json() or {})
+        
+        collection = CollectionService.get_collection(collection_id, get_jwt_identity())
+        if not collection:
+            return _not_found()
+        
+        item = CollectionService.move_item(
+            collection,
+            item_id,
+            data.get('after_item_id', CollectionService.END)
+        )
+        if not item:
+            return jsonify({
+                'success': False,
+                'error': 'Elemento no encontrado'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': _item_dict(item)
+        }), 200
+    
+    except ValidationError as err:
+        return _validation_error(err)
+    except CollectionError as err:
+        return _collection_error(err)
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al mover elemento'
+        }), 500
+
+
+@collections_bp.route('/<int:collection_id>/items/<int:item_id>', methods=['DELETE'])
+@jwt_required()
+def remove_item(collection_id, item_id):
+    """Endpoint para quitar una película de la colección"""
+    try:
+        collection = CollectionService.get_collection(collection_id, get_jwt_identity())
+        if not collection:
+            return _not_found()
+        
+        if not CollectionService.remove_item(collection, item_id):
+            return jsonify({
+                'success': False,
+                'error': 'Elemento no encontrado'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': 'Película quitada de la colección'
+        }), 200
+    
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al quitar película de la colección'
+        }), 500
@@ -0,0 +1,98 @@
+from flask import Blueprint, jsonify, request, send_file, Response
+from app import db
+from app.middleware import admin_required
+from app.utils.admission import admission_stats
+from app.utils.db_pool import pool_stats
+from app.utils.profiling import get_profile_store
+
+internal_bp = Blueprint('internal', __name__)
+
+
+@internal_bp.route('/db/pool', methods=['GET'])
+@admin_required
+def get_db_pool_stats():
+    """Endpoint interno con el estado y las métricas de los pools de conexiones"""
+    engines = {
+        bind_key or 'default': pool_stats(engine)
+        for bind_key, engine in db.engines.items()
+    }
+    
+    return jsonify({
+        'success': True,
+        'data': engines
+    }), 200
+
+
+@internal_bp.route('/admission', methods=['GET'])
+@admin_required
+def get_admission_stats():
+    """Endpoint interno con el límite, la ocupación y la cola de cada clase de ruta"""
+    return jsonify({
+        'success': True,
+        'data': admission_stats()
+    }), 200
+
+
+@internal_bp.route('/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    """Endpoint interno con los perfiles guardados (más recientes primero)"""
+    store = get_profile_store()
+    if store is None:
+        return jsonify({
+            'success': False,
+            'error': 'El profiling no está habilitado'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': store.list()
+    }), 200
+
+
+@internal_bp.route('/profiles/<profile_id>', methods=['GET'])
+@admin_required
+def download_profile(profile_id):
+    """
+    Descargar un perfil: `.prof` de pstats (snakeviz, flameprof, ...) o
+    un resumen de texto con ?format=text&sort=cumulative
+    """
+    store = get_profile_store()
+    path = store.stats_path(profile_id) if store else None
+    if path is None:
+        return jsonify({
+            'success': False,
+            'error': 'Perfil no encontrado'
+        }), 404
+    
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'calls'):
+            return jsonify({
+                'success': False,
+                'error': 'sort debe ser cumulative, tottime o calls'
+            }), 400
+        return Response(store.render_text(profile_id, sort=sort), mimetype='text/plain')
+    
+    return send_file(
+        path,
+        mimetype='application/octet-stream',
+        as_attachment=True,
+        download_name=f'{profile_id}.prof'
+    )
+
+
+
+@internal_bp.route('/stats/reconcile', methods=['POST'])
+@admin_required
+def reconcile_title_stats():
+    """Encolar la reconstrucción de los agregados por título (tarea de fondo)"""
+    from app.services.activity_service import ActivityService
+    from app.utils.jobs import get_job_runner
+    
+    queued = get_job_runner().submit('reconcile-title-stats', ActivityService.reconcile)
+    
+    return jsonify({
+        'success': True,
+        'queued': queued
+    }), 202
@@ -1,21 +1,88 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+import asyncio
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
 from marshmallow import ValidationError
-from app.schemas import MovieCreateSchema, MovieResponseSchema
-from app.services import MovieService, TMDbService
+from app.schemas import MovieCreateSchema, MovieResponseSchema, TMDbResolveSchema
+from app.services import MovieService, VersionConflictError, DuplicateMovieError, TMDbService, AsyncTMDbClient, TMDbError
+from app.middleware import rate_limit, idempotent
+from app.utils.db_routing import register_read_routing
 
 movies_bp = Blueprint('movies', __name__)
 
+# Las lecturas (GET) usan el bind de réplica si está configurado
+register_read_routing(movies_bp)
+
 movie_create_schema = MovieCreateSchema()
 movie_response_schema = MovieResponseSchema()
 movies_response_schema = MovieResponseSchema(many=True)
+tmdb_resolve_schema = TMDbResolveSchema()
+
+
+def _response_schema(many=False):
+    """
+    Schema de respuesta según ?poster_size (posters servidos por el proxy).
+    Retorna None si el tamaño no es válido.
+    """
+    poster_size = request.args.get('poster_size')
+    if not poster_size:
+        return movies_response_schema if many else movie_response_schema
+    
+    if poster_size not in current_app.config['POSTER_SIZES']:
+        return None
+    
+    return MovieResponseSchema(many=many, context={'poster_size': poster_size})
+
+
+def _invalid_poster_size():
+    return jsonify({
+        'success': False,
+        'error': 'poster_size no soportado'
+    }), 400
+
+
+def _if_match_versions():
+    """
+    Versiones aceptadas por el header If-Match (ETag "<version>").
+    None si no se envió o es "*"; los ETags débiles o inválidos no coinciden
+    nunca (comparación fuerte), así que pueden dejar la lista vacía.
+    """
+    header = request.headers.get('If-Match')
+    if header is None or header.strip() == '*':
+        return None
+    
+    versions = []
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            continue
+        tag = tag.strip('"')
+        if tag.isdigit():
+            versions.append(int(tag))
+    return versions
+
+
+def _with_etag(response, version):
+    """Agregar ETag con la versión de la película a (respuesta, status)"""
+    response, status = response
+    response.set_etag(str(version))
+    return response, status
 
 
 @movies_bp.route('/search', methods=['GET'])
-def search_movies():
-    """Endpoint para buscar películas en TheMovieDB (TMDB)"""
+@rate_limit(max_requests=30, window=60)
+async def search_movies():
+    """
+    Endpoint para buscar películas en TheMovieDB (TMDB).
+    
+    Con ?mode=merged (requiere JWT) busca a la vez en TMDB y en la
+    biblioteca del usuario y retorna una sola lista ordenada donde cada
+    resultado indica in_library.
+    """
     try:
         title = request.args.get('title')
+        mode = request.args.get('mode', 'tmdb')
         
         if not title or len(title) < 1:
             return jsonify({
@@ -23,13 +90,34 @@ def search_movies():
                 'error': 'El título es requerido'
             }), 400
         
-        results = TMDbService.search_movies(title)
+        if mode not in ('tmdb', 'merged'):
+            return jsonify({
+                'success': False,
+                'error': 'mode debe ser tmdb o merged'
+            }), 400
+        
+        if mode == 'merged':
+            verify_jwt_in_request()
+            return await _merged_search(title, get_jwt_identity())
+        
+        try:
+            async with AsyncTMDbClient.from_config() as tmdb:
+                results = await tmdb.search_movies(title)
+        except TMDbError as e:
+            current_app.logger.error(f'Error searching TMDB: {str(e)}')
+            results = []
         
         return jsonify({
             'success': True,
             'results': results
         }), 200
     
+    except (JWTExtendedException, PyJWTError):
+        return jsonify({
+            'success': False,
+            'error': 'Se requiere autenticación para mode=merged'
+        }), 401
+    
     except Exception as err:
         return jsonify({
             'success': False,
@@ -37,28 +125,106 @@ def search_movies():
         }), 500
 
 
+async def _merged_search(title, user_id):
+    """TMDB y biblioteca en paralelo; la consulta SQL corre en un hilo"""
+    
+    async def tmdb_search():
+        async with AsyncTMDbClient.from_config() as tmdb:
+            return await tmdb.search_movies(title)
+    
+    results, errors = await AsyncTMDbClient.gather(
+        tmdb=tmdb_search(),
+        library=asyncio.to_thread(MovieService.search_library, user_id, title)
+    )
+    
+    if 'tmdb' in errors:
+        current_app.logger.error(f"Error searching TMDB: {errors['tmdb']}")
+    
+    hits, library_tmdb_ids = results['library']
+    merged = MovieService.merge_search_results(
+        title,
+        results.get('tmdb', []),
+        movies_response_schema.dump(hits),
+        library_tmdb_ids
+    )
+    
+    return jsonify({
+        'success': True,
+        'mode': 'merged',
+        'results': merged,
+        'tmdb_error': errors.get('tmdb')
+    }), 200
+
+
+@movies_bp.route('/tmdb/resolve', methods=['POST'])
+@jwt_required()
+@rate_limit(max_requests=10, window=60)
+async def resolve_tmdb_ids():
+    """
+    Endpoint para obtener metadatos de varios TMDB IDs a la vez.
+    
+    Los ids repetidos se piden una sola vez, los que están en la caché de
+    detalles no salen a TMDB y el resto se consulta en paralelo. Los
+    fallos se reportan por id sin invalidar el resto.
+    """
+    try:
+        data = tmdb_resolve_schema.load(request.get_json())
+        
+        async with AsyncTMDbClient.from_config() as tmdb:
+            details, errors, cached_ids = await tmdb.resolve_many(
+                data['ids'],
+                cache=current_app.extensions.get('tmdb_details_cache')
+            )
+        
+        return jsonify({
+            'success': True,
+            'results': {
+                movie_id: {'tmdb_id': movie_id, **TMDbService.movie_fields(movie)}
+                for movie_id, movie in details.items()
+            },
+            'errors': errors,
+            'cached': len(cached_ids)
+        }), 200
+    
+    except ValidationError as err:
+        return jsonify({
+            'success': False,
+            'error': 'Validación fallida',
+            'details': err.messages
+        }), 400
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al resolver TMDB IDs'
+        }), 500
+
+
 @movies_bp.route('/', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_movie():
-    """Endpoint para crear nueva película"""
+    """
+    Endpoint para crear nueva película.
+    Basta con {"tmdb_id": ...}: el resto se completa desde TMDB.
+    """
     try:
         user_id = get_jwt_identity()
         data = movie_create_schema.load(request.get_json())
         
         movie = MovieService.create_movie(
             user_id=user_id,
-            title=data['title'],
-            year=data['year'],
-            director=data['director'],
-            genre=data['genre'],
+            title=data.get('title'),
+            year=data.get('year'),
+            director=data.get('director'),
+            genre=data.get('genre'),
             tmdb_id=data.get('tmdb_id')
         )
         
-        return jsonify({
+        return _with_etag((jsonify({
             'success': True,
             'message': 'Película creada exitosamente',
             'data': movie_response_schema.dump(movie)
-        }), 201
+        }), 201), movie.version)
     
     except ValidationError as err:
         return jsonify({
@@ -66,6 +232,16 @@ def create_movie():
             'error': 'Validación fallida',
             'details': err.messages
         }), 400
+    except DuplicateMovieError as err:
+        return jsonify({
+            'success': False,
+            'error': str(err)
+        }), 409
+    except ValueError as err:
+        return jsonify({
+            'success': False,
+            'error': str(err)
+        }), 422
     except Exception as err:
         return jsonify({
             'success': False,
@@ -78,13 +254,17 @@ def create_movie():
 def get_movies():
     """Endpoint para obtener películas del usuario"""
     try:
+        schema = _response_schema(many=True)
+        if schema is None:
+            return _invalid_poster_size()
+        
         user_id = get_jwt_identity()
         movies = MovieService.get_user_movies(user_id)
         
         return jsonify({
             'success': True,
             'data': {
-                'movies': movies_response_schema.dump(movies),
+                'movies': schema.dump(movies),
                 'total': len(movies)
             }
         }), 200
@@ -101,6 +281,10 @@ def get_movies():
 def get_movie(movie_id):
     """Endpoint para obtener película específica"""
     try:
+        schema = _response_schema()
+        if schema is None:
+            return _invalid_poster_size()
+        
         user_id = get_jwt_identity()
         movie = MovieService.get_movie_by_id(movie_id, user_id)
         
@@ -110,10 +294,10 @@ def get_movie(movie_id):
                 'error': 'Película no encontrada'
             }), 404
         
-        return jsonify({
+        return _with_etag((jsonify({
             'success': True,
-            'data': movie_response_schema.dump(movie)
-        }), 200
+            'data': schema.dump(movie)
+        }), 200), movie.version)
     
     except Exception as err:
         return jsonify({
@@ -125,12 +309,23 @@ def get_movie(movie_id):
 @movies_bp.route('/<int:movie_id>', methods=['PUT'])
 @jwt_required()
 def update_movie(movie_id):
-    """Endpoint para actualizar película"""
+    """
+    Endpoint para actualizar película.
+    
+    Con If-Match: "<version>" (el ETag de GET) la actualización solo se
+    aplica si nadie la modificó antes; si no, responde 412 con la versión
+    actual en el ETag.
+    """
     try:
         user_id = get_jwt_identity()
         data = movie_create_schema.load(request.get_json(), partial=True)
         
-        movie = MovieService.update_movie(movie_id, user_id, **data)
+        movie = MovieService.update_movie(
+            movie_id,
+            user_id,
+            expected_versions=_if_match_versions(),
+            **data
+        )
         
         if not movie:
             return jsonify({
@@ -138,11 +333,11 @@ def update_movie(movie_id):
                 'error': 'Película no encontrada'
             }), 404
         
-        return jsonify({
+        return _with_etag((jsonify({
             'success': True,
             'message': 'Película actualizada exitosamente',
             'data': movie_response_schema.dump(movie)
-        }), 200
+        }), 200), movie.version)
     
     except ValidationError as err:
         return jsonify({
@@ -150,6 +345,12 @@ def update_movie(movie_id):
             'error': 'Validación fallida',
             'details': err.messages
         }), 400
+    except VersionConflictError as err:
+        return _with_etag((jsonify({
+            'success': False,
+            'error': str(err),
+            'current_version': err.current_version
+        }), 412), err.current_version)
     except Exception as err:
         return jsonify({
             'success': False,
@@ -180,4 +381,43 @@ def delete_movie(movie_id):
         return jsonify({
             'success': False,
             'error': 'Error al eliminar película'
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+@movies_bp.route('/<int:movie_id>/details', methods=['GET'])
+@jwt_required()
+async def get_movie_details(movie_id):
+    """
+    Endpoint para obtener película con datos en vivo de TMDB.
+    Detalles, créditos e imágenes se piden en paralelo.
+    """
+    try:
+        user_id = get_jwt_identity()
+        movie = MovieService.get_movie_by_id(movie_id, user_id)
+        
+        if not movie:
+            return jsonify({
+                'success': False,
+                'error': 'Película no encontrada'
+            }), 404
+        
+        tmdb_data, errors = None, {}
+        # imdb_id guarda el TMDB ID (ver MovieService.create_movie)
+        if movie.imdb_id:
+            async with AsyncTMDbClient.from_config() as tmdb:
+                tmdb_data, errors = await tmdb.movie_bundle(movie.imdb_id)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'movie': movie_response_schema.dump(movie),
+                'tmdb': tmdb_data,
+                'tmdb_errors': errors
+            }
+        }), 200
+    
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al obtener detalles de película'
+        }), 500
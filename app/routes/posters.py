@@ -0,0 +1,32 @@
+from flask import Blueprint, jsonify, send_file, current_app
+from app.services.poster_service import PosterService, PosterError
+
+posters_bp = Blueprint('posters', __name__)
+
+
+@posters_bp.route('/<size>/<filename>', methods=['GET'])
+def get_poster(size, filename):
+    """
+    Endpoint para servir posters de TMDB en el tamaño pedido desde la
+    caché local. Soporta ETag (If-None-Match) y Range.
+    """
+    try:
+        path, etag, mimetype = PosterService.get_poster(size, filename)
+    except PosterError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
+    
+    # send_file usa wsgi.file_wrapper (sendfile en gunicorn) y responde
+    # 304/206 según If-None-Match y Range
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        etag=etag,
+        conditional=True,
+        max_age=current_app.config['POSTER_MAX_AGE']
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,96 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.services import FeedService, FeedError
+from app.utils.db_routing import register_read_routing
+
+social_bp = Blueprint('social', __name__)
+
+# Las lecturas (GET) usan el bind de réplica si está configurado
+register_read_routing(social_bp)
+
+
+def _feed_error(err):
+    return jsonify({
+        'success': False,
+        'error': str(err)
+    }), err.status_code
+
+
+@social_bp.route('/users/<int:user_id>/follow', methods=['POST'])
+@jwt_required()
+def follow(user_id):
+    """Endpoint para seguir a un usuario"""
+    try:
+        created = FeedService.follow(get_jwt_identity(), user_id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Ahora sigues a este usuario' if created else 'Ya sigues a este usuario'
+        }), 201 if created else 200
+    
+    except FeedError as err:
+        return _feed_error(err)
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al seguir usuario'
+        }), 500
+
+
+@social_bp.route('/users/<int:user_id>/follow', methods=['DELETE'])
+@jwt_required()
+def unfollow(user_id):
+    """Endpoint para dejar de seguir a un usuario"""
+    try:
+        if not FeedService.unfollow(get_jwt_identity(), user_id):
+            return jsonify({
+                'success': False,
+                'error': 'No sigues a este usuario'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': 'Dejaste de seguir a este usuario'
+        }), 200
+    
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al dejar de seguir usuario'
+        }), 500
+
+
+@social_bp.route('/feed', methods=['GET'])
+@jwt_required()
+def get_feed():
+    """
+    Endpoint con las películas agregadas por los usuarios seguidos (más
+    reciente primero). Paginación por cursor: ?limit=30&cursor=<next_cursor>
+    """
+    try:
+        config = current_app.config
+        limit = request.args.get('limit', config['FEED_PAGE_SIZE'], type=int)
+        limit = max(1, min(limit, config['FEED_MAX_PAGE_SIZE']))
+        
+        movies, next_cursor = FeedService.get_feed(
+            get_jwt_identity(), limit, request.args.get('cursor')
+        )
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'movies': [
+                    {**movie.to_dict(), 'added_by': movie.user.username}
+                    for movie in movies
+                ],
+                'next_cursor': next_cursor
+            }
+        }), 200
+    
+    except FeedError as err:
+        return _feed_error(err)
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': 'Error al obtener feed'
+        }), 500
@@ -1,17 +1,32 @@
 from app.schemas.user_schema import (
     UserRegisterSchema,
     UserLoginSchema,
-    UserResponseSchema
+    UserResponseSchema,
+    TokenRevokeSchema
 )
 from app.schemas.movie_schema import (
     MovieCreateSchema,
-    MovieResponseSchema
+    MovieResponseSchema,
+    TMDbResolveSchema
 )
+from app.schemas.collection_schema import (
+    CollectionCreateSchema,
+    CollectionItemCreateSchema,
+    CollectionItemMoveSchema
+)
+from app.schemas.activity_schema import RatingSchema, WatchEventSchema
 
 __all__ = [
     'UserRegisterSchema',
     'UserLoginSchema',
     'UserResponseSchema',
+    'TokenRevokeSchema',
     'MovieCreateSchema',
-    'MovieResponseSchema'
+    'MovieResponseSchema',
+    'TMDbResolveSchema',
+    'CollectionCreateSchema',
+    'CollectionItemCreateSchema',
+    'CollectionItemMoveSchema',
+    'RatingSchema',
+    'WatchEventSchema'
 ]
\ No newline at end of file
@@ -0,0 +1,18 @@
+# app/schemas/activity_schema.py
+from datetime import timezone
+from marshmallow import Schema, fields, validate
+
+
+class RatingSchema(Schema):
+    """Schema para puntuar una película (1 a 10)"""
+    score = fields.Int(
+        required=True,
+        strict=True,
+        validate=validate.Range(min=1, max=10),
+        error_messages={'required': 'La puntuación es requerida'}
+    )
+
+
+class WatchEventSchema(Schema):
+    """Schema para registrar una visualización (por defecto, ahora; se guarda en UTC)"""
+    watched_at = fields.NaiveDateTime(allow_none=True, timezone=timezone.utc)
@@ -0,0 +1,29 @@
+# app/schemas/collection_schema.py
+from marshmallow import Schema, fields, validate
+
+
+class CollectionCreateSchema(Schema):
+    """Schema para crear colección"""
+    name = fields.Str(
+        required=True,
+        validate=validate.Length(min=1, max=120),
+        error_messages={'required': 'El nombre es requerido'}
+    )
+
+
+class CollectionItemMoveSchema(Schema):
+    """
+    Schema para mover un elemento.
+    after_item_id: id del elemento que queda antes (null = al inicio;
+    omitido = al final).
+    """
+    after_item_id = fields.Int(allow_none=True, strict=True)
+
+
+class CollectionItemCreateSchema(CollectionItemMoveSchema):
+    """Schema para agregar una película a una colección"""
+    movie_id = fields.Int(
+        required=True,
+        strict=True,
+        error_messages={'required': 'movie_id es requerido'}
+    )
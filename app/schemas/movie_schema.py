@@ -1,39 +1,89 @@
-from marshmallow import Schema, fields, validate
+from flask import current_app, url_for
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError
 
 class MovieCreateSchema(Schema):
-    """Schema para crear/actualizar película"""
+    """
+    Schema para crear/actualizar película.
+    Con tmdb_id basta: los campos que falten se completan desde TMDB.
+    """
+    REQUIRED_WITHOUT_TMDB = ('title', 'year', 'director', 'genre')
+    
     title = fields.Str(
-        required=True,
         validate=validate.Length(min=1, max=255),
         error_messages={'required': 'El título es requerido'}
     )
     year = fields.Int(
-        required=True,
         validate=validate.Range(min=1800, max=2100),
         error_messages={'required': 'El año es requerido'}
     )
     director = fields.Str(
-        required=True,
         validate=validate.Length(min=1, max=255),
         error_messages={'required': 'El director es requerido'}
     )
     genre = fields.Str(
-        required=True,
         validate=validate.Length(min=1, max=255),
         error_messages={'required': 'El género es requerido'}
     )
     tmdb_id = fields.Str(allow_none=True)
+    
+    @validates_schema
+    def validate_required_fields(self, data, partial=None, **kwargs):
+        """Sin tmdb_id, título, año, director y género son obligatorios"""
+        if partial or data.get('tmdb_id'):
+            return
+        
+        errors = {
+            name: [self.fields[name].error_messages['required']]
+            for name in self.REQUIRED_WITHOUT_TMDB
+            if data.get(name) is None
+        }
+        if errors:
+            raise ValidationError(errors)
+
+
+
+class TMDbResolveSchema(Schema):
+    """Schema para resolver varios TMDB IDs (máximo TMDB_RESOLVE_MAX_IDS)"""
+    ids = fields.List(
+        fields.Int(strict=True, validate=validate.Range(min=1)),
+        required=True,
+        error_messages={'required': 'ids es requerido'}
+    )
+    
+    @validates_schema
+    def validate_ids_count(self, data, **kwargs):
+        """Entre 1 y TMDB_RESOLVE_MAX_IDS ids"""
+        max_ids = current_app.config['TMDB_RESOLVE_MAX_IDS']
+        if not 1 <= len(data.get('ids', [])) <= max_ids:
+            raise ValidationError(f'Se requieren entre 1 y {max_ids} ids', 'ids')
 
 
 class MovieResponseSchema(Schema):
-    """Schema para respuesta de película"""
+    """
+    Schema para respuesta de película.
+    Con context={'poster_size': 'w185'} los posters de TMDB se emiten como
+    URLs del proxy local (/api/posters/<size>/<archivo>).
+    """
     id = fields.Int()
     title = fields.Str()
     year = fields.Int()
     director = fields.Str()
     genre = fields.Str()
-    poster_url = fields.Str()
+    poster_url = fields.Method('get_poster_url')
     imdb_id = fields.Str()
     user_id = fields.Int()
     created_at = fields.Str()
-    updated_at = fields.Str()
\ No newline at end of file
+    updated_at = fields.Str()
+    version = fields.Int()
+    
+    def get_poster_url(self, movie):
+        """URL del poster (del proxy si se pidió un tamaño)"""
+        from app.services.poster_service import PosterService
+        
+        poster_url = movie.poster_url
+        size = self.context.get('poster_size')
+        filename = PosterService.tmdb_filename(poster_url) if size else None
+        if filename is None:
+            return poster_url
+        
+        return url_for('posters.get_poster', size=size, filename=filename)
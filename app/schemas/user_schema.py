@@ -40,3 +40,10 @@ class UserResponseSchema(Schema):
     created_at = fields.Str()
 
 
+class TokenRevokeSchema(Schema):
+    """Schema para revocar un token"""
+    token = fields.Str(
+        required=True,
+        validate=validate.Length(min=1),
+        error_messages={'required': 'El token es requerido'}
+    )
@@ -1,6 +1,15 @@
-from app.services.auth_service import AuthService
-from app.services.movie_service import MovieService
+from app.services.auth_service import AuthService, CachedUser
+from app.services.movie_service import MovieService, VersionConflictError, DuplicateMovieError
 from app.services.tmdb_service import TMDbService
+from app.services.token_service import TokenService
+from app.services.tmdb_async import AsyncTMDbClient, TMDbError
+from app.services.poster_service import PosterService, PosterError
+from app.services.collection_service import CollectionService, CollectionError
+from app.services.activity_service import ActivityService
+from app.services.feed_service import FeedService, FeedError
+from app.services.idempotency_service import IdempotencyService
 
-__all__ = ['AuthService', 'MovieService', 'TMDbService']
-
+__all__ = ['AuthService', 'CachedUser', 'MovieService', 'VersionConflictError', 'DuplicateMovieError', 'TMDbService',
+           'TokenService', 'AsyncTMDbClient', 'TMDbError', 'PosterService', 'PosterError',
+           'CollectionService', 'CollectionError', 'ActivityService', 'FeedService', 'FeedError',
+           'IdempotencyService']
@@ -0,0 +1,280 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import delete, exists, func, insert, or_, select, tuple_, union, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.activity import Rating, WatchEvent, TitleStats, RATING_SCORES
+
+
+class ActivityService:
+    """
+    Servicio de puntuaciones e historial de visualizaciones.
+    
+    Cada escritura ajusta en la misma transacción los agregados del título
+    (TitleStats) con un UPDATE de incrementos (col = col + delta): no hay
+    lectura previa, así que escrituras concurrentes no pierden cuentas.
+    """
+    
+    @staticmethod
+    def _apply_deltas(tmdb_id, deltas):
+        """Sumar deltas a los agregados del título (crea la fila si no existe)"""
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not tmdb_id or not deltas:
+            return
+        
+        statement = (
+            update(TitleStats)
+            .where(TitleStats.tmdb_id == tmdb_id)
+            .values({name: getattr(TitleStats, name) + delta for name, delta in deltas.items()})
+            .execution_options(synchronize_session=False)
+        )
+        if db.session.execute(statement).rowcount:
+            return
+        
+        try:
+            with db.session.begin_nested():
+                db.session.add(TitleStats(tmdb_id=tmdb_id, **deltas))
+        except IntegrityError:
+            # Otro request creó la fila primero
+            db.session.execute(statement)
+    
+    @staticmethod
+    def _rating_deltas(old_score, new_score):
+        deltas = defaultdict(int)
+        if old_score is not None:
+            deltas['rating_count'] -= 1
+            deltas['rating_sum'] -= old_score
+            deltas[TitleStats.bucket(old_score)] -= 1
+        if new_score is not None:
+            deltas['rating_count'] += 1
+            deltas['rating_sum'] += new_score
+            deltas[TitleStats.bucket(new_score)] += 1
+        return deltas
+    
+    @staticmethod
+    def get_rating(movie_id, user_id):
+        """Puntuación del usuario para una película"""
+        return Rating.query.filter_by(movie_id=movie_id, user_id=user_id).first()
+    
+    @staticmethod
+    def rate_movie(movie, user_id, score):
+        """
+        Crear o cambiar la puntuación del usuario. El cambio es condicional
+        a la puntuación leída, así dos requests simultáneos no descuadran
+        el histograma. Retorna (puntuación, creada).
+        """
+        for _ in range(3):
+            rating = ActivityService.get_rating(movie.id, user_id)
+            
+            if rating is None:
+                rating = Rating(user_id=user_id, movie_id=movie.id, tmdb_id=movie.imdb_id, score=score)
+                db.session.add(rating)
+                try:
+                    db.session.flush()
+                except IntegrityError:
+                    # Otro request la creó primero: se reintenta como cambio
+                    db.session.rollback()
+                    continue
+                ActivityService._apply_deltas(rating.tmdb_id, ActivityService._rating_deltas(None, score))
+                db.session.commit()
+                return rating, True
+            
+            old_score = rating.score
+            result = db.session.execute(
+                update(Rating)
+                .where(Rating.id == rating.id, Rating.score == old_score)
+                .values(score=score)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                db.session.rollback()
+                continue
+            
+            ActivityService._apply_deltas(rating.tmdb_id, ActivityService._rating_deltas(old_score, score))
+            db.session.commit()
+            return ActivityService.get_rating(movie.id, user_id), False
+        
+        raise RuntimeError('Conflicto persistente al guardar la puntuación')
+    
+    @staticmethod
+    def delete_rating(movie_id, user_id):
+        """Eliminar la puntuación del usuario"""
+        for _ in range(3):
+            rating = ActivityService.get_rating(movie_id, user_id)
+            
+            if not rating:
+                return False
+            
+            # Condicional a la puntuación leída (ver rate_movie)
+            deleted = Rating.query.filter_by(id=rating.id, score=rating.score).delete(synchronize_session=False)
+            if not deleted:
+                db.session.rollback()
+                continue
+            
+            ActivityService._apply_deltas(rating.tmdb_id, ActivityService._rating_deltas(rating.score, None))
+            db.session.commit()
+            return True
+        
+        raise RuntimeError('Conflicto persistente al eliminar la puntuación')
+    
+    @staticmethod
+    def add_watch(movie, user_id, watched_at=None):
+        """Registrar una visualización"""
+        event = WatchEvent(
+            user_id=user_id,
+            movie_id=movie.id,
+            tmdb_id=movie.imdb_id,
+            watched_at=watched_at or datetime.utcnow()
+        )
+        db.session.add(event)
+        ActivityService._apply_deltas(event.tmdb_id, {'watch_count': 1})
+        db.session.commit()
+        
+        return event
+    
+    @staticmethod
+    def delete_watch(movie_id, user_id, watch_id):
+        """Eliminar una visualización del historial"""
+        event = WatchEvent.query.filter_by(id=watch_id, movie_id=movie_id, user_id=user_id).first()
+        
+        if not event:
+            return False
+        
+        if WatchEvent.query.filter_by(id=event.id).delete(synchronize_session=False):
+            ActivityService._apply_deltas(event.tmdb_id, {'watch_count': -1})
+        db.session.commit()
+        
+        return True
+    
+    @staticmethod
+    def get_history(user_id, limit, cursor=None):
+        """
+        Historial del usuario, más reciente primero (keyset sobre el índice
+        (user_id, watched_at, id)). Retorna (visualizaciones, cursor siguiente).
+        """
+        query = WatchEvent.query.filter(WatchEvent.user_id == user_id)
+        
+        if cursor:
+            try:
+                watched_at, _, watch_id = cursor.rpartition('|')
+                position = (datetime.fromisoformat(watched_at), int(watch_id))
+            except ValueError:
+                raise ValueError('Cursor inválido') from None
+            query = query.filter(tuple_(WatchEvent.watched_at, WatchEvent.id) < position)
+        
+        events = query.order_by(WatchEvent.watched_at.desc(), WatchEvent.id.desc()).limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(events) > limit:
+            events = events[:limit]
+            next_cursor = f'{events[-1].watched_at.isoformat()}|{events[-1].id}'
+        
+        return events, next_cursor
+    
+    @staticmethod
+    def get_title_stats(tmdb_id):
+        """Agregados de un título (una fila)"""
+        return db.session.get(TitleStats, str(tmdb_id))
+    
+    @staticmethod
+    def most_watched(limit):
+        """Títulos más vistos (recorre el índice de watch_count)"""
+        return (
+            TitleStats.query
+            .filter(TitleStats.watch_count > 0)
+            .order_by(TitleStats.watch_count.desc(), TitleStats.tmdb_id)
+            .limit(limit)
+            .all()
+        )
+    
+    @staticmethod
+    def remove_movie_activity(movie):
+        """
+        Borrar puntuaciones y visualizaciones de una película descontándolas
+        de los agregados. No hace commit: va en la transacción del borrado.
+        """
+        for rating in Rating.query.filter_by(movie_id=movie.id):
+            ActivityService._apply_deltas(rating.tmdb_id, ActivityService._rating_deltas(rating.score, None))
+        
+        watches = (
+            db.session.query(WatchEvent.tmdb_id, func.count(WatchEvent.id))
+            .filter(WatchEvent.movie_id == movie.id)
+            .group_by(WatchEvent.tmdb_id)
+            .all()
+        )
+        for tmdb_id, count in watches:
+            ActivityService._apply_deltas(tmdb_id, {'watch_count': -count})
+        
+        WatchEvent.query.filter_by(movie_id=movie.id).delete(synchronize_session=False)
+        Rating.query.filter_by(movie_id=movie.id).delete(synchronize_session=False)
+    
+    @staticmethod
+    def _actual_counters():
+        """Valor real de cada contador de TitleStats (subconsultas correlacionadas por título)"""
+        def count(model, *conditions):
+            return (
+                select(func.count(model.id))
+                .where(model.tmdb_id == TitleStats.tmdb_id, *conditions)
+                .scalar_subquery()
+            )
+        
+        counters = {
+            'rating_count': count(Rating),
+            'rating_sum': (
+                select(func.coalesce(func.sum(Rating.score), 0))
+                .where(Rating.tmdb_id == TitleStats.tmdb_id)
+                .scalar_subquery()
+            ),
+            'watch_count': count(WatchEvent)
+        }
+        for score in RATING_SCORES:
+            counters[TitleStats.bucket(score)] = count(Rating, Rating.score == score)
+        return counters
+    
+    @staticmethod
+    def reconcile():
+        """
+        Reconstruir TitleStats a partir de ratings y watch_events. Retorna
+        el número de títulos corregidos.
+        
+        Cada paso es una única sentencia que recalcula los contadores en la
+        base de datos (UPDATE ... SET col = (SELECT ...)): no hay lectura
+        previa en Python, así que no pisa incrementos concurrentes de
+        _apply_deltas.
+        """
+        # Títulos con actividad y sin fila de agregados (se crean en cero)
+        active = union(
+            select(Rating.tmdb_id).where(Rating.tmdb_id.isnot(None)),
+            select(WatchEvent.tmdb_id).where(WatchEvent.tmdb_id.isnot(None))
+        ).subquery()
+        missing = insert(TitleStats).from_select(
+            ['tmdb_id'],
+            select(active.c.tmdb_id).where(~exists().where(TitleStats.tmdb_id == active.c.tmdb_id))
+        )
+        try:
+            with db.session.begin_nested():
+                db.session.execute(missing)
+        except IntegrityError:
+            # Un request creó alguna de las filas entre medio
+            db.session.execute(missing)
+        
+        # Títulos sin actividad
+        deleted = db.session.execute(
+            delete(TitleStats)
+            .where(
+                ~exists().where(Rating.tmdb_id == TitleStats.tmdb_id),
+                ~exists().where(WatchEvent.tmdb_id == TitleStats.tmdb_id)
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        
+        actual = ActivityService._actual_counters()
+        updated = db.session.execute(
+            update(TitleStats)
+            .where(or_(*(getattr(TitleStats, name) != value for name, value in actual.items())))
+            .values(actual)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        
+        db.session.commit()
+        return updated + deleted
@@ -1,7 +1,49 @@
+from datetime import datetime
+from flask import current_app
 from app import db
 from app.models.user import User
 
 
+class CachedUser:
+    """
+    Vista inmutable de un usuario, segura para compartir entre requests.
+    Expone los mismos atributos que usa UserResponseSchema.
+    """
+    __slots__ = ('id', 'username', 'email', 'created_at')
+    
+    def __init__(self, id, username, email, created_at):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.created_at = created_at
+    
+    @classmethod
+    def from_user(cls, user):
+        """Crear desde el modelo User"""
+        return cls(user.id, user.username, user.email, user.created_at)
+    
+    @classmethod
+    def from_claims(cls, user_id, claims):
+        """Crear desde los claims firmados del JWT (None si faltan datos)"""
+        if not claims or 'username' not in claims or 'email' not in claims:
+            return None
+        
+        created_at = claims.get('created_at')
+        if created_at:
+            created_at = datetime.fromisoformat(created_at)
+        
+        return cls(user_id, claims['username'], claims['email'], created_at)
+    
+    def to_dict(self):
+        """Convertir usuario a diccionario"""
+        return {
+            'id': self.id,
+            'username': self.username,
+            'email': self.email,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
 class AuthService:
     """Servicio de autenticación"""
     
@@ -32,9 +74,53 @@ class AuthService:
         if not user or not user.check_password(password):
             return None
         
+        # Actualizar el hash de forma transparente si cambió el coste del KDF
+        if user.password_needs_rehash():
+            user.set_password(password)
+            db.session.commit()
+        
         return user
     
     @staticmethod
     def get_user_by_id(user_id):
         """Obtener usuario por ID"""
-        return User.query.get(user_id)
\ No newline at end of file
+        return User.query.get(user_id)
+    
+    @staticmethod
+    def token_claims(user):
+        """Claims adicionales del JWT para resolver el usuario sin consultar la BD"""
+        return {
+            'username': user.username,
+            'email': user.email,
+            'created_at': user.created_at.isoformat() if user.created_at else None
+        }
+    
+    @staticmethod
+    def resolve_user(user_id, claims=None):
+        """
+        Resolver el usuario autenticado de un request.
+        
+        Si USER_CACHE_TRUST_JWT_CLAIMS está activo se usan los claims firmados
+        del token; si no, se consulta la caché por proceso y solo en un fallo
+        de caché se va a la base de datos.
+        """
+        if user_id is None:
+            return None
+        
+        if current_app.config.get('USER_CACHE_TRUST_JWT_CLAIMS'):
+            user = CachedUser.from_claims(user_id, claims)
+            if user is not None:
+                return user
+        
+        cache = current_app.extensions['user_cache']
+        key = str(user_id)
+        user = cache.get(key)
+        
+        if user is None:
+            db_user = AuthService.get_user_by_id(user_id)
+            if not db_user:
+                return None
+            user = CachedUser.from_user(db_user)
+            cache.set(key, user)
+        
+        return user
\ No newline at end of file
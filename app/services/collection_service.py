@@ -0,0 +1,219 @@
+from flask import current_app
+from sqlalchemy import func, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.collection import Collection, CollectionItem
+from app.models.movie import Movie
+from app.utils.jobs import get_job_runner
+from app.utils.rank import key_between, spread_keys
+
+
+class CollectionError(Exception):
+    """Error de una operación sobre colecciones (status_code es el HTTP a responder)"""
+    
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CollectionService:
+    """
+    Servicio de colecciones ordenadas.
+    
+    El orden se guarda como claves fraccionarias (app.utils.rank): agregar
+    o mover un elemento calcula una clave entre sus nuevos vecinos y
+    escribe solo esa fila. Cuando una clave se vuelve demasiado larga se
+    encola un rebalanceo de la colección en segundo plano.
+    """
+    
+    # after_item_id omitido: al final de la colección
+    END = object()
+    REBALANCE_ATTEMPTS = 3
+    
+    @staticmethod
+    def create_collection(user_id, name):
+        """Crear nueva colección"""
+        collection = Collection(name=name, user_id=user_id)
+        db.session.add(collection)
+        db.session.commit()
+        return collection
+    
+    @staticmethod
+    def get_user_collections(user_id):
+        """Colecciones del usuario con su número de elementos: [(colección, total)]"""
+        return (
+            db.session.query(Collection, func.count(CollectionItem.id))
+            .outerjoin(CollectionItem, CollectionItem.collection_id == Collection.id)
+            .filter(Collection.user_id == user_id)
+            .group_by(Collection.id)
+            .order_by(Collection.id)
+            .all()
+        )
+    
+    @staticmethod
+    def get_collection(collection_id, user_id):
+        """Obtener colección específica del usuario"""
+        return Collection.query.filter_by(id=collection_id, user_id=user_id).first()
+    
+    @staticmethod
+    def delete_collection(collection_id, user_id):
+        """Eliminar colección y sus elementos"""
+        collection = CollectionService.get_collection(collection_id, user_id)
+        
+        if not collection:
+            return False
+        
+        # Borrado en bloque: no cargar los elementos de colecciones grandes
+        CollectionItem.query.filter_by(collection_id=collection.id).delete(synchronize_session=False)
+        db.session.delete(collection)
+        db.session.commit()
+        
+        return True
+    
+    @staticmethod
+    def get_items(collection_id, limit, cursor=None):
+        """
+        Página de elementos en orden (paginación por keyset sobre el índice
+        (collection_id, rank, id)). Retorna (elementos, cursor siguiente o None).
+        """
+        query = CollectionItem.query.filter(CollectionItem.collection_id == collection_id)
+        
+        if cursor:
+            rank, item_id = CollectionService._parse_cursor(cursor)
+            query = query.filter(tuple_(CollectionItem.rank, CollectionItem.id) > tuple_(rank, item_id))
+        
+        items = query.order_by(CollectionItem.rank, CollectionItem.id).limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = f'{items[-1].rank}:{items[-1].id}'
+        
+        return items, next_cursor
+    
+    @staticmethod
+    def _parse_cursor(cursor):
+        rank, _, item_id = cursor.rpartition(':')
+        if not rank or not item_id.isdigit():
+            raise CollectionError('Cursor inválido', 400)
+        return rank, int(item_id)
+    
+    @staticmethod
+    def add_item(collection, user_id, movie_id, after_item_id=END):
+        """Agregar una película del usuario en la posición indicada"""
+        if not Movie.query.filter_by(id=movie_id, user_id=user_id).first():
+            raise CollectionError('Película no encontrada', 404)
+        
+        rank = CollectionService._rank_after(collection.id, after_item_id)
+        item = CollectionItem(collection_id=collection.id, movie_id=movie_id, rank=rank)
+        db.session.add(item)
+        
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            raise CollectionError('La película ya está en la colección', 409) from None
+        
+        CollectionService._maybe_rebalance(collection.id, rank)
+        return item
+    
+    @staticmethod
+    def move_item(collection, item_id, after_item_id=END):
+        """Mover un elemento: solo se actualiza su clave de orden"""
+        item = CollectionItem.query.filter_by(id=item_id, collection_id=collection.id).first()
+        
+        if not item:
+            return None
+        
+        if after_item_id == item.id:
+            raise CollectionError('Un elemento no puede ubicarse después de sí mismo', 400)
+        
+        item.rank = CollectionService._rank_after(collection.id, after_item_id, exclude_id=item.id)
+        db.session.commit()
+        
+        CollectionService._maybe_rebalance(collection.id, item.rank)
+        return item
+    
+    @staticmethod
+    def remove_item(collection, item_id):
+        """Quitar un elemento de la colección"""
+        deleted = CollectionItem.query.filter_by(
+            id=item_id, collection_id=collection.id
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        
+        return deleted > 0
+    
+    @staticmethod
+    def _rank_after(collection_id, after_item_id, exclude_id=None):
+        """
+        Clave para ubicar un elemento después de `after_item_id`
+        (None = al inicio, END = al final).
+        """
+        items = CollectionItem.query.filter(CollectionItem.collection_id == collection_id)
+        if exclude_id is not None:
+            items = items.filter(CollectionItem.id != exclude_id)
+        ranks = items.with_entities(CollectionItem.rank)
+        
+        if after_item_id is CollectionService.END:
+            last = ranks.order_by(CollectionItem.rank.desc()).limit(1).scalar()
+            return key_between(last, None)
+        
+        if after_item_id is None:
+            first = ranks.order_by(CollectionItem.rank).limit(1).scalar()
+            return key_between(None, first)
+        
+        anchor = ranks.filter(CollectionItem.id == after_item_id).scalar()
+        if anchor is None:
+            raise CollectionError('after_item_id no pertenece a la colección', 400)
+        
+        following = ranks.filter(CollectionItem.rank > anchor).order_by(CollectionItem.rank).limit(1).scalar()
+        return key_between(anchor, following)
+    
+    @staticmethod
+    def _maybe_rebalance(collection_id, rank):
+        """Encolar el rebalanceo si la clave superó COLLECTION_RANK_MAX_LENGTH"""
+        if len(rank) > current_app.config['COLLECTION_RANK_MAX_LENGTH']:
+            get_job_runner().submit(
+                f'collection-rebalance:{collection_id}',
+                CollectionService.rebalance,
+                collection_id
+            )
+    
+    @staticmethod
+    def rebalance(collection_id):
+        """
+        Reasignar claves cortas y equidistantes manteniendo el orden.
+        
+        Cada UPDATE exige que la clave no haya cambiado desde la lectura; si
+        un request movió un elemento mientras tanto, se deshace y se reintenta.
+        """
+        for _ in range(CollectionService.REBALANCE_ATTEMPTS):
+            rows = (
+                db.session.query(CollectionItem.id, CollectionItem.rank)
+                .filter(CollectionItem.collection_id == collection_id)
+                .order_by(CollectionItem.rank, CollectionItem.id)
+                .all()
+            )
+            
+            conflict = False
+            for (item_id, old_rank), new_rank in zip(rows, spread_keys(len(rows))):
+                if old_rank == new_rank:
+                    continue
+                result = db.session.execute(
+                    update(CollectionItem)
+                    .where(CollectionItem.id == item_id, CollectionItem.rank == old_rank)
+                    .values(rank=new_rank)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount == 0:
+                    conflict = True
+                    break
+            
+            if not conflict:
+                db.session.commit()
+                return True
+            db.session.rollback()
+        
+        current_app.logger.warning(f'No se pudo rebalancear la colección {collection_id}')
+        return False
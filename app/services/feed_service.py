@@ -0,0 +1,320 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import exists, insert, literal, select, true, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models.movie import Movie
+from app.models.social import Follow, TimelineEntry
+from app.models.user import User
+from app.utils.jobs import get_job_runner
+
+
+class _RepairState:
+    """Momento de la última reparación del feed de una aplicación"""
+    
+    def __init__(self, config):
+        self.interval = config['FEED_REPAIR_INTERVAL']
+        # La primera oportunidad tras arrancar repara lo que el reinicio perdió
+        self.last_repair = float('-inf')
+        self.lock = threading.Lock()
+
+
+class FeedError(Exception):
+    """Error de una operación de seguimiento (status_code es el HTTP a responder)"""
+    
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FeedService:
+    """
+    Seguimientos y feed de actividad.
+    
+    Al crear una película, una tarea de fondo copia una fila por seguidor
+    en timeline_entries (fan-out on write) con un único INSERT ... SELECT;
+    leer el feed es un rango del índice del usuario. Los autores con
+    FEED_CELEBRITY_THRESHOLD seguidores o más no se copian: sus películas
+    se leen al pedir el feed (pull on read) y se mezclan por fecha.
+    
+    Las tareas viven en la cola en memoria del proceso: fanned_out_at
+    (películas) y backfilled_at (seguimientos) marcan las terminadas, y
+    repair() repite las que quedaron pendientes.
+    """
+    
+    @staticmethod
+    def init_app(app):
+        app.extensions['feed'] = _RepairState(app.config)
+    
+    @staticmethod
+    def is_celebrity(follower_count):
+        return follower_count >= current_app.config['FEED_CELEBRITY_THRESHOLD']
+    
+    @staticmethod
+    def follow(follower_id, followee_id):
+        """Seguir a un usuario. Retorna False si ya lo seguía."""
+        if follower_id == followee_id:
+            raise FeedError('No puedes seguirte a ti mismo', 400)
+        
+        if not db.session.get(User, followee_id):
+            raise FeedError('Usuario no encontrado', 404)
+        
+        db.session.add(Follow(follower_id=follower_id, followee_id=followee_id))
+        try:
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        
+        FeedService._add_followers(followee_id, 1)
+        db.session.commit()
+        
+        FeedService.schedule_repair()
+        # Traer al feed las películas recientes del nuevo seguido
+        get_job_runner().submit(
+            f'feed-backfill:{follower_id}:{followee_id}',
+            FeedService.backfill,
+            follower_id,
+            followee_id
+        )
+        return True
+    
+    @staticmethod
+    def unfollow(follower_id, followee_id):
+        """Dejar de seguir y quitar sus películas del feed"""
+        deleted = Follow.query.filter_by(
+            follower_id=follower_id, followee_id=followee_id
+        ).delete(synchronize_session=False)
+        
+        if not deleted:
+            db.session.rollback()
+            return False
+        
+        FeedService._add_followers(followee_id, -1)
+        TimelineEntry.query.filter_by(
+            user_id=follower_id, actor_id=followee_id
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        
+        return True
+    
+    @staticmethod
+    def _add_followers(user_id, delta):
+        db.session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(follower_count=User.follower_count + delta)
+            .execution_options(synchronize_session=False)
+        )
+    
+    @staticmethod
+    def _copy_to_timelines(followers, movies):
+        """
+        INSERT ... SELECT de (seguidor, película) sin duplicar filas.
+        `followers` y `movies` son selects de (user_id) y de
+        (movie_id, actor_id, created_at).
+        """
+        rows = select(
+            followers.c.user_id,
+            movies.c.movie_id,
+            movies.c.actor_id,
+            movies.c.created_at
+        ).select_from(
+            followers.join(movies, true())
+        ).where(
+            ~exists().where(
+                TimelineEntry.user_id == followers.c.user_id,
+                TimelineEntry.movie_id == movies.c.movie_id
+            )
+        )
+        result = db.session.execute(
+            insert(TimelineEntry).from_select(['user_id', 'movie_id', 'actor_id', 'created_at'], rows)
+        )
+        return result.rowcount
+    
+    @staticmethod
+    def on_movie_created(movie):
+        """Encolar el fan-out de una película recién creada"""
+        FeedService.schedule_repair()
+        get_job_runner().submit(f'feed-fanout:{movie.id}', FeedService.fan_out, movie.id)
+    
+    @staticmethod
+    def fan_out(movie_id):
+        """Copiar la película al feed de cada seguidor del autor (tarea de fondo)"""
+        movie = db.session.get(Movie, movie_id)
+        if movie is None:
+            return 0
+        
+        follower_count = db.session.query(User.follower_count).filter(User.id == movie.user_id).scalar()
+        if not follower_count or FeedService.is_celebrity(follower_count):
+            FeedService._mark_fanned_out(movie_id)
+            db.session.commit()
+            return 0
+        
+        followers = (
+            select(Follow.follower_id.label('user_id'))
+            .where(Follow.followee_id == movie.user_id)
+            .subquery()
+        )
+        movies = select(
+            literal(movie.id).label('movie_id'),
+            literal(movie.user_id).label('actor_id'),
+            literal(movie.created_at, Movie.created_at.type).label('created_at')
+        ).subquery()
+        
+        copied = FeedService._copy_to_timelines(followers, movies)
+        FeedService._mark_fanned_out(movie_id)
+        db.session.commit()
+        return copied
+    
+    @staticmethod
+    def _mark_fanned_out(movie_id):
+        # updated_at explícito: marcar el fan-out no es una edición de la película
+        db.session.execute(
+            update(Movie)
+            .where(Movie.id == movie_id)
+            .values(fanned_out_at=datetime.utcnow(), updated_at=Movie.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+    
+    @staticmethod
+    def backfill(follower_id, followee_id):
+        """Copiar al feed las últimas FEED_BACKFILL_SIZE películas de un seguido"""
+        followee = db.session.get(User, followee_id)
+        following = db.session.get(Follow, (follower_id, followee_id))
+        if followee is None or following is None:
+            return 0
+        if FeedService.is_celebrity(followee.follower_count):
+            following.backfilled_at = datetime.utcnow()
+            db.session.commit()
+            return 0
+        
+        followers = select(literal(follower_id).label('user_id')).subquery()
+        movies = (
+            select(
+                Movie.id.label('movie_id'),
+                Movie.user_id.label('actor_id'),
+                Movie.created_at.label('created_at')
+            )
+            .where(Movie.user_id == followee_id)
+            .order_by(Movie.created_at.desc(), Movie.id.desc())
+            .limit(current_app.config['FEED_BACKFILL_SIZE'])
+            .subquery()
+        )
+        
+        copied = FeedService._copy_to_timelines(followers, movies)
+        following.backfilled_at = datetime.utcnow()
+        db.session.commit()
+        return copied
+    
+    @staticmethod
+    def repair():
+        """
+        Repetir los fan-outs y backfills sin terminar (la tarea se perdió al
+        reiniciar el proceso o no entró en la cola). Solo se miran los
+        creados entre FEED_REPAIR_WINDOW y FEED_REPAIR_GRACE segundos atrás:
+        los más nuevos aún pueden estar en la cola. Ambas copias son
+        idempotentes. Retorna (películas, seguimientos) reparados.
+        """
+        config = current_app.config
+        now = datetime.utcnow()
+        settled = now - timedelta(seconds=config['FEED_REPAIR_GRACE'])
+        oldest = now - timedelta(seconds=config['FEED_REPAIR_WINDOW'])
+        batch = config['FEED_REPAIR_BATCH']
+        
+        movie_ids = [
+            movie_id for (movie_id,) in
+            db.session.query(Movie.id)
+            .filter(Movie.fanned_out_at.is_(None), Movie.created_at.between(oldest, settled))
+            .order_by(Movie.created_at)
+            .limit(batch)
+        ]
+        follows = (
+            db.session.query(Follow.follower_id, Follow.followee_id)
+            .filter(Follow.backfilled_at.is_(None), Follow.created_at.between(oldest, settled))
+            .order_by(Follow.created_at)
+            .limit(batch)
+            .all()
+        )
+        
+        for movie_id in movie_ids:
+            FeedService.fan_out(movie_id)
+        for follower_id, followee_id in follows:
+            FeedService.backfill(follower_id, followee_id)
+        
+        return len(movie_ids), len(follows)
+    
+    @staticmethod
+    def schedule_repair():
+        """Encolar la reparación si pasó FEED_REPAIR_INTERVAL desde la última"""
+        state = current_app.extensions['feed']
+        with state.lock:
+            if time.monotonic() - state.last_repair < state.interval:
+                return
+            state.last_repair = time.monotonic()
+        
+        get_job_runner().submit('feed-repair', FeedService.repair)
+    
+    @staticmethod
+    def remove_movie(movie):
+        """Quitar una película de todos los feeds (sin commit)"""
+        TimelineEntry.query.filter_by(movie_id=movie.id).delete(synchronize_session=False)
+    
+    @staticmethod
+    def _parse_cursor(cursor):
+        try:
+            created_at, _, movie_id = cursor.rpartition('|')
+            return datetime.fromisoformat(created_at), int(movie_id)
+        except ValueError:
+            raise FeedError('Cursor inválido', 400) from None
+    
+    @staticmethod
+    def get_feed(user_id, limit, cursor=None):
+        """
+        Página del feed, más reciente primero: filas materializadas más las
+        películas de autores populares seguidos, mezcladas por
+        (created_at, movie_id). Retorna (películas, cursor siguiente o None).
+        """
+        position = FeedService._parse_cursor(cursor) if cursor else None
+        
+        timeline = db.session.query(TimelineEntry.created_at, TimelineEntry.movie_id).filter(
+            TimelineEntry.user_id == user_id
+        )
+        if position:
+            timeline = timeline.filter(tuple_(TimelineEntry.created_at, TimelineEntry.movie_id) < position)
+        candidates = timeline.order_by(
+            TimelineEntry.created_at.desc(), TimelineEntry.movie_id.desc()
+        ).limit(limit + 1).all()
+        
+        celebrities = [
+            followee_id for (followee_id,) in
+            db.session.query(Follow.followee_id)
+            .join(User, User.id == Follow.followee_id)
+            .filter(
+                Follow.follower_id == user_id,
+                User.follower_count >= current_app.config['FEED_CELEBRITY_THRESHOLD']
+            )
+        ]
+        if celebrities:
+            pulled = db.session.query(Movie.created_at, Movie.id).filter(Movie.user_id.in_(celebrities))
+            if position:
+                pulled = pulled.filter(tuple_(Movie.created_at, Movie.id) < position)
+            candidates += pulled.order_by(Movie.created_at.desc(), Movie.id.desc()).limit(limit + 1).all()
+        
+        # Una película pudo copiarse antes de que su autor fuera popular
+        ordered = sorted(set(candidates), reverse=True)[:limit + 1]
+        
+        next_cursor = None
+        if len(ordered) > limit:
+            ordered = ordered[:limit]
+            created_at, movie_id = ordered[-1]
+            next_cursor = f'{created_at.isoformat()}|{movie_id}'
+        
+        movies = {
+            movie.id: movie for movie in
+            Movie.query.options(joinedload(Movie.user)).filter(Movie.id.in_([movie_id for _, movie_id in ordered]))
+        }
+        return [movies[movie_id] for _, movie_id in ordered if movie_id in movies], next_cursor
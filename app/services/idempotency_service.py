@@ -0,0 +1,237 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.idempotency import IdempotencyKey
+from app.utils.jobs import get_job_runner
+
+
+class _PurgeState:
+    """Momento de la última purga de claves expiradas de una aplicación"""
+
+    def __init__(self, config):
+        self.interval = config['IDEMPOTENCY_PURGE_INTERVAL']
+        self.last_purge = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class IdempotencyService:
+    """
+    Servicio de claves de idempotencia (header Idempotency-Key).
+
+    El primer request con una clave inserta una fila "en curso"; la
+    restricción única (scope, key) hace que los duplicados simultáneos la
+    encuentren y esperen a que se guarde la respuesta. La fila en curso está
+    reservada hasta locked_until (IDEMPOTENCY_LOCK_TIMEOUT): vencida la
+    reserva, un reintento la retoma con un UPDATE condicional y solo el
+    dueño de la reserva vigente puede guardar o liberar. Las filas expiran
+    tras IDEMPOTENCY_TTL y se borran en bloque cada
+    IDEMPOTENCY_PURGE_INTERVAL segundos (o con `flask purge-idempotency-keys`).
+    """
+
+    @staticmethod
+    def init_app(app):
+        app.extensions['idempotency'] = _PurgeState(app.config)
+
+    @staticmethod
+    def fingerprint(method, path, body):
+        """Huella del request que la clave no puede cambiar"""
+        digest = hashlib.sha256(f'{method} {path}\n'.encode())
+        digest.update(body)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _get(scope, key):
+        return (
+            IdempotencyKey.query
+            .filter_by(scope=scope, key=key)
+            .populate_existing()
+            .first()
+        )
+
+    @staticmethod
+    def _lock_timeout():
+        return timedelta(seconds=current_app.config['IDEMPOTENCY_LOCK_TIMEOUT'])
+
+    @staticmethod
+    def lease_expired(record, now=None):
+        """Indica si la reserva de un registro en curso venció (su worker no terminó)"""
+        now = now or datetime.utcnow()
+        locked_until = record.locked_until
+        if locked_until is None:
+            locked_until = record.created_at + IdempotencyService._lock_timeout()
+        return not record.completed and locked_until <= now
+
+    @staticmethod
+    def _take_over(record, now):
+        """
+        Renovar la reserva vencida de `record`. El UPDATE solo afecta a la
+        fila si sigue en curso con la reserva vencida: de varios reintentos
+        simultáneos la retoma uno solo.
+        """
+        result = db.session.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.id == record.id,
+                IdempotencyKey.status_code.is_(None),
+                or_(
+                    IdempotencyKey.locked_until <= now,
+                    and_(
+                        IdempotencyKey.locked_until.is_(None),
+                        IdempotencyKey.created_at <= now - IdempotencyService._lock_timeout()
+                    )
+                )
+            )
+            .values(locked_until=now + IdempotencyService._lock_timeout())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    def begin(scope, key, fingerprint):
+        """
+        Reservar la clave. Retorna (registro, creado); si ya existía y no ha
+        expirado, el registro es el del primer request. Un registro en curso
+        con la reserva vencida y la misma huella se retoma (creado=True).
+        """
+        now = datetime.utcnow()
+        ttl = timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])
+
+        for _ in range(3):
+            record = IdempotencyKey(
+                scope=scope,
+                key=key,
+                fingerprint=fingerprint,
+                created_at=now,
+                locked_until=now + IdempotencyService._lock_timeout(),
+                expires_at=now + ttl
+            )
+            db.session.add(record)
+            try:
+                db.session.commit()
+                return record, True
+            except IntegrityError:
+                db.session.rollback()
+
+            existing = IdempotencyService._get(scope, key)
+            if existing is None:
+                # Se liberó o purgó entre medio
+                continue
+            if existing.expires_at > now:
+                if existing.fingerprint == fingerprint and IdempotencyService.lease_expired(existing, now):
+                    if IdempotencyService._take_over(existing, now):
+                        return IdempotencyService._get(scope, key), True
+                    # Otro reintento la retomó o terminó: volver a leerla
+                    continue
+                return existing, False
+
+            # Expirada pero aún sin purgar: ocupa su lugar un request nuevo
+            db.session.execute(
+                delete(IdempotencyKey)
+                .where(IdempotencyKey.id == existing.id, IdempotencyKey.expires_at <= now)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.expunge(existing)
+            db.session.commit()
+
+        raise RuntimeError('Conflicto persistente al reservar la clave de idempotencia')
+
+    @staticmethod
+    def wait(scope, key, deadline):
+        """
+        Esperar a que el primer request termine (hasta `deadline`, en
+        time.monotonic) o a que venza su reserva. Retorna el registro, o
+        None si se liberó.
+        """
+        interval = current_app.config['IDEMPOTENCY_POLL_INTERVAL']
+
+        while True:
+            # Terminar la transacción para ver lo que otros workers confirmaron
+            db.session.rollback()
+            record = IdempotencyService._get(scope, key)
+            if record is None or record.completed or IdempotencyService.lease_expired(record):
+                return record
+            if time.monotonic() >= deadline:
+                return record
+            time.sleep(interval)
+
+    @staticmethod
+    def complete(record_id, locked_until, response, headers):
+        """
+        Guardar la respuesta que se repetirá a los duplicados. Si la reserva
+        (`locked_until`) ya no es la de este request, otro la retomó y la
+        respuesta no se guarda.
+        """
+        db.session.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.id == record_id,
+                IdempotencyKey.status_code.is_(None),
+                IdempotencyKey.locked_until == locked_until
+            )
+            .values(
+                status_code=response.status_code,
+                response_body=response.get_data(as_text=True),
+                response_headers=json.dumps({
+                    name: response.headers[name] for name in headers if name in response.headers
+                })
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    @staticmethod
+    def release(record_id, locked_until):
+        """Liberar la clave de un request fallido: un reintento vuelve a ejecutarlo"""
+        db.session.rollback()
+        db.session.execute(
+            delete(IdempotencyKey)
+            .where(
+                IdempotencyKey.id == record_id,
+                IdempotencyKey.status_code.is_(None),
+                IdempotencyKey.locked_until == locked_until
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    @staticmethod
+    def purge_expired():
+        """Borrar las claves expiradas en lotes de IDEMPOTENCY_PURGE_BATCH"""
+        batch = current_app.config['IDEMPOTENCY_PURGE_BATCH']
+        now = datetime.utcnow()
+        deleted = 0
+
+        while True:
+            expired = (
+                select(IdempotencyKey.id)
+                .where(IdempotencyKey.expires_at <= now)
+                .limit(batch)
+                .scalar_subquery()
+            )
+            result = db.session.execute(
+                delete(IdempotencyKey)
+                .where(IdempotencyKey.id.in_(expired))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            deleted += result.rowcount
+            if result.rowcount < batch:
+                return deleted
+
+    @staticmethod
+    def schedule_purge():
+        """Encolar la purga si pasó IDEMPOTENCY_PURGE_INTERVAL desde la última"""
+        state = current_app.extensions['idempotency']
+        with state.lock:
+            if time.monotonic() - state.last_purge < state.interval:
+                return
+            state.last_purge = time.monotonic()
+
+        get_job_runner().submit('idempotency-purge', IdempotencyService.purge_expired)
@@ -1,31 +1,82 @@
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 from app import db
 from app.models.movie import Movie
 from app.services.tmdb_service import TMDbService
+from app.services.activity_service import ActivityService
+from app.services.feed_service import FeedService
+
+
+class VersionConflictError(Exception):
+    """La película cambió desde la versión que el cliente envió en If-Match"""
+    
+    def __init__(self, current_version):
+        super().__init__('La película fue modificada por otra solicitud')
+        self.current_version = current_version
+
+
+class DuplicateMovieError(Exception):
+    """El usuario ya tiene una película con ese tmdb_id (uq_movies_user_tmdb)"""
+    
+    def __init__(self, tmdb_id):
+        super().__init__(f'Ya tienes una película con tmdb_id {tmdb_id}')
+        self.tmdb_id = tmdb_id
 
 
 class MovieService:
     """Servicio de películas"""
     
     @staticmethod
-    def create_movie(user_id, title, year, director, genre, tmdb_id=None):
-        """Crear nueva película"""
+    def create_movie(user_id, title=None, year=None, director=None, genre=None, tmdb_id=None):
+        """
+        Crear nueva película.
+        
+        Con tmdb_id, los campos que no se envíen se completan con los
+        detalles y créditos de TMDB (una sola llamada, cacheada).
+        """
+        poster_url = None
+        
+        # Si existe tmdb_id, obtener poster y campos faltantes de TMDB
+        if tmdb_id:
+            details = TMDbService.get_movie_details(tmdb_id)
+            fields = TMDbService.movie_fields(details) if details else {}
+            title = title or fields.get('title')
+            year = year or fields.get('year')
+            director = director or fields.get('director')
+            genre = genre or fields.get('genre')
+            poster_url = fields.get('poster_url')
+        
+        missing = [
+            name for name, value in
+            (('title', title), ('year', year), ('director', director), ('genre', genre))
+            if not value
+        ]
+        if missing:
+            raise ValueError(f"No se pudieron obtener de TMDB: {', '.join(missing)}")
+        
         movie = Movie(
             title=title,
             year=year,
             director=director,
             genre=genre,
             imdb_id=tmdb_id,  # Reutilizamos el campo para TMDB ID
+            poster_url=poster_url,
             user_id=user_id
         )
         
-        # Si existe tmdb_id, obtener poster de TMDB
-        if tmdb_id:
-            poster_url = TMDbService.get_poster_url(tmdb_id)
-            if poster_url:
-                movie.poster_url = poster_url
-        
         db.session.add(movie)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            # Solo es un duplicado si el usuario ya tiene ese tmdb_id;
+            # cualquier otra restricción violada se propaga tal cual
+            if tmdb_id and Movie.query.filter_by(user_id=user_id, imdb_id=tmdb_id).first():
+                raise DuplicateMovieError(tmdb_id) from None
+            raise
+        
+        # Copiar a los feeds de los seguidores en segundo plano
+        FeedService.on_movie_created(movie)
         
         return movie
     
@@ -34,31 +85,119 @@ class MovieService:
         """Obtener películas del usuario"""
         return Movie.query.filter_by(user_id=user_id).all()
     
+    @staticmethod
+    def search_library(user_id, title, limit=20):
+        """
+        Buscar en la biblioteca del usuario por título.
+        Retorna (películas que coinciden, set de TMDB IDs de toda la biblioteca).
+        """
+        escaped = title.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        hits = Movie.query.filter(
+            Movie.user_id == user_id,
+            Movie.title.ilike(f'%{escaped}%', escape='\\')
+        ).order_by(Movie.title).limit(limit).all()
+        
+        # imdb_id guarda el TMDB ID (ver create_movie)
+        tmdb_ids = {
+            tmdb_id for (tmdb_id,) in db.session.query(Movie.imdb_id)
+            .filter(Movie.user_id == user_id, Movie.imdb_id.isnot(None))
+        }
+        
+        return hits, tmdb_ids
+    
+    @staticmethod
+    def _title_match(query, title):
+        """3 exacto, 2 prefijo, 1 contiene, 0 sin coincidencia (sin mayúsculas)"""
+        query, title = query.casefold().strip(), (title or '').casefold()
+        if title == query:
+            return 3
+        if title.startswith(query):
+            return 2
+        return 1 if query in title else 0
+    
+    @staticmethod
+    def merge_search_results(title, tmdb_results, library_hits, library_tmdb_ids):
+        """
+        Unir resultados de TMDB y de la biblioteca en una lista ordenada.
+        
+        Cada resultado de TMDB recibe in_library con una sola pasada de
+        pertenencia al set de TMDB IDs del usuario. Las películas de la
+        biblioteca que coinciden con un resultado de TMDB se fusionan con él.
+        Orden: calidad de coincidencia del título, luego en biblioteca, luego
+        el orden de relevancia de TMDB.
+        """
+        library_by_tmdb_id = {
+            hit['imdb_id']: hit for hit in library_hits if hit.get('imdb_id')
+        }
+        
+        ranked = []
+        for position, result in enumerate(tmdb_results):
+            tmdb_id = str(result.get('id'))
+            in_library = tmdb_id in library_tmdb_ids
+            library_movie = library_by_tmdb_id.pop(tmdb_id, None)
+            ranked.append((
+                -MovieService._title_match(title, result.get('title')),
+                not in_library,
+                position,
+                {**result, 'source': 'tmdb', 'in_library': in_library, 'library_movie': library_movie}
+            ))
+        
+        offset = len(tmdb_results)
+        for position, hit in enumerate(library_hits):
+            if hit.get('imdb_id') and hit['imdb_id'] not in library_by_tmdb_id:
+                continue  # ya fusionada con su resultado de TMDB
+            ranked.append((
+                -MovieService._title_match(title, hit.get('title')),
+                False,
+                offset + position,
+                {'source': 'library', 'in_library': True, 'library_movie': hit}
+            ))
+        
+        ranked.sort(key=lambda item: item[:3])
+        return [item[3] for item in ranked]
+    
     @staticmethod
     def get_movie_by_id(movie_id, user_id):
         """Obtener película específica del usuario"""
         return Movie.query.filter_by(id=movie_id, user_id=user_id).first()
     
     @staticmethod
-    def update_movie(movie_id, user_id, **kwargs):
-        """Actualizar película"""
-        movie = MovieService.get_movie_by_id(movie_id, user_id)
-        
-        if not movie:
-            return None
+    def update_movie(movie_id, user_id, expected_versions=None, **kwargs):
+        """
+        Actualizar película con control de concurrencia optimista.
         
-        for key, value in kwargs.items():
-            if hasattr(movie, key) and value is not None:
-                setattr(movie, key, value)
+        Es un único UPDATE condicional que incrementa version, sin SELECT
+        previo ni bloqueo de fila. Con expected_versions (de If-Match) solo
+        se aplica si la versión actual es una de ellas; si no, lanza
+        VersionConflictError. Retorna None si la película no existe.
+        """
+        values = {
+            key: value for key, value in kwargs.items()
+            if key in Movie.__table__.columns and value is not None
+        }
         
         # Si se actualiza tmdb_id, obtener nuevo poster
-        if 'imdb_id' in kwargs and kwargs['imdb_id']:
-            poster_url = TMDbService.get_poster_url(kwargs['imdb_id'])
+        if values.get('imdb_id'):
+            poster_url = TMDbService.get_poster_url(values['imdb_id'])
             if poster_url:
-                movie.poster_url = poster_url
+                values['poster_url'] = poster_url
         
+        conditions = [Movie.id == movie_id, Movie.user_id == user_id]
+        if expected_versions is not None:
+            conditions.append(Movie.version.in_(expected_versions))
+        
+        result = db.session.execute(
+            update(Movie)
+            .where(*conditions)
+            .values(**values, version=Movie.version + 1)
+            .execution_options(synchronize_session=False)
+        )
         db.session.commit()
         
+        movie = MovieService.get_movie_by_id(movie_id, user_id)
+        if result.rowcount == 0 and movie is not None:
+            raise VersionConflictError(movie.version)
+        
         return movie
     
     @staticmethod
@@ -69,6 +208,9 @@ class MovieService:
         if not movie:
             return False
         
+        # Descontar sus puntuaciones y visualizaciones de los agregados
+        ActivityService.remove_movie_activity(movie)
+        FeedService.remove_movie(movie)
         db.session.delete(movie)
         db.session.commit()
         
@@ -0,0 +1,110 @@
+import mimetypes
+import re
+from flask import current_app
+from app.utils.metrics import track_tmdb
+from app.utils.poster_cache import PosterCache
+
+# Nombres de archivo de imágenes de TMDB (p. ej. kqjL17yufvn9OVLyXYpvtyrFfak.jpg)
+POSTER_FILENAME_RE = re.compile(r'^[A-Za-z0-9_-]{1,128}\.(?:jpe?g|png|webp)$')
+# URL de imagen de TMDB guardada en Movie.poster_url
+TMDB_IMAGE_URL_RE = re.compile(r'/t/p/[a-z0-9]+/([^/]+)$')
+
+
+class PosterError(Exception):
+    """Error al obtener un poster (status_code es el HTTP a responder)"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class PosterService:
+    """
+    Proxy de posters de TMDB: cada imagen se descarga una vez por tamaño y
+    se sirve desde la caché en disco (ver PosterCache).
+    """
+
+    @staticmethod
+    def init_app(app):
+        """Crear la caché de posters de la aplicación"""
+        app.extensions['poster_cache'] = PosterCache(
+            app.config['POSTER_CACHE_DIR'],
+            app.config['POSTER_CACHE_MAX_BYTES']
+        )
+
+    @staticmethod
+    def _cache():
+        return current_app.extensions['poster_cache']
+
+    @staticmethod
+    def validate(size, filename):
+        """Validar tamaño y nombre de archivo antes de tocar disco o red"""
+        if size not in current_app.config['POSTER_SIZES']:
+            raise PosterError(f'Tamaño no soportado: {size}', 400)
+
+        if not POSTER_FILENAME_RE.match(filename):
+            raise PosterError('Ruta de poster inválida', 400)
+
+    @staticmethod
+    def get_poster(size, filename):
+        """
+        Retorna (ruta, etag, mimetype) del poster en caché, descargándolo
+        de TMDB si hace falta.
+        """
+        PosterService.validate(size, filename)
+        cache = PosterService._cache()
+        key = f'{size}/{filename}'
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+        cached = cache.get(key)
+        if cached is None:
+            lock = cache.key_lock(key)
+            try:
+                with lock:
+                    # Otro hilo pudo descargarlo mientras esperábamos
+                    cached = cache.get(key)
+                    if cached is None:
+                        cached = cache.put(key, PosterService._download(size, filename))
+            finally:
+                cache.release_key_lock(key)
+
+        path, content_hash = cached
+        return path, content_hash, mimetype
+
+    @staticmethod
+    def _download(size, filename):
+        """Descargar la imagen de TMDB con límite de tamaño"""
+        import requests
+
+        config = current_app.config
+        url = f"{config['TMDB_IMAGE_URL']}/{size}/{filename}"
+        max_bytes = config['POSTER_MAX_BYTES']
+
+        try:
+            with track_tmdb('/t/p/image'):
+                with requests.get(url, timeout=config.get('TMDB_TIMEOUT', 5), stream=True) as response:
+                    if response.status_code == 404:
+                        raise PosterError('Poster no encontrado', 404)
+                    response.raise_for_status()
+
+                    chunks, total = [], 0
+                    for chunk in response.iter_content(64 * 1024):
+                        total += len(chunk)
+                        if total > max_bytes:
+                            raise PosterError('Poster demasiado grande', 502)
+                        chunks.append(chunk)
+        except requests.exceptions.RequestException as e:
+            current_app.logger.error(f'Error downloading poster: {str(e)}')
+            raise PosterError('Error al obtener el poster de TMDB', 502) from None
+
+        return b''.join(chunks)
+
+    @staticmethod
+    def tmdb_filename(poster_url):
+        """Nombre de archivo de TMDB dentro de una URL de poster (o None)"""
+        if not poster_url:
+            return None
+        match = TMDB_IMAGE_URL_RE.search(poster_url)
+        if match and POSTER_FILENAME_RE.match(match.group(1)):
+            return match.group(1)
+        return None
@@ -0,0 +1,226 @@
+import asyncio
+from functools import lru_cache
+from flask import current_app
+from app.services.tmdb_service import TMDbService
+from app.utils.metrics import track_tmdb
+from app.utils.rate_limit import MemoryStore
+
+
+class TMDbError(Exception):
+    """Error al consultar TMDB (timeout, red o respuesta de error)"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@lru_cache(maxsize=None)
+def _ssl_context():
+    """
+    Contexto TLS compartido por el proceso. Crearlo (cargar los certificados
+    de CA) cuesta decenas de ms; el cliente httpx en sí no puede reutilizarse
+    entre requests porque sus conexiones pertenecen al event loop de cada
+    vista async.
+    """
+    import httpx
+
+    return httpx.create_ssl_context()
+
+
+class AsyncTMDbClient:
+    """
+    Cliente asíncrono de TMDB basado en httpx.
+
+    Las llamadas simultáneas se limitan con un semáforo
+    (TMDB_MAX_CONCURRENCY) y cada una tiene su propio timeout
+    (TMDB_TIMEOUT), así una llamada lenta no retrasa a las demás más allá
+    de ese límite. Con TMDB_RATE_LIMIT > 0 las llamadas además esperan su
+    turno en el limitador de la app (clave tmdb:outbound), compartido entre
+    workers si RATELIMIT_STORAGE_URL lo está.
+
+    Uso:
+        async with AsyncTMDbClient.from_config() as tmdb:
+            results, errors = await tmdb.gather(
+                details=tmdb.movie_details(603),
+                credits=tmdb.movie_credits(603)
+            )
+    """
+
+    RATE_LIMIT_KEY = 'tmdb:outbound'
+
+    def __init__(self, base_url, api_key, timeout=5, max_concurrency=8,
+                 rate_limit=0, rate_window=1, rate_limit_store=None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.rate_limit_store = rate_limit_store
+        self._client = None
+        self._semaphore = None
+
+    @classmethod
+    def from_config(cls):
+        """Crear cliente con la configuración de la app actual"""
+        config = current_app.config
+        return cls(
+            base_url=TMDbService.base_url(),
+            api_key=config.get('TMDB_API_KEY'),
+            timeout=config.get('TMDB_TIMEOUT', 5),
+            max_concurrency=config.get('TMDB_MAX_CONCURRENCY', 8),
+            rate_limit=config.get('TMDB_RATE_LIMIT', 0),
+            rate_window=config.get('TMDB_RATE_WINDOW', 1),
+            rate_limit_store=current_app.extensions.get('rate_limit_store')
+        )
+
+    async def __aenter__(self):
+        import httpx
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency),
+            verify=_ssl_context()
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+        self._client = None
+
+    async def get(self, path, **params):
+        """GET a la API de TMDB; retorna el JSON o lanza TMDbError"""
+        import httpx
+
+        if not self.api_key:
+            raise TMDbError('TMDB_API_KEY no configurada')
+
+        params['api_key'] = self.api_key
+
+        async with self._semaphore:
+            await self._throttle()
+            with track_tmdb(path):
+                try:
+                    response = await asyncio.wait_for(
+                        self._client.get(path, params=params),
+                        self.timeout
+                    )
+                except asyncio.TimeoutError:
+                    raise TMDbError(f'Timeout consultando TMDB ({path})') from None
+                except httpx.HTTPError as e:
+                    raise TMDbError(f'Error de red consultando TMDB: {str(e)}') from None
+
+                if response.status_code >= 400:
+                    raise TMDbError(
+                        f'TMDB respondió {response.status_code} ({path})',
+                        status_code=response.status_code
+                    )
+
+        try:
+            return response.json()
+        except ValueError:
+            # p. ej. un proxy o CDN que responde 200 con una página HTML
+            raise TMDbError(f'Respuesta inválida de TMDB ({path})') from None
+
+    async def _throttle(self):
+        """Esperar hasta que el límite de TMDB permita otra llamada"""
+        if not self.rate_limit or self.rate_limit_store is None:
+            return
+
+        # Un almacenamiento compartido (SQLiteStore) bloquea en su
+        # transacción: se consulta en un hilo para no frenar el event loop
+        in_memory = isinstance(self.rate_limit_store, MemoryStore)
+        args = (self.RATE_LIMIT_KEY, self.rate_limit, self.rate_window)
+
+        while True:
+            if in_memory:
+                result = self.rate_limit_store.hit(*args)
+            else:
+                result = await asyncio.to_thread(self.rate_limit_store.hit, *args)
+            if result.allowed:
+                return
+            await asyncio.sleep(result.retry_after)
+
+    async def search_movies(self, title):
+        """Buscar películas por título (mismo formato que TMDbService)"""
+        data = await self.get('/search/movie', query=title, include_adult='false')
+        return TMDbService.format_search_results(data)
+
+    async def movie_details(self, movie_id, append_to_response=None):
+        """Detalles de una película"""
+        params = {}
+        if append_to_response:
+            params['append_to_response'] = append_to_response
+        return await self.get(f'/movie/{movie_id}', **params)
+
+    async def movie_credits(self, movie_id):
+        """Reparto y equipo de una película"""
+        return await self.get(f'/movie/{movie_id}/credits')
+
+    async def movie_images(self, movie_id):
+        """Posters y fondos de una película"""
+        return await self.get(f'/movie/{movie_id}/images')
+
+    @staticmethod
+    async def gather(**calls):
+        """
+        Ejecutar corutinas en paralelo. Retorna (resultados, errores), ambos
+        indexados por el nombre de cada llamada; un fallo no cancela al resto.
+        Los errores inesperados (no TMDbError) se registran y se reportan
+        igual, solo para su llamada.
+        """
+        names = list(calls)
+        outcomes = await asyncio.gather(*calls.values(), return_exceptions=True)
+
+        results, errors = {}, {}
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, TMDbError):
+                errors[name] = str(outcome)
+            elif isinstance(outcome, Exception):
+                current_app.logger.error(f'Error inesperado consultando TMDB ({name})', exc_info=outcome)
+                errors[name] = 'Error inesperado consultando TMDB'
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                results[name] = outcome
+
+        return results, errors
+
+    async def movie_bundle(self, movie_id):
+        """Detalles, créditos e imágenes de una película en paralelo"""
+        return await self.gather(
+            details=self.movie_details(movie_id),
+            credits=self.movie_credits(movie_id),
+            images=self.movie_images(movie_id)
+        )
+
+    async def resolve_many(self, movie_ids, cache=None):
+        """
+        Detalles (con créditos) de varias películas.
+
+        Los ids se deduplican, los que están en `cache` no se piden y el
+        resto se consulta en paralelo (acotado por el semáforo y el límite
+        de TMDB). Retorna (detalles, errores, ids servidos de caché), los
+        dos primeros indexados por id como string.
+        """
+        details, pending = {}, []
+        for movie_id in dict.fromkeys(str(movie_id) for movie_id in movie_ids):
+            cached = cache.get(movie_id) if cache is not None else None
+            if cached is not None:
+                details[movie_id] = cached
+            else:
+                pending.append(movie_id)
+
+        fetched, errors = await self.gather(**{
+            movie_id: self.movie_details(movie_id, append_to_response='credits')
+            for movie_id in pending
+        })
+        if cache is not None:
+            for movie_id, data in fetched.items():
+                cache.set(movie_id, data)
+
+        cached_ids = list(details)
+        details.update(fetched)
+        return details, errors, cached_ids
@@ -1,16 +1,44 @@
-import requests
 from flask import current_app
+from app.utils.metrics import track_tmdb
 
 
 class TMDbService:
-    """Servicio para consumir API de TheMovieDB (TMDB)"""
+    """
+    Servicio para consumir API de TheMovieDB (TMDB)
+    
+    `requests` se importa dentro de cada método para no pagar su costo de
+    importación en el arranque de los workers.
+    """
     
     TMDB_BASE_URL = 'https://api.themoviedb.org/3'
     TMDB_IMAGE_BASE_URL = 'https://image.tmdb.org/t/p/w500'
     
+    @staticmethod
+    def base_url():
+        """URL base de la API (configurable para apuntar a un stub local)"""
+        return current_app.config.get('TMDB_BASE_URL') or TMDbService.TMDB_BASE_URL
+    
+    @staticmethod
+    def format_search_results(data):
+        """Formatear resultados para facilitar uso en frontend"""
+        results = []
+        for movie in data.get('results', []):
+            results.append({
+                'id': movie.get('id'),
+                'title': movie.get('title'),
+                'poster_path': movie.get('poster_path'),
+                'release_date': movie.get('release_date'),
+                'overview': movie.get('overview'),
+                'vote_average': movie.get('vote_average')
+            })
+        
+        return results
+    
     @staticmethod
     def search_movies(title):
         """Buscar películas por título"""
+        import requests
+        
         try:
             api_key = current_app.config.get('TMDB_API_KEY')
             
@@ -23,28 +51,15 @@ class TMDbService:
                 'include_adult': False
             }
             
-            response = requests.get(
-                f'{TMDbService.TMDB_BASE_URL}/search/movie',
-                params=params,
-                timeout=5
-            )
-            response.raise_for_status()
-            
-            data = response.json()
+            with track_tmdb('/search/movie'):
+                response = requests.get(
+                    f'{TMDbService.base_url()}/search/movie',
+                    params=params,
+                    timeout=current_app.config.get('TMDB_TIMEOUT', 5)
+                )
+                response.raise_for_status()
             
-            # Formatear resultados para facilitar uso en frontend
-            results = []
-            for movie in data.get('results', []):
-                results.append({
-                    'id': movie.get('id'),
-                    'title': movie.get('title'),
-                    'poster_path': movie.get('poster_path'),
-                    'release_date': movie.get('release_date'),
-                    'overview': movie.get('overview'),
-                    'vote_average': movie.get('vote_average')
-                })
-            
-            return results
+            return TMDbService.format_search_results(response.json())
         
         except requests.exceptions.RequestException as e:
             current_app.logger.error(f'Error searching TMDB: {str(e)}')
@@ -52,7 +67,22 @@ class TMDbService:
     
     @staticmethod
     def get_movie_details(movie_id):
-        """Obtener detalles completos de película por TMDB ID"""
+        """
+        Obtener detalles completos de película por TMDB ID.
+        
+        Incluye los créditos (append_to_response) en la misma llamada y se
+        guarda en la caché de detalles: crear la película, su poster y el
+        autocompletado de campos comparten una sola petición a TMDB.
+        """
+        import requests
+        
+        cache = current_app.extensions.get('tmdb_details_cache')
+        cache_key = str(movie_id)
+        if cache is not None:
+            details = cache.get(cache_key)
+            if details is not None:
+                return details
+        
         try:
             api_key = current_app.config.get('TMDB_API_KEY')
             
@@ -60,17 +90,22 @@ class TMDbService:
                 return None
             
             params = {
-                'api_key': api_key
+                'api_key': api_key,
+                'append_to_response': 'credits'
             }
             
-            response = requests.get(
-                f'{TMDbService.TMDB_BASE_URL}/movie/{movie_id}',
-                params=params,
-                timeout=5
-            )
-            response.raise_for_status()
+            with track_tmdb(f'/movie/{movie_id}'):
+                response = requests.get(
+                    f'{TMDbService.base_url()}/movie/{movie_id}',
+                    params=params,
+                    timeout=current_app.config.get('TMDB_TIMEOUT', 5)
+                )
+                response.raise_for_status()
             
-            return response.json()
+            details = response.json()
+            if cache is not None:
+                cache.set(cache_key, details)
+            return details
         
         except requests.exceptions.RequestException as e:
             current_app.logger.error(f'Error getting TMDB details: {str(e)}')
@@ -84,4 +119,27 @@ class TMDbService:
         if details and details.get('poster_path'):
             return f"{TMDbService.TMDB_IMAGE_BASE_URL}{details.get('poster_path')}"
         
-        return None
\ No newline at end of file
+        return None
+    
+    @staticmethod
+    def movie_fields(details):
+        """
+        Campos de Movie a partir de los detalles de TMDB (con créditos).
+        Los datos que TMDB no tenga quedan en None.
+        """
+        release_date = details.get('release_date') or ''
+        credits = details.get('credits') or {}
+        directors = [
+            person.get('name') for person in credits.get('crew', [])
+            if person.get('job') == 'Director' and person.get('name')
+        ]
+        genres = [genre.get('name') for genre in details.get('genres', []) if genre.get('name')]
+        poster_path = details.get('poster_path')
+        
+        return {
+            'title': details.get('title') or details.get('original_title'),
+            'year': int(release_date[:4]) if release_date[:4].isdigit() else None,
+            'director': ', '.join(directors)[:255] or None,
+            'genre': genres[0] if genres else None,
+            'poster_url': f'{TMDbService.TMDB_IMAGE_BASE_URL}{poster_path}' if poster_path else None
+        }
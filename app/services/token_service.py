@@ -0,0 +1,176 @@
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from app import db, jwt
+from app.models.revoked_token import RevokedToken
+from app.utils.bloom import BloomFilter
+from app.utils.db_routing import use_primary
+
+
+class _Blocklist:
+    """Filtro de Bloom de jtis revocados de una aplicación"""
+
+    def __init__(self, config):
+        self.capacity = config['TOKEN_BLOCKLIST_CAPACITY']
+        self.error_rate = config['TOKEN_BLOCKLIST_ERROR_RATE']
+        self.refresh = config['TOKEN_BLOCKLIST_REFRESH']
+        self.filter = None
+        self.built_at = 0.0
+        self.lock = threading.Lock()
+        self.rebuilding = False
+        # Una reconstrucción a la vez; mientras dura, revoke() anota sus jtis
+        # en pending para que el filtro nuevo no los pierda
+        self.build_lock = threading.Lock()
+        self.pending = None
+
+
+class TokenService:
+    """
+    Servicio de revocación de tokens.
+
+    Los jtis revocados se guardan en la tabla revoked_tokens. La verificación
+    de cada request consulta primero un filtro de Bloom en memoria; solo un
+    acierto del filtro (revocado o falso positivo) llega a la base de datos.
+    El filtro se reconstruye cada TOKEN_BLOCKLIST_REFRESH segundos en un hilo
+    de fondo, que es el retraso máximo con el que otros workers ven una
+    revocación.
+    """
+
+    @staticmethod
+    def init_app(app):
+        """Registrar el estado del filtro y el blocklist loader de JWT"""
+        app.extensions['token_blocklist'] = _Blocklist(app.config)
+        jwt.token_in_blocklist_loader(TokenService.check_if_token_revoked)
+
+    @staticmethod
+    def _state():
+        return current_app.extensions['token_blocklist']
+
+    @staticmethod
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        """Callback de Flask-JWT-Extended"""
+        return TokenService.is_revoked(jwt_payload['jti'])
+
+    @staticmethod
+    def is_revoked(jti):
+        """Verificar si un jti está revocado"""
+        state = TokenService._state()
+
+        if state.filter is None:
+            TokenService._build_first_filter()
+        elif time.monotonic() - state.built_at > state.refresh:
+            TokenService._schedule_rebuild()
+
+        if jti not in state.filter:
+            return False
+
+        # La confirmación no puede depender del retraso de una réplica
+        with use_primary():
+            return db.session.query(
+                RevokedToken.query.filter_by(jti=jti).exists()
+            ).scalar()
+
+    @staticmethod
+    def revoke(jti, expires_at, user_id=None):
+        """Revocar un jti (idempotente)"""
+        if not RevokedToken.query.filter_by(jti=jti).first():
+            db.session.add(RevokedToken(jti=jti, user_id=user_id, expires_at=expires_at))
+            db.session.commit()
+
+        # Visible de inmediato en este proceso; el resto lo ve al reconstruir
+        state = TokenService._state()
+        with state.lock:
+            if state.filter is not None:
+                state.filter.add(jti)
+            if state.pending is not None:
+                state.pending.add(jti)
+
+    @staticmethod
+    def revoke_payload(jwt_payload):
+        """Revocar a partir del payload decodificado de un token"""
+        TokenService.revoke(
+            jti=jwt_payload['jti'],
+            expires_at=datetime.utcfromtimestamp(jwt_payload['exp']),
+            user_id=jwt_payload.get(current_app.config['JWT_IDENTITY_CLAIM'])
+        )
+
+    @staticmethod
+    def rebuild_filter():
+        """Reconstruir el filtro con los jtis revocados que no han expirado"""
+        state = TokenService._state()
+        with state.build_lock:
+            return TokenService._build(state)
+
+    @staticmethod
+    def _build_first_filter():
+        """Primer request del proceso: uno construye el filtro y los simultáneos lo esperan"""
+        state = TokenService._state()
+        with state.build_lock:
+            if state.filter is None:
+                TokenService._build(state)
+
+    @staticmethod
+    def _build(state):
+        # Las revocaciones confirmadas después de la lectura quedan en pending
+        with state.lock:
+            state.pending = set()
+
+        now = datetime.utcnow()
+        try:
+            with use_primary():
+                jtis = [
+                    jti for (jti,) in db.session.query(RevokedToken.jti)
+                    .filter(RevokedToken.expires_at > now)
+                ]
+        except BaseException:
+            with state.lock:
+                state.pending = None
+            raise
+
+        bloom = BloomFilter(max(state.capacity, 2 * len(jtis)), state.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+
+        with state.lock:
+            for jti in state.pending:
+                bloom.add(jti)
+            state.pending = None
+            state.filter = bloom
+            state.built_at = time.monotonic()
+
+        return len(jtis)
+
+    @staticmethod
+    def purge_expired():
+        """Eliminar filas de tokens que ya expiraron de todos modos"""
+        deleted = RevokedToken.query.filter(
+            RevokedToken.expires_at <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+    @staticmethod
+    def _schedule_rebuild():
+        """Reconstruir en segundo plano; mientras tanto se usa el filtro actual"""
+        state = TokenService._state()
+        with state.lock:
+            if state.rebuilding:
+                return
+            state.rebuilding = True
+
+        app = current_app._get_current_object()
+
+        def run():
+            try:
+                with app.app_context():
+                    TokenService.purge_expired()
+                    TokenService.rebuild_filter()
+            except Exception as e:
+                app.logger.error(f'Error rebuilding token blocklist: {str(e)}')
+            finally:
+                with state.lock:
+                    state.rebuilding = False
+                    state.built_at = time.monotonic()
+
+        threading.Thread(target=run, name='token-blocklist-rebuild', daemon=True).start()
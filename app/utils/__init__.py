@@ -6,6 +6,12 @@ from app.utils.utils import (
     require_auth,
     ensure_json_content_type
 )
+from app.utils.cache import TTLCache
+from app.utils.hashing import (
+    PasswordHasher,
+    HashingBusyError,
+    password_hasher
+)
 
 __all__ = [
     'Response',
@@ -13,5 +19,9 @@ __all__ = [
     'handle_errors',
     'validate_request_data',
     'require_auth',
-    'ensure_json_content_type'
-]
\ No newline at end of file
+    'ensure_json_content_type',
+    'TTLCache',
+    'PasswordHasher',
+    'HashingBusyError',
+    'password_hasher'
+]
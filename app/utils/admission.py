@@ -0,0 +1,200 @@
+import math
+import threading
+import time
+from flask import current_app, g, jsonify, request
+
+# Rutas que dependen de TMDB o del KDF de contraseñas: cada clase tiene su
+# propio límite para que su lentitud no ocupe los hilos de las lecturas baratas
+ROUTE_CLASSES = {
+    'movies.search_movies': 'tmdb',
+    'movies.resolve_tmdb_ids': 'tmdb',
+    'movies.get_movie_details': 'tmdb',
+    'movies.create_movie': 'tmdb',
+    'posters.get_poster': 'tmdb',
+    'auth.register': 'auth',
+    'auth.login': 'auth'
+}
+DEFAULT_CLASS = 'default'
+
+# Sin control de admisión: health check, métricas y endpoints internos deben
+# responder justamente cuando el servidor está saturado (un 503 del health
+# check saca la instancia del balanceador y empeora la saturación)
+EXEMPT_ENDPOINTS = ('health_check', 'metrics', 'static')
+EXEMPT_BLUEPRINTS = ('internal',)
+
+# Factor de la disminución multiplicativa
+BACKOFF = 0.9
+# Peso de la última muestra en la latencia media
+LATENCY_SMOOTHING = 0.1
+
+
+class AdaptiveLimiter:
+    """
+    Límite de concurrencia adaptativo (AIMD) con cola de espera acotada.
+
+    Mientras la latencia de los requests admitidos se mantiene bajo
+    `target_latency` y el límite está en uso, crece en 1 por cada `limit`
+    requests (aumento aditivo). Si una respuesta supera el objetivo, el
+    límite se multiplica por BACKOFF (como mucho una vez por intervalo de
+    latencia objetivo, para no reaccionar varias veces a la misma ráfaga).
+
+    Sin hueco libre se espera hasta `queue_timeout` segundos, con como
+    mucho `max_queue` requests esperando; si no, el request se rechaza.
+    """
+
+    def __init__(self, limit, min_limit, max_limit, target_latency, max_queue, queue_timeout):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(max(min_limit, min(limit, max_limit)))
+        self.target_latency = target_latency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.avg_latency = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Ocupar un hueco; retorna False si no se consiguió a tiempo"""
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                return self._admit()
+
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                return False
+
+            deadline = time.monotonic() + self.queue_timeout
+            self.waiting += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        return False
+                    self._cond.wait(remaining)
+                return self._admit()
+            finally:
+                self.waiting -= 1
+
+    def _admit(self):
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+
+    def release(self, latency):
+        """Liberar el hueco y ajustar el límite con la latencia observada"""
+        with self._cond:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            self.avg_latency += LATENCY_SMOOTHING * (latency - self.avg_latency)
+
+            now = time.monotonic()
+            if latency > self.target_latency:
+                if now - self._last_decrease >= self.target_latency:
+                    self.limit = max(self.min_limit, self.limit * BACKOFF)
+                    self._last_decrease = now
+            elif saturated:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            self._cond.notify()
+
+    def retry_after(self):
+        """Segundos sugeridos al cliente (estimación por la latencia media)"""
+        return max(1, math.ceil(self.avg_latency))
+
+    def snapshot(self):
+        """Estado actual para el endpoint interno"""
+        with self._cond:
+            return {
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'avg_latency_ms': round(self.avg_latency * 1000, 3),
+                'admitted': self.admitted,
+                'rejected': self.rejected
+            }
+
+
+def route_class(endpoint, blueprint):
+    """Clase de admisión de un endpoint (None si está exento)"""
+    if endpoint is None or endpoint in EXEMPT_ENDPOINTS or blueprint in EXEMPT_BLUEPRINTS:
+        return None
+    return ROUTE_CLASSES.get(endpoint, DEFAULT_CLASS)
+
+
+def init_admission(app):
+    """
+    Control de admisión por clase de ruta (ADMISSION_CLASSES).
+
+    Un request que no consigue hueco responde 503 con Retry-After en lugar
+    de acumularse en los hilos del servidor hasta que todo expire.
+    """
+    if not app.config['ADMISSION_ENABLED']:
+        return
+
+    config = app.config
+    limiters = {
+        name: AdaptiveLimiter(
+            limit=spec['limit'],
+            min_limit=config['ADMISSION_MIN_LIMIT'],
+            max_limit=spec['max_limit'],
+            target_latency=spec['target_latency'],
+            max_queue=config['ADMISSION_QUEUE_SIZE'],
+            queue_timeout=config['ADMISSION_QUEUE_TIMEOUT']
+        )
+        for name, spec in config['ADMISSION_CLASSES'].items()
+    }
+    app.extensions['admission'] = limiters
+
+    registry = app.extensions.get('metrics')
+    if registry is not None:
+        registry.counter('admission_rejected_total', 'Requests rechazados por el control de admisión')
+        registry.histogram('admission_wait_seconds', 'Espera en la cola de admisión')
+
+    @app.before_request
+    def admit_request():
+        name = route_class(request.endpoint, request.blueprint)
+        if name is None:
+            return None
+        # Clases sin configuración comparten el límite por defecto
+        limiter = limiters.get(name) or limiters.get(DEFAULT_CLASS)
+        if limiter is None:
+            return None
+
+        start = time.perf_counter()
+        admitted = limiter.acquire()
+        if registry is not None:
+            registry.observe('admission_wait_seconds', time.perf_counter() - start, (('class', name),))
+
+        if not admitted:
+            if registry is not None:
+                registry.inc('admission_rejected_total', (('class', name),))
+            response = jsonify({
+                'success': False,
+                'error': 'Servidor saturado, intenta de nuevo más tarde'
+            })
+            response.status_code = 503
+            response.headers['Retry-After'] = str(limiter.retry_after())
+            return response
+
+        g.admission = (limiter, time.perf_counter())
+        return None
+
+    @app.teardown_request
+    def release_request(exc):
+        admission = g.pop('admission', None)
+        if admission is not None:
+            limiter, start = admission
+            limiter.release(time.perf_counter() - start)
+
+
+def admission_stats():
+    """Estado de los limitadores de la aplicación actual ({} si está deshabilitado)"""
+    return {
+        name: limiter.snapshot()
+        for name, limiter in current_app.extensions.get('admission', {}).items()
+    }
@@ -0,0 +1,141 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# Límites superiores (ms) del histograma de espera en checkout
+CHECKOUT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolMetrics:
+    """Contadores de un pool de conexiones"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+        self.checkout_timeouts = 0
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(CHECKOUT_BUCKETS_MS) + 1)
+
+    def observe_wait(self, seconds):
+        """Registrar el tiempo de espera de un checkout"""
+        ms = seconds * 1000
+        index = len(CHECKOUT_BUCKETS_MS)
+        for i, bound in enumerate(CHECKOUT_BUCKETS_MS):
+            if ms <= bound:
+                index = i
+                break
+
+        with self.lock:
+            self.wait_count += 1
+            self.wait_sum += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.wait_buckets[index] += 1
+
+    def incr(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        """Copia de los contadores para exponer en el endpoint interno"""
+        with self.lock:
+            buckets = {}
+            cumulative = 0
+            for bound, count in zip(CHECKOUT_BUCKETS_MS + ('+Inf',), self.wait_buckets):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+
+            return {
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'connects': self.connects,
+                'closes': self.closes,
+                'invalidations': self.invalidations,
+                'checkout_timeouts': self.checkout_timeouts,
+                'checkout_wait': {
+                    'count': self.wait_count,
+                    'avg_ms': round(self.wait_sum / self.wait_count * 1000, 3) if self.wait_count else 0.0,
+                    'max_ms': round(self.wait_max * 1000, 3),
+                    'buckets_ms': buckets
+                }
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mide cuánto espera cada checkout por una conexión"""
+
+    def __init__(self, *args, **kwargs):
+        self.metrics = kwargs.pop('metrics', None) or PoolMetrics()
+        super().__init__(*args, **kwargs)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            self.metrics.incr('checkout_timeouts')
+            raise
+        finally:
+            self.metrics.observe_wait(time.perf_counter() - start)
+
+    def recreate(self):
+        # engine.dispose() recrea el pool: conservar las métricas acumuladas
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def use_instrumented_pool(app):
+    """
+    Usar InstrumentedQueuePool en los engines de la app. Debe llamarse antes
+    de db.init_app. SQLite en memoria sigue usando StaticPool.
+    """
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    options.setdefault('poolclass', InstrumentedQueuePool)
+
+
+def instrument_engine(engine):
+    """Registrar eventos de churn (connect/close/invalidate) en el engine"""
+    pool = engine.pool
+    if not isinstance(pool, InstrumentedQueuePool):
+        return
+
+    def metrics():
+        # engine.pool puede cambiar tras dispose(); las métricas se comparten
+        return engine.pool.metrics
+
+    event.listen(engine, 'checkout', lambda *a: metrics().incr('checkouts'))
+    event.listen(engine, 'checkin', lambda *a: metrics().incr('checkins'))
+    event.listen(engine, 'connect', lambda *a: metrics().incr('connects'))
+    event.listen(engine, 'close', lambda *a: metrics().incr('closes'))
+    event.listen(engine, 'invalidate', lambda *a: metrics().incr('invalidations'))
+
+
+def pool_stats(engine):
+    """Estado actual y métricas acumuladas del pool de un engine"""
+    pool = engine.pool
+    stats = {
+        'url': engine.url.render_as_string(hide_password=True),
+        'pool_class': type(pool).__name__
+    }
+
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'in_use': pool.checkedout(),
+            'overflow': max(0, pool.overflow()),
+            'max_overflow': pool._max_overflow,
+            'timeout_s': pool.timeout()
+        })
+
+    if isinstance(pool, InstrumentedQueuePool):
+        stats['metrics'] = pool.metrics.snapshot()
+
+    return stats
@@ -0,0 +1,154 @@
+import time
+from contextlib import contextmanager
+from flask import g, request, current_app, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+
+# Bind de SQLALCHEMY_BINDS que atiende las lecturas
+REPLICA_BIND = 'replica'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Momento (epoch en ms) de la última escritura del cliente: cookie para
+# navegadores y header de respuesta que los demás clientes reenvían
+LAST_WRITE_COOKIE = 'last_write'
+LAST_WRITE_HEADER = 'X-Last-Write'
+
+
+def add_replica_bind(app, url):
+    """
+    Registrar el bind de réplica con las mismas opciones de engine que el
+    primario (Flask-SQLAlchemy no aplica SQLALCHEMY_ENGINE_OPTIONS a los binds).
+    """
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    options['url'] = url
+    app.config.setdefault('SQLALCHEMY_BINDS', {}).setdefault(REPLICA_BIND, options)
+
+
+def init_read_routing(app):
+    """
+    Configurar el enrutamiento lectura/escritura. Debe llamarse antes de
+    db.init_app: registra DATABASE_REPLICA_URL como bind de réplica.
+    """
+    replica_url = app.config.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        add_replica_bind(app, replica_url)
+
+
+def _wrote_recently():
+    """
+    Indica si el cliente escribió en los últimos READ_YOUR_WRITES_WINDOW
+    segundos según el marcador que trae (cookie o header). Se admite la
+    misma ventana hacia el futuro por el desfase de relojes entre servidores.
+    """
+    marker = request.cookies.get(LAST_WRITE_COOKIE) or request.headers.get(LAST_WRITE_HEADER)
+    if not marker:
+        return False
+
+    try:
+        written_at = int(marker) / 1000
+    except ValueError:
+        return False
+
+    return abs(time.time() - written_at) < current_app.config['READ_YOUR_WRITES_WINDOW']
+
+
+def mark_read_only():
+    """Marcar el request actual como de solo lectura"""
+    g.db_read_only = True
+
+
+@contextmanager
+def use_primary():
+    """Forzar el primario dentro del bloque (lecturas que no toleran retraso)"""
+    previous = g.get('db_force_primary', False)
+    g.db_force_primary = True
+    try:
+        yield
+    finally:
+        g.db_force_primary = previous
+
+
+def register_read_routing(blueprint):
+    """
+    Enviar las lecturas (GET/HEAD) de un blueprint al bind de réplica y
+    marcar las respuestas de escrituras con su momento (read-your-writes).
+    """
+
+    @blueprint.before_request
+    def route_reads_to_replica():
+        if request.method in ('GET', 'HEAD'):
+            mark_read_only()
+
+    @blueprint.after_request
+    def mark_last_write(response):
+        window = current_app.config['READ_YOUR_WRITES_WINDOW']
+        if request.method not in SAFE_METHODS and response.status_code < 400 and window > 0:
+            marker = str(int(time.time() * 1000))
+            response.headers[LAST_WRITE_HEADER] = marker
+            response.set_cookie(
+                LAST_WRITE_COOKIE,
+                marker,
+                max_age=max(1, int(window)),
+                path='/api',
+                secure=request.is_secure,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+
+def reads_from_replica():
+    """
+    Indica si las lecturas del request actual pueden ir a la réplica.
+
+    Un cliente que escribió en los últimos READ_YOUR_WRITES_WINDOW segundos
+    lee del primario para ver sus propios cambios. El marcador viaja con el
+    cliente, así que vale aunque el siguiente request lo atienda otro
+    proceso o servidor.
+    """
+    if not has_request_context():
+        return False
+
+    if not g.get('db_read_only', False) or g.get('db_force_primary', False):
+        return False
+
+    return not _wrote_recently()
+
+
+class RoutingSession(Session):
+    """
+    Sesión que envía las consultas de requests de solo lectura al bind
+    'replica' (si está configurado). Escrituras, flushes y cualquier
+    consulta posterior a una escritura en la misma transacción van al
+    primario.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(clause):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause):
+        if self._flushing or self.info.get('wrote'):
+            return False
+
+        if isinstance(clause, UpdateBase):
+            return False
+
+        return reads_from_replica()
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_session_wrote(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+@event.listens_for(RoutingSession, 'after_rollback')
+def _reset_session_wrote(session):
+    session.info.pop('wrote', None)
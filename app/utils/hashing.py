@@ -0,0 +1,122 @@
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from werkzeug.security import (
+    generate_password_hash,
+    check_password_hash,
+    DEFAULT_PBKDF2_ITERATIONS
+)
+
+
+class HashingBusyError(Exception):
+    """La cola de hashing de contraseñas está llena"""
+
+
+def normalize_hash_method(method):
+    """
+    Normaliza un método de Werkzeug a la forma que queda guardada en el hash
+    (por ejemplo 'scrypt' -> 'scrypt:32768:8:1').
+    """
+    name, *args = method.split(':')
+
+    if name == 'scrypt' and not args:
+        return 'scrypt:32768:8:1'
+
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = args[1] if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+
+    return method
+
+
+class _HasherState:
+    """Estado por aplicación: pool de procesos y límite de cola"""
+
+    def __init__(self, config):
+        self.method = normalize_hash_method(config['PASSWORD_HASH_METHOD'])
+        self.salt_length = config['PASSWORD_HASH_SALT_LENGTH']
+        self.workers = config['PASSWORD_HASH_WORKERS']
+        self.queue_timeout = config['PASSWORD_HASH_QUEUE_TIMEOUT']
+        self.start_method = config['PASSWORD_HASH_START_METHOD']
+        self.slots = threading.BoundedSemaphore(max(1, config['PASSWORD_HASH_MAX_QUEUE']))
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def get_executor(self):
+        """Crear el pool de forma perezosa (después del fork del servidor WSGI)"""
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method)
+                )
+            return self.executor
+
+    def reset_executor(self):
+        """Descartar un pool roto para que se cree uno nuevo"""
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+class PasswordHasher:
+    """
+    Ejecuta el KDF de contraseñas en un pool de procesos acotado.
+
+    El número de operaciones en curso (ejecutándose o esperando en el pool)
+    está limitado por PASSWORD_HASH_MAX_QUEUE; si no se consigue un hueco en
+    PASSWORD_HASH_QUEUE_TIMEOUT segundos se lanza HashingBusyError.
+    Con PASSWORD_HASH_WORKERS = 0 el hash se calcula en el hilo del request.
+    """
+
+    def init_app(self, app):
+        app.extensions['password_hasher'] = _HasherState(app.config)
+
+    @staticmethod
+    def _state():
+        return current_app.extensions['password_hasher']
+
+    def _run(self, fn, *args):
+        state = self._state()
+
+        if not state.workers:
+            return fn(*args)
+
+        if not state.slots.acquire(timeout=state.queue_timeout):
+            raise HashingBusyError('Servicio de autenticación saturado')
+
+        try:
+            try:
+                return state.get_executor().submit(fn, *args).result()
+            except BrokenProcessPool:
+                # Un worker murió: recrear el pool y reintentar una vez
+                state.reset_executor()
+                return state.get_executor().submit(fn, *args).result()
+        finally:
+            state.slots.release()
+
+    def hash(self, password):
+        """Generar hash con los parámetros KDF configurados"""
+        state = self._state()
+        return self._run(generate_password_hash, password, state.method, state.salt_length)
+
+    def verify(self, pwhash, password):
+        """Verificar contraseña contra un hash guardado"""
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Indica si el hash se generó con parámetros distintos a los actuales"""
+        return pwhash.split('$', 1)[0] != self._state().method
+
+    def shutdown(self, app):
+        """Detener el pool de procesos de una aplicación"""
+        state = app.extensions.get('password_hasher')
+        if state is not None:
+            state.reset_executor()
+
+
+password_hasher = PasswordHasher()
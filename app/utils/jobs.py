@@ -0,0 +1,112 @@
+import logging
+import queue
+import threading
+import time
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class JobRunner:
+    """
+    Tareas de mantenimiento en un hilo de fondo.
+
+    Las tareas se encolan con una clave: mientras una clave está pendiente,
+    volver a encolarla no hace nada (p. ej. un rebalanceo por colección).
+    Cada tarea corre dentro de un app context. Con sync=True se ejecutan en
+    el momento (tests y comandos de CLI). Si la cola está llena la tarea se
+    descarta; quien la encola debe tolerarlo.
+    """
+
+    def __init__(self, app, sync=False, max_queue=1000):
+        self.app = app
+        self.sync = sync
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, key, func, *args, **kwargs):
+        """Encolar func(*args, **kwargs); retorna False si ya estaba o no cabe"""
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+
+        if self.sync:
+            self._run(key, func, args, kwargs)
+            return True
+
+        try:
+            self._queue.put_nowait((key, func, args, kwargs))
+        except queue.Full:
+            with self._lock:
+                self._pending.discard(key)
+            logger.warning('Cola de tareas llena, se descarta %s', key)
+            return False
+
+        self._ensure_thread()
+        return True
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name='job-runner', daemon=True)
+                self._thread.start()
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            self._run(*item)
+            self._queue.task_done()
+
+    def _run(self, key, func, args, kwargs):
+        name = getattr(func, '__name__', 'job')
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            with self.app.app_context():
+                func(*args, **kwargs)
+        except Exception:
+            status = 'error'
+            logger.exception('Error en la tarea %s', key)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+        registry = self.app.extensions.get('metrics')
+        if registry is not None:
+            registry.inc('jobs_total', (('job', name), ('status', status)))
+            registry.observe('job_duration_seconds', time.perf_counter() - start, (('job', name),))
+
+    def join(self):
+        """Esperar a que terminen las tareas encoladas"""
+        self._queue.join()
+
+    def stop(self):
+        """Terminar el hilo después de las tareas pendientes"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+def init_jobs(app):
+    """Crear el runner de tareas de la aplicación"""
+    registry = app.extensions.get('metrics')
+    if registry is not None:
+        registry.counter('jobs_total', 'Tareas de fondo ejecutadas por resultado')
+        registry.histogram('job_duration_seconds', 'Duración de tareas de fondo')
+
+    app.extensions['jobs'] = JobRunner(
+        app,
+        sync=app.config['JOBS_SYNC'],
+        max_queue=app.config['JOBS_QUEUE_SIZE']
+    )
+
+
+def get_job_runner():
+    """Runner de tareas de la aplicación actual"""
+    return current_app.extensions['jobs']
@@ -0,0 +1,341 @@
+import glob
+import json
+import math
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, current_app, g, request, has_app_context, has_request_context
+from sqlalchemy import event
+
+# Límites superiores (s) de los histogramas de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Límites superiores del número de consultas SQL por request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+COUNTER = 'counter'
+HISTOGRAM = 'histogram'
+
+
+class _Shard:
+    """Contadores de un hilo; solo ese hilo los escribe"""
+
+    def __init__(self, thread=None):
+        self.thread = thread
+        self.counters = {}
+        self.histograms = {}
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas con un shard por hilo.
+
+    Cada hilo actualiza sus propios diccionarios sin locks; el scrape suma
+    todos los shards. Los shards de hilos terminados se pliegan en uno
+    acumulado para que su número no crezca (asgiref crea hilos por request
+    async).
+
+    Con varios procesos (gunicorn) cada uno vuelca su snapshot a
+    `metrics-<pid>.json` en `multiproc_dir` y el scrape suma todos los
+    archivos. El directorio debe vaciarse al desplegar.
+    """
+
+    def __init__(self, multiproc_dir=None, flush_interval=5.0):
+        self.multiproc_dir = multiproc_dir
+        self.flush_interval = flush_interval
+        self.definitions = {}
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard()
+        self._last_flush = 0.0
+
+    # ---- definición y escritura ----
+
+    def counter(self, name, documentation):
+        self.definitions[name] = (COUNTER, documentation, None)
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS):
+        self.definitions[name] = (HISTOGRAM, documentation, tuple(buckets))
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = _Shard(threading.current_thread())
+            self._local.shard = shard
+            with self._lock:
+                self._retire_dead_shards()
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name, labels=(), amount=1):
+        """Incrementar un counter; labels es una tupla de pares (nombre, valor)"""
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=()):
+        """Registrar una observación en un histograma"""
+        buckets = self.definitions[name][2]
+        histograms = self._shard().histograms
+        key = (name, labels)
+        values = histograms.get(key)
+        if values is None:
+            # Un contador por bucket (no acumulado) + '+Inf' + suma
+            values = histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+
+        index = len(buckets)
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                index = i
+                break
+
+        values[index] += 1
+        values[-1] += value
+
+    # ---- agregación ----
+
+    def _retire_dead_shards(self):
+        alive = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                alive.append(shard)
+            else:
+                _merge(self._retired, shard.counters.copy(), shard.histograms.copy())
+        self._shards = alive
+
+    def collect(self):
+        """Snapshot agregado de este proceso: (counters, histograms)"""
+        total = _Shard()
+        with self._lock:
+            self._retire_dead_shards()
+            shards = [self._retired] + list(self._shards)
+
+        for shard in shards:
+            _merge(total, shard.counters.copy(), shard.histograms.copy())
+
+        return total.counters, total.histograms
+
+    def check_fork(self):
+        """Descartar lo heredado del proceso padre tras un fork"""
+        if os.getpid() != self.pid:
+            with self._lock:
+                self._reset()
+
+    # ---- multiproceso ----
+
+    def _path(self, pid):
+        return os.path.join(self.multiproc_dir, f'metrics-{pid}.json')
+
+    def flush(self, force=False):
+        """Escribir el snapshot de este proceso (a lo sumo cada flush_interval)"""
+        if not self.multiproc_dir:
+            return
+
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+
+        counters, histograms = self.collect()
+        payload = {
+            'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+            'histograms': [[name, list(labels), values] for (name, labels), values in histograms.items()]
+        }
+
+        os.makedirs(self.multiproc_dir, exist_ok=True)
+        path = self._path(self.pid)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+
+    def collect_all(self):
+        """Snapshot de todos los procesos (o solo de este sin multiproc_dir)"""
+        if not self.multiproc_dir:
+            return self.collect()
+
+        self.flush(force=True)
+        total = _Shard()
+        for path in glob.glob(os.path.join(self.multiproc_dir, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    payload = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            counters = {
+                (name, tuple(map(tuple, labels))): value
+                for name, labels, value in payload['counters']
+            }
+            histograms = {
+                (name, tuple(map(tuple, labels))): values
+                for name, labels, values in payload['histograms']
+            }
+            _merge(total, counters, histograms)
+
+        return total.counters, total.histograms
+
+    # ---- exposición ----
+
+    def render(self):
+        """Métricas en formato de texto de Prometheus"""
+        counters, histograms = self.collect_all()
+        lines = []
+
+        for name, (kind, documentation, buckets) in sorted(self.definitions.items()):
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+
+            if kind == COUNTER:
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                continue
+
+            for (metric, labels), values in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + (math.inf,), values[:-1]):
+                    cumulative += count
+                    le = '+Inf' if bound == math.inf else _format_value(bound)
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(values[-1])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(target, counters, histograms):
+    for key, value in counters.items():
+        target.counters[key] = target.counters.get(key, 0) + value
+
+    for key, values in histograms.items():
+        current = target.histograms.get(key)
+        if current is None:
+            target.histograms[key] = list(values)
+        else:
+            for i, value in enumerate(values):
+                current[i] += value
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def get_metrics():
+    """Registro de métricas de la aplicación actual (None si está deshabilitado)"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('metrics')
+
+
+def _request_labels():
+    rule = request.url_rule.rule if request.url_rule else 'unmatched'
+    return (('blueprint', request.blueprint or ''), ('route', rule), ('method', request.method))
+
+
+def init_metrics(app):
+    """
+    Registrar las métricas de la aplicación, los hooks por request y el
+    endpoint /metrics (formato de Prometheus).
+    """
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    registry = MetricsRegistry(
+        multiproc_dir=app.config['METRICS_MULTIPROC_DIR'],
+        flush_interval=app.config['METRICS_FLUSH_INTERVAL']
+    )
+    registry.counter('http_requests_total', 'Requests HTTP por ruta y status')
+    registry.histogram('http_request_duration_seconds', 'Latencia de requests HTTP por ruta')
+    registry.counter('db_queries_total', 'Consultas SQL ejecutadas')
+    registry.histogram('db_query_duration_seconds', 'Duración de consultas SQL')
+    registry.histogram('http_request_db_queries', 'Consultas SQL por request', QUERY_COUNT_BUCKETS)
+    registry.histogram('http_request_db_seconds', 'Tiempo en SQL por request')
+    registry.histogram('tmdb_request_duration_seconds', 'Latencia de llamadas a TMDB')
+    registry.counter('tmdb_errors_total', 'Llamadas a TMDB fallidas')
+    app.extensions['metrics'] = registry
+
+    @app.before_request
+    def start_request_timer():
+        registry.check_fork()
+        g.metrics_start = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+
+        labels = _request_labels()
+        registry.observe('http_request_duration_seconds', time.perf_counter() - start, labels)
+        registry.inc('http_requests_total', labels + (('status', str(response.status_code)),))
+        registry.observe('http_request_db_queries', g.get('sql_queries', 0), labels[1:2])
+        registry.observe('http_request_db_seconds', g.get('sql_seconds', 0.0), labels[1:2])
+        registry.flush()
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Endpoint de métricas para Prometheus"""
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def instrument_queries(engine):
+    """Contar consultas SQL y su duración (global y por request)"""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        registry = get_metrics()
+        if registry is None:
+            return
+
+        registry.inc('db_queries_total')
+        registry.observe('db_query_duration_seconds', elapsed)
+        if has_request_context() and 'sql_queries' in g:
+            g.sql_queries += 1
+            g.sql_seconds += elapsed
+
+
+@contextmanager
+def track_tmdb(path):
+    """Medir una llamada a TMDB; las excepciones cuentan como error"""
+    registry = get_metrics()
+    if registry is None:
+        yield
+        return
+
+    # Ids fuera de la etiqueta para no disparar la cardinalidad
+    labels = (('endpoint', re.sub(r'/\d+', '/{id}', path)),)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        registry.inc('tmdb_errors_total', labels)
+        raise
+    finally:
+        registry.observe('tmdb_request_duration_seconds', time.perf_counter() - start, labels)
@@ -0,0 +1,252 @@
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # sin flock (Windows) el directorio es de un solo proceso
+    fcntl = None
+
+
+class PosterCache:
+    """
+    Caché en disco direccionada por contenido.
+
+    Los bytes se guardan en `blobs/<sha256[:2]>/<sha256>` y cada clave
+    (tamaño + ruta de TMDB) apunta a su blob con un archivo en `refs/`.
+    El acceso actualiza el mtime del blob, que da el orden LRU.
+
+    El total de bytes vive en el archivo `usage` del directorio, compartido
+    por todos los workers que lo usan y actualizado bajo flock: cada blob
+    nuevo lo incrementa. El worker que lo ve pasar de max_bytes relee el
+    directorio (el único recorrido completo) y borra los blobs menos usados,
+    con sus referencias, hasta EVICT_TO * max_bytes. Las escrituras son
+    atómicas (os.replace).
+    """
+
+    # Evictar por debajo del límite: el siguiente recorrido llega recién
+    # cuando se escribió otro 10 % del presupuesto
+    EVICT_TO = 0.9
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._usage_lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._key_locks = {}
+        os.makedirs(os.path.join(directory, 'blobs'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'refs'), exist_ok=True)
+
+        # El primer proceso que abre el directorio cuenta lo que ya hay
+        with self._usage() as fd:
+            if self._read_usage(fd) is None:
+                self._write_usage(fd, sum(size for _, size, _ in self._blobs()))
+
+    @staticmethod
+    def _digest(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def _ref_path(self, key):
+        return os.path.join(self.directory, 'refs', self._digest(key.encode('utf-8')))
+
+    def blob_path(self, content_hash):
+        return os.path.join(self.directory, 'blobs', content_hash[:2], content_hash)
+
+    def key_lock(self, key):
+        """Lock por clave: una sola descarga por imagen en este proceso"""
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def release_key_lock(self, key):
+        with self._lock:
+            self._key_locks.pop(key, None)
+
+    @contextmanager
+    def _usage(self):
+        """Archivo `usage` bloqueado para este hilo y, con flock, para los demás procesos"""
+        with self._usage_lock:
+            fd = os.open(os.path.join(self.directory, 'usage'), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                yield fd
+            finally:
+                os.close(fd)  # libera el flock
+
+    @staticmethod
+    def _read_usage(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        content = os.read(fd, 32).strip()
+        return int(content) if content else None
+
+    @staticmethod
+    def _write_usage(fd, total):
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.ftruncate(fd, 0)
+        os.write(fd, str(max(total, 0)).encode('ascii'))
+
+    @property
+    def total_bytes(self):
+        """Bytes guardados en el directorio (todos los workers)"""
+        with self._usage() as fd:
+            return self._read_usage(fd) or 0
+
+    def get(self, key):
+        """(ruta, hash) del blob de la clave, o None si no está en caché"""
+        ref_path = self._ref_path(key)
+        try:
+            with open(ref_path) as f:
+                content_hash = f.read().strip()
+        except FileNotFoundError:
+            return None
+
+        path = self.blob_path(content_hash)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # El blob fue evictado: la referencia quedó colgando
+            self._remove_ref(ref_path, content_hash)
+            return None
+        return path, content_hash
+
+    def put(self, key, data):
+        """Guardar bytes para la clave; retorna (ruta, hash)"""
+        content_hash = self._digest(data)
+        path = self.blob_path(content_hash)
+
+        full = False
+        if not os.path.exists(path):
+            self._write_atomic(path, data)
+            with self._usage() as fd:
+                total = (self._read_usage(fd) or 0) + len(data)
+                self._write_usage(fd, total)
+            full = total > self.max_bytes
+        else:
+            os.utime(path)
+
+        self._write_atomic(self._ref_path(key), content_hash.encode('ascii'))
+
+        if full:
+            self.evict()
+
+        return path, content_hash
+
+    @staticmethod
+    def _write_atomic(path, data):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    @staticmethod
+    def _remove_ref(ref_path, content_hash):
+        """Borrar la referencia si todavía apunta al blob (un put pudo cambiarla)"""
+        try:
+            with open(ref_path) as f:
+                if f.read().strip() != content_hash:
+                    return
+            os.remove(ref_path)
+        except FileNotFoundError:
+            pass
+
+    def _blobs(self):
+        """(ruta, tamaño, mtime) de cada blob"""
+        root = os.path.join(self.directory, 'blobs')
+        for prefix in os.listdir(root):
+            prefix_dir = os.path.join(root, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                if name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(prefix_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _refs(self):
+        """Rutas de las referencias agrupadas por hash del blob"""
+        root = os.path.join(self.directory, 'refs')
+        refs = {}
+        for name in os.listdir(root):
+            if name.startswith('.tmp-'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                with open(path) as f:
+                    refs.setdefault(f.read().strip(), []).append(path)
+            except FileNotFoundError:
+                continue
+        return refs
+
+    @contextmanager
+    def _evicting(self):
+        """Un solo hilo y worker evicta a la vez; el resto sigue sin esperar (False)"""
+        if not self._evict_lock.acquire(blocking=False):
+            yield False
+            return
+
+        fd = os.open(os.path.join(self.directory, 'evict.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            acquired = True
+            if fcntl is not None:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    acquired = False
+            yield acquired
+        finally:
+            os.close(fd)
+            self._evict_lock.release()
+
+    def evict(self):
+        """
+        Borrar los blobs menos usados del directorio, con sus referencias,
+        hasta EVICT_TO * max_bytes. El recorrido ve también lo que
+        escribieron los demás workers y corrige el total compartido.
+        """
+        with self._evicting() as acquired:
+            if not acquired:
+                return
+
+            with self._usage() as fd:
+                counted = self._read_usage(fd) or 0
+
+            # Recorrer sin el lock de `usage`: los puts siguen mientras tanto
+            blobs = sorted(self._blobs(), key=lambda blob: blob[2])
+            refs = self._refs()
+            total = sum(size for _, size, _ in blobs)
+            target = int(self.max_bytes * self.EVICT_TO)
+
+            for path, size, _ in blobs:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                content_hash = os.path.basename(path)
+                for ref_path in refs.get(content_hash, ()):
+                    self._remove_ref(ref_path, content_hash)
+
+            with self._usage() as fd:
+                # Lo que otros agregaron durante el recorrido se suma a lo que quedó
+                self._write_usage(fd, total + (self._read_usage(fd) or 0) - counted)
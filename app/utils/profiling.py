@@ -0,0 +1,179 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from flask import current_app, g, request
+
+# Nombre de archivo seguro: <timestamp>-<hex>
+PROFILE_ID_RE = re.compile(r'^\d{8}T\d{12}-[0-9a-f]{8}$')
+
+
+class ProfileStore:
+    """
+    Anillo de perfiles en disco: cada perfil es un `.prof` (pstats) con un
+    `.json` de metadatos. Al superar max_files se borran los más antiguos.
+    """
+
+    def __init__(self, directory, max_files=50):
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id, extension):
+        return os.path.join(self.directory, f'{profile_id}.{extension}')
+
+    def save(self, profiler, meta):
+        """Guardar un perfil y retornar su id"""
+        profile_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+        meta = dict(meta, id=profile_id, created_at=datetime.utcnow().isoformat())
+
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            profiler.dump_stats(self._path(profile_id, 'prof'))
+            with open(self._path(profile_id, 'json'), 'w') as f:
+                json.dump(meta, f)
+            self._trim()
+
+        return profile_id
+
+    def _ids(self):
+        if not os.path.isdir(self.directory):
+            return []
+        # El prefijo con la fecha ordena cronológicamente
+        return sorted(
+            name[:-5] for name in os.listdir(self.directory)
+            if name.endswith('.json') and PROFILE_ID_RE.match(name[:-5])
+        )
+
+    def _trim(self):
+        ids = self._ids()
+        for profile_id in ids[:max(0, len(ids) - self.max_files)]:
+            for extension in ('prof', 'json'):
+                try:
+                    os.remove(self._path(profile_id, extension))
+                except FileNotFoundError:
+                    pass
+
+    def list(self):
+        """Metadatos de los perfiles guardados, del más reciente al más antiguo"""
+        profiles = []
+        for profile_id in reversed(self._ids()):
+            try:
+                with open(self._path(profile_id, 'json')) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def stats_path(self, profile_id):
+        """Ruta del `.prof` o None si el id no es válido o no existe"""
+        if not PROFILE_ID_RE.match(profile_id):
+            return None
+        path = self._path(profile_id, 'prof')
+        return path if os.path.exists(path) else None
+
+    def render_text(self, profile_id, sort='cumulative', limit=50):
+        """Resumen legible (pstats) de un perfil"""
+        path = self.stats_path(profile_id)
+        if path is None:
+            return None
+        output = io.StringIO()
+        stats = pstats.Stats(path, stream=output)
+        stats.sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+
+def _marked_by_admin():
+    """El request trae X-Profile y el usuario del JWT es administrador"""
+    from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
+    from app.middleware import is_admin
+    from app.services.auth_service import AuthService
+
+    try:
+        verify_jwt_in_request(optional=True)
+        user_id = get_jwt_identity()
+    except Exception:
+        return False
+
+    if user_id is None:
+        return False
+
+    user = AuthService.resolve_user(user_id, get_jwt())
+    return bool(user and is_admin(user))
+
+
+def get_profile_store():
+    """Anillo de perfiles de la aplicación actual (None si está deshabilitado)"""
+    return current_app.extensions.get('profile_store')
+
+
+def init_profiling(app):
+    """
+    Perfilar con cProfile una muestra de requests (PROFILING_SAMPLE_RATE) o
+    los requests de administradores que envían `X-Profile: 1`. Los perfiles
+    se guardan en PROFILING_DIR y se consultan en /api/internal/profiles.
+
+    Solo un request se perfila a la vez por proceso (cProfile no admite
+    perfiladores simultáneos en Python 3.12+). Las vistas async corren en
+    otro hilo y no quedan incluidas.
+    """
+    if not app.config['PROFILING_ENABLED']:
+        return
+
+    store = ProfileStore(app.config['PROFILING_DIR'], app.config['PROFILING_MAX_FILES'])
+    app.extensions['profile_store'] = store
+    sample_rate = app.config['PROFILING_SAMPLE_RATE']
+    active = threading.Lock()
+
+    @app.before_request
+    def start_profiling():
+        marked = request.headers.get('X-Profile') == '1'
+        sampled = sample_rate > 0 and random.random() < sample_rate
+        if not (sampled or (marked and _marked_by_admin())):
+            return
+
+        if not active.acquire(blocking=False):
+            return
+
+        profiler = cProfile.Profile()
+        g.profiler = profiler
+        g.profile_start = time.perf_counter()
+        profiler.enable()
+
+    @app.after_request
+    def stop_profiling(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+
+        try:
+            profiler.disable()
+            profile_id = store.save(profiler, {
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - g.pop('profile_start')) * 1000, 3)
+            })
+            response.headers['X-Profile-Id'] = profile_id
+        except Exception as e:
+            app.logger.error(f'Error saving profile: {str(e)}')
+        finally:
+            active.release()
+
+        return response
+
+    @app.teardown_request
+    def release_profiler(exc):
+        # Si after_request no llegó a ejecutarse (excepción no manejada)
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            active.release()
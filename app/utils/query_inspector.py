@@ -0,0 +1,165 @@
+import hashlib
+import re
+import time
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from app.utils.metrics import get_metrics
+
+# Prefijo de EXPLAIN por dialecto
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+    'mysql': 'EXPLAIN ',
+    'mariadb': 'EXPLAIN '
+}
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+|\$\d+)\s*,?)+\)', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+class NPlusOneError(Exception):
+    """Un request ejecutó la misma consulta más de N_PLUS_ONE_THRESHOLD veces"""
+
+
+def normalize_statement(statement):
+    """Reemplazar literales y listas IN para agrupar consultas equivalentes"""
+    statement = _STRING_RE.sub('?', statement)
+    statement = _NUMBER_RE.sub('?', statement)
+    statement = _IN_LIST_RE.sub('IN (?)', statement)
+    return _SPACE_RE.sub(' ', statement).strip()
+
+
+def fingerprint(statement):
+    """Huella corta de una consulta normalizada"""
+    return hashlib.blake2b(normalize_statement(statement).encode('utf-8'), digest_size=6).hexdigest()
+
+
+def explain(conn, statement, parameters):
+    """
+    Plan de ejecución de una consulta SELECT con el cursor DBAPI (sin
+    pasar por los eventos de SQLAlchemy). None si no aplica.
+    """
+    prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f'EXPLAIN falló: {e}'
+    finally:
+        cursor.close()
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def _inspect_query(conn, statement, parameters, elapsed, executemany):
+    app = current_app
+    config = app.config
+
+    if elapsed * 1000 >= config['SLOW_QUERY_THRESHOLD_MS']:
+        plan = None
+        if config['SLOW_QUERY_EXPLAIN'] and not executemany:
+            plan = explain(conn, statement, parameters)
+
+        app.logger.warning('Slow query', extra={
+            'duration_ms': round(elapsed * 1000, 3),
+            'statement': normalize_statement(statement),
+            'fingerprint': fingerprint(statement),
+            'plan': plan
+        })
+
+        registry = get_metrics()
+        if registry is not None:
+            route = _route() if has_request_context() else ''
+            registry.inc('db_slow_queries_total', (('route', route),))
+
+    if not has_request_context() or 'query_fingerprints' not in g:
+        return
+
+    key = fingerprint(statement)
+    counts = g.query_fingerprints
+    counts[key] = counts.get(key, 0) + 1
+
+    # Se reporta una vez, al superar el umbral
+    if counts[key] == config['N_PLUS_ONE_THRESHOLD'] + 1:
+        normalized = normalize_statement(statement)
+        g.n_plus_one.append(normalized)
+        app.logger.warning('Probable N+1 query', extra={
+            'fingerprint': key,
+            'statement': normalized,
+            'threshold': config['N_PLUS_ONE_THRESHOLD'],
+            'endpoint': request.endpoint
+        })
+
+        registry = get_metrics()
+        if registry is not None:
+            registry.inc('db_n_plus_one_total', (('route', _route()),))
+
+
+def instrument_query_inspector(engine):
+    """Registrar el inspector de consultas en un engine"""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('inspector_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['inspector_start'].pop()
+        if has_app_context() and current_app.extensions.get('query_inspector'):
+            _inspect_query(conn, statement, parameters, elapsed, executemany)
+
+
+def init_query_inspector(app):
+    """
+    Activar el inspector de consultas: log de consultas lentas con su plan
+    (EXPLAIN) y detección de N+1 por request (misma huella más de
+    N_PLUS_ONE_THRESHOLD veces). Con QUERY_INSPECTOR_RAISE (solo en
+    TestingConfig) un N+1 hace fallar el request con NPlusOneError; como se
+    detecta al terminar la vista, sus cambios ya están confirmados. En los
+    demás entornos solo se registra.
+    """
+    if not app.config['QUERY_INSPECTOR_ENABLED']:
+        return
+
+    app.extensions['query_inspector'] = True
+
+    registry = app.extensions.get('metrics')
+    if registry is not None:
+        registry.counter('db_slow_queries_total', 'Consultas sobre SLOW_QUERY_THRESHOLD_MS')
+        registry.counter('db_n_plus_one_total', 'Requests con un probable N+1')
+        registry.histogram(
+            'http_request_db_distinct_queries',
+            'Consultas SQL distintas (por huella) por request',
+            (1, 2, 5, 10, 20, 50)
+        )
+
+    @app.before_request
+    def start_query_inspection():
+        g.query_fingerprints = {}
+        g.n_plus_one = []
+
+    @app.after_request
+    def finish_query_inspection(response):
+        counts = g.pop('query_fingerprints', None)
+        n_plus_one = g.pop('n_plus_one', [])
+        if counts is None:
+            return response
+
+        if registry is not None:
+            registry.observe('http_request_db_distinct_queries', len(counts), (('route', _route()),))
+
+        if n_plus_one and app.config['QUERY_INSPECTOR_RAISE']:
+            raise NPlusOneError(
+                f'{request.endpoint}: consulta repetida más de '
+                f"{app.config['N_PLUS_ONE_THRESHOLD']} veces: {n_plus_one[0]}"
+            )
+
+        return response
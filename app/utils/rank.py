@@ -0,0 +1,78 @@
+"""
+Claves de orden fraccionarias (lexicográficas).
+
+Cada clave es la parte fraccionaria de un número en base 36 (dígitos
+0-9a-z, sin ceros finales): "h" = 0.h, "h8" = 0.h8. Ordenar las claves como
+strings equivale a ordenar los números, así que siempre hay una clave entre
+dos vecinas y mover un elemento solo reescribe su fila.
+
+El alfabeto es solo de dígitos y minúsculas para que el orden sea el mismo
+con cualquier collation de la base de datos.
+"""
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+_INDEX = {digit: index for index, digit in enumerate(DIGITS)}
+
+
+def validate_key(key):
+    """Lanzar ValueError si la clave no es válida"""
+    if not key or key.endswith('0') or any(digit not in _INDEX for digit in key):
+        raise ValueError(f'Clave de orden inválida: {key!r}')
+
+
+def key_between(before=None, after=None):
+    """
+    Clave estrictamente entre `before` y `after`; None es un extremo
+    abierto (inicio o final de la lista).
+    """
+    if before is not None:
+        validate_key(before)
+    if after is not None:
+        validate_key(after)
+        if before is not None and before >= after:
+            raise ValueError(f'{before!r} debe ser menor que {after!r}')
+
+    return _midpoint(before or '', after)
+
+
+def _midpoint(low, high):
+    if high is not None:
+        # Prefijo común: la clave empieza igual y se decide después
+        prefix = 0
+        while prefix < len(high) and (low[prefix] if prefix < len(low) else '0') == high[prefix]:
+            prefix += 1
+        if prefix:
+            return high[:prefix] + _midpoint(low[prefix:], high[prefix:])
+
+    digit_low = _INDEX[low[0]] if low else 0
+    digit_high = _INDEX[high[0]] if high is not None else BASE
+
+    if digit_high - digit_low > 1:
+        return DIGITS[(digit_low + digit_high) // 2]
+
+    # Dígitos consecutivos: hay que alargar la clave
+    if high is not None and len(high) > 1:
+        return high[0]
+    return DIGITS[digit_low] + _midpoint(low[1:], None)
+
+
+def spread_keys(count):
+    """
+    `count` claves crecientes repartidas de forma uniforme, con espacio
+    libre entre vecinas (para rebalancear una lista).
+    """
+    width = 1
+    while BASE ** width < (count + 1) * BASE:
+        width += 1
+
+    step = BASE ** width // (count + 1)
+    keys = []
+    for position in range(1, count + 1):
+        value = position * step
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        keys.append(''.join(reversed(digits)).rstrip('0'))
+    return keys
@@ -0,0 +1,167 @@
+import math
+import sqlite3
+import threading
+import time
+from flask import current_app
+
+
+class RateLimitResult:
+    """Resultado de consultar el limitador para una clave"""
+
+    __slots__ = ('allowed', 'limit', 'remaining', 'reset_after', 'retry_after')
+
+    def __init__(self, allowed, limit, remaining, reset_after, retry_after):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_after = reset_after
+        self.retry_after = retry_after
+
+    def headers(self):
+        """Headers X-RateLimit-* para la respuesta"""
+        headers = {
+            'X-RateLimit-Limit': str(self.limit),
+            'X-RateLimit-Remaining': str(self.remaining),
+            'X-RateLimit-Reset': str(math.ceil(self.reset_after))
+        }
+        if not self.allowed:
+            headers['Retry-After'] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+def gcra(stored_tat, now, limit, window):
+    """
+    Generic Cell Rate Algorithm (equivalente a una ventana deslizante).
+
+    Solo guarda un número por clave: el "theoretical arrival time" (TAT).
+    Permite ráfagas de hasta `limit` requests y luego uno cada window/limit
+    segundos. Retorna (nuevo_tat o None si se rechaza, RateLimitResult).
+    """
+    interval = window / limit
+    tat = max(stored_tat or now, now)
+    new_tat = tat + interval
+    allow_at = new_tat - window
+
+    if now < allow_at:
+        return None, RateLimitResult(False, limit, 0, tat - now, allow_at - now)
+
+    remaining = int((window - (new_tat - now)) // interval)
+    return new_tat, RateLimitResult(True, limit, remaining, new_tat - now, 0.0)
+
+
+class MemoryStore:
+    """
+    Almacenamiento en memoria del proceso (un float por clave).
+    Las claves inactivas se eliminan en barridos periódicos: cuando su TAT
+    ya pasó equivalen a una clave nueva.
+    """
+
+    def __init__(self, sweep_every=1000):
+        self._tats = {}
+        self._lock = threading.Lock()
+        self._sweep_every = sweep_every
+        self._hits = 0
+
+    def hit(self, key, limit, window, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            new_tat, result = gcra(self._tats.get(key), now, limit, window)
+            if new_tat is not None:
+                self._tats[key] = new_tat
+
+            self._hits += 1
+            if self._hits >= self._sweep_every:
+                self._hits = 0
+                self._sweep(now)
+
+        return result
+
+    def _sweep(self, now):
+        expired = [key for key, tat in self._tats.items() if tat <= now]
+        for key in expired:
+            del self._tats[key]
+
+    def __len__(self):
+        return len(self._tats)
+
+
+class SQLiteStore:
+    """
+    Almacenamiento en un archivo SQLite compartido por todos los workers
+    de la máquina. Cada hit es una transacción IMMEDIATE corta.
+    """
+
+    def __init__(self, path, sweep_every=1000):
+        self.path = path
+        self._local = threading.local()
+        self._sweep_every = sweep_every
+        self._hits = 0
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS rate_limits ('
+            'key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID'
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key, limit, window, now=None):
+        now = time.time() if now is None else now
+        conn = self._connection()
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tat FROM rate_limits WHERE key = ?', (key,)).fetchone()
+            new_tat, result = gcra(row[0] if row else None, now, limit, window)
+            if new_tat is not None:
+                conn.execute(
+                    'INSERT INTO rate_limits (key, tat) VALUES (?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET tat = excluded.tat',
+                    (key, new_tat)
+                )
+
+            self._hits += 1
+            if self._hits >= self._sweep_every:
+                self._hits = 0
+                conn.execute('DELETE FROM rate_limits WHERE tat <= ?', (now,))
+
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        return result
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM rate_limits').fetchone()[0]
+
+
+def create_store(url):
+    """
+    Crea el almacenamiento a partir de RATELIMIT_STORAGE_URL:
+    - memory://            (por proceso)
+    - sqlite:///ruta.db    (compartido entre workers)
+    """
+    if url.startswith('memory://'):
+        return MemoryStore()
+
+    if url.startswith('sqlite:///'):
+        return SQLiteStore(url[len('sqlite:///'):])
+
+    raise ValueError(f'RATELIMIT_STORAGE_URL no soportado: {url}')
+
+
+def init_rate_limiter(app):
+    """Registrar el almacenamiento del limitador en la aplicación"""
+    app.extensions['rate_limit_store'] = create_store(app.config['RATELIMIT_STORAGE_URL'])
+
+
+def get_rate_limit_store():
+    """Almacenamiento del limitador de la aplicación actual"""
+    return current_app.extensions['rate_limit_store']
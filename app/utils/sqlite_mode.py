@@ -0,0 +1,52 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from app.utils.db_routing import add_replica_bind
+
+
+def _is_sqlite_file(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def configure_sqlite_mode(app):
+    """
+    Modo SQLite de alta concurrencia (SQLITE_WAL_MODE). Debe llamarse antes
+    de db.init_app: agrega un bind 'replica' sobre el mismo archivo, con su
+    propio pool de conexiones de solo lectura, para las lecturas.
+    """
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    if not app.config['SQLITE_WAL_MODE'] or not uri or not _is_sqlite_file(uri):
+        return
+
+    if app.config['SQLITE_READ_ONLY_POOL']:
+        add_replica_bind(app, uri)
+
+
+def apply_sqlite_pragmas(app, engine, read_only=False):
+    """Aplicar los PRAGMA de SQLITE_* en cada conexión nueva del engine"""
+    if not app.config['SQLITE_WAL_MODE'] or engine.url.get_backend_name() != 'sqlite':
+        return
+    if engine.url.database in (None, '', ':memory:'):
+        return
+
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(app.config['SQLITE_BUSY_TIMEOUT'])}",
+        f"PRAGMA mmap_size = {int(app.config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size = {int(app.config['SQLITE_CACHE_SIZE'])}",
+        'PRAGMA temp_store = MEMORY'
+    ]
+    if read_only:
+        pragmas.append('PRAGMA query_only = ON')
+    else:
+        # journal_mode es persistente en el archivo; solo el primario lo fija
+        pragmas.insert(0, 'PRAGMA journal_mode = WAL')
+        pragmas.append(f"PRAGMA synchronous = {app.config['SQLITE_SYNCHRONOUS']}")
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
@@ -0,0 +1,134 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, has_request_context, request
+
+# Longitud máxima aceptada para un X-Request-ID recibido del cliente
+MAX_REQUEST_ID_LENGTH = 64
+
+# Atributos estándar de LogRecord que no se copian como campos extra
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+def get_request_id():
+    """Id del request actual (None fuera de un request)"""
+    if not has_request_context():
+        return None
+
+    request_id = g.get('request_id')
+    if request_id is None:
+        incoming = request.headers.get('X-Request-ID', '')
+        if incoming and len(incoming) <= MAX_REQUEST_ID_LENGTH and incoming.isprintable():
+            request_id = incoming
+        else:
+            request_id = uuid.uuid4().hex
+        g.request_id = request_id
+    return request_id
+
+
+class RequestIdFilter(logging.Filter):
+    """Agrega request_id a cada registro emitido dentro de un request"""
+
+    def filter(self, record):
+        if getattr(record, 'request_id', None) is None:
+            record.request_id = get_request_id()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro; los `extra` se agregan como campos"""
+
+    def format(self, record):
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and value is not None:
+                payload[key] = value
+
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload['exc_info'] = record.exc_text
+
+        return json.dumps(payload, default=str)
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    QueueHandler con cola acotada: si se llena, el registro se descarta en
+    vez de bloquear el request. El formateo y la escritura ocurren en el
+    hilo del QueueListener.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.listener = None
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolver mensaje y traza aquí: el hilo de escritura no tiene contexto
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _stop_listener(listener):
+    """Vaciar la cola y detener el hilo (idempotente)"""
+    if listener._thread is not None:
+        listener.stop()
+
+
+def init_logging(app):
+    """
+    Enviar los logs de la app (y de app.requests) como JSON a stdout o a
+    LOG_FILE a través de una cola escrita por un hilo de fondo.
+    """
+    from flask.logging import default_handler
+
+    logger = app.logger
+    logger.setLevel(app.config['LOG_LEVEL'])
+
+    # create_app puede llamarse varias veces en el mismo proceso (tests)
+    for handler in list(logger.handlers):
+        if isinstance(handler, BackgroundQueueHandler):
+            _stop_listener(handler.listener)
+            logger.removeHandler(handler)
+
+    if not app.config['LOG_JSON']:
+        return
+
+    logger.removeHandler(default_handler)
+
+    if app.config['LOG_FILE']:
+        output = logging.FileHandler(app.config['LOG_FILE'])
+    else:
+        output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    handler = BackgroundQueueHandler(queue.Queue(maxsize=app.config['LOG_QUEUE_SIZE']))
+    handler.addFilter(RequestIdFilter())
+    handler.listener = QueueListener(handler.queue, output, respect_handler_level=True)
+    handler.listener.start()
+    atexit.register(_stop_listener, handler.listener)
+    logger.addHandler(handler)
+    app.extensions['log_handler'] = handler
@@ -0,0 +1,100 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Overrides comunes: sin rate limiting, logs fuera de stdout (la salida es
+# JSON) y el inspector de N+1 solo registra
+BENCH_CONFIG = {
+    'RATELIMIT_ENABLED': False,
+    'LOG_FILE': os.devnull,
+    'QUERY_INSPECTOR_RAISE': False
+}
+
+
+def percentile(values, pct):
+    """Percentil por rango más cercano (values no necesita estar ordenado)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(name, latencies, elapsed, errors=0, **extra):
+    """Resumen estándar (ms y req/s) de una medición"""
+    result = {
+        'name': name,
+        'requests': len(latencies),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 4),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3) if latencies else 0.0
+    }
+    result.update(extra)
+    return result
+
+
+def run_concurrent(make_worker, concurrency, requests_per_worker):
+    """
+    Ejecuta make_worker() en `concurrency` hilos; cada worker es una función
+    que hace un request y retorna True si fue exitoso.
+    Retorna (latencias, errores, tiempo total).
+    """
+    def loop():
+        call = make_worker()
+        latencies, errors = [], 0
+        for _ in range(requests_per_worker):
+            start = time.perf_counter()
+            ok = call()
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+        return latencies, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: loop(), range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [lat for lats, _ in results for lat in lats]
+    errors = sum(err for _, err in results)
+    return latencies, errors, elapsed
+
+
+def temp_sqlite_uri():
+    """URI de una base SQLite temporal (los benchmarks necesitan un archivo real)"""
+    fd, path = tempfile.mkstemp(suffix='.db', prefix='filmstack-bench-')
+    os.close(fd)
+    return f'sqlite:///{path}', path
+
+
+def git_revision():
+    """Commit actual, para poder comparar resultados entre versiones"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def emit(results, output=None):
+    """Escribe los resultados como JSON (stdout o archivo)"""
+    payload = json.dumps({
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'results': results
+    }, indent=2)
+    if output:
+        with open(output, 'w') as fh:
+            fh.write(payload + '\n')
+    else:
+        print(payload)
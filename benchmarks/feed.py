@@ -0,0 +1,179 @@
+"""
+Benchmark del feed: costo del fan-out y latencia de lectura.
+
+- fanout: tiempo de FeedService.fan_out (un INSERT ... SELECT) para autores
+  con distinto número de seguidores.
+- feed_timeline / feed_pull: GET /api/feed (primera página y una página
+  profunda) de un usuario que sigue a muchos autores, leyendo las filas
+  materializadas o leyendo todo en el momento (umbral de autores populares 0,
+  equivalente al JOIN follows x movies).
+
+Uso: python -m benchmarks.feed [--followers 10,100,1000,10000] [--fanouts 20] [--authors 200]
+       [--movies-per-author 50] [--concurrency 1,4,16] [--requests 20] [--output out.json]
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.models import User, Movie, Follow
+from app.services import FeedService
+from benchmarks.common import BENCH_CONFIG, run_concurrent, summarize, temp_sqlite_uri, emit
+from benchmarks.datagen import PASSWORD
+
+NOW = datetime(2024, 6, 1)
+
+
+def create_users(count, prefix):
+    """Insertar `count` usuarios en bloque y retornar sus ids"""
+    password_hash = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+    db.session.execute(insert(User), [
+        {'username': f'{prefix}{i}', 'email': f'{prefix}{i}@example.com',
+         'password_hash': password_hash, 'created_at': NOW, 'updated_at': NOW}
+        for i in range(count)
+    ])
+    db.session.commit()
+    return [
+        user_id for (user_id,) in db.session.query(User.id)
+        .filter(User.username.like(f'{prefix}%')).order_by(User.id)
+    ]
+
+
+def follow_all(follower_ids, followee_id):
+    """Seguimientos en bloque (sin pasar por el servicio) y su contador"""
+    db.session.execute(insert(Follow), [
+        {'follower_id': follower_id, 'followee_id': followee_id, 'created_at': NOW}
+        for follower_id in follower_ids
+    ])
+    db.session.execute(
+        update(User)
+        .where(User.id == followee_id)
+        .values(follower_count=User.follower_count + len(follower_ids))
+    )
+    db.session.commit()
+
+
+def add_movies(user_id, count, start):
+    db.session.execute(insert(Movie), [
+        {'title': f'Feed Movie {i}', 'year': 2001, 'director': 'Someone', 'genre': 'Drama',
+         'user_id': user_id, 'created_at': start + timedelta(minutes=i), 'updated_at': NOW}
+        for i in range(count)
+    ])
+    db.session.commit()
+    return [
+        movie_id for (movie_id,) in db.session.query(Movie.id)
+        .filter(Movie.user_id == user_id).order_by(Movie.created_at.desc()).limit(count)
+    ]
+
+
+def bench_fanout(app, follower_counts, fanouts):
+    results = []
+    with app.app_context():
+        followers = create_users(max(follower_counts), 'fan')
+        for index, count in enumerate(follower_counts):
+            author_id = create_users(1, f'author{index}-')[0]
+            follow_all(followers[:count], author_id)
+            movie_ids = add_movies(author_id, fanouts, NOW)
+
+            latencies = []
+            start = time.perf_counter()
+            for movie_id in movie_ids:
+                started = time.perf_counter()
+                FeedService.fan_out(movie_id)
+                latencies.append(time.perf_counter() - started)
+            elapsed = time.perf_counter() - start
+
+            results.append(summarize(
+                'fanout', latencies, elapsed,
+                followers=count,
+                rows_per_s=round(count * len(latencies) / elapsed, 1) if elapsed else 0.0
+            ))
+    return results
+
+
+def bench_reads(app, authors, movies_per_author, concurrency_levels, requests_per_worker):
+    with app.app_context():
+        reader_id = create_users(1, 'reader')[0]
+        author_ids = create_users(authors, 'writer')
+        for index, author_id in enumerate(author_ids):
+            follow_all([reader_id], author_id)
+            # Fechas intercaladas entre autores
+            add_movies(author_id, movies_per_author, NOW - timedelta(days=30, seconds=index))
+            FeedService.backfill(reader_id, author_id)
+
+    client = app.test_client()
+    token = client.post('/api/auth/login', json={
+        'email': 'reader0@example.com', 'password': PASSWORD
+    }).get_json()['data']['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    # Cursor de una página profunda (la 10ª)
+    cursor = None
+    for _ in range(9):
+        cursor = client.get('/api/feed', query_string={'cursor': cursor} if cursor else {},
+                            headers=headers).get_json()['data']['next_cursor']
+
+    results = []
+    for mode, threshold in (('feed_timeline', app.config['FEED_CELEBRITY_THRESHOLD']), ('feed_pull', 0)):
+        app.config['FEED_CELEBRITY_THRESHOLD'] = threshold
+        for page, params in (('first', {}), ('deep', {'cursor': cursor})):
+            for concurrency in concurrency_levels:
+                def make_worker():
+                    worker_client = app.test_client()
+                    return lambda: worker_client.get(
+                        '/api/feed', query_string=params, headers=headers
+                    ).status_code == 200
+
+                latencies, errors, elapsed = run_concurrent(make_worker, concurrency, requests_per_worker)
+                results.append(summarize(
+                    mode, latencies, elapsed, errors,
+                    page=page,
+                    concurrency=concurrency,
+                    followed_authors=authors,
+                    movies=authors * movies_per_author
+                ))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--followers', type=lambda v: [int(c) for c in v.split(',')], default=[10, 100, 1000, 10000])
+    parser.add_argument('--fanouts', type=int, default=20, help='películas por autor en la medición de fan-out')
+    parser.add_argument('--authors', type=int, default=200)
+    parser.add_argument('--movies-per-author', type=int, default=50)
+    parser.add_argument('--concurrency', type=lambda v: [int(c) for c in v.split(',')], default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=20, help='requests por worker')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    uri, path = temp_sqlite_uri()
+    app = create_app('testing', {
+        **BENCH_CONFIG,
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SQLITE_WAL_MODE': True,
+        # Todos los autores del benchmark se materializan
+        'FEED_CELEBRITY_THRESHOLD': max(args.followers) + 1,
+        'FEED_BACKFILL_SIZE': args.movies_per_author
+    })
+    try:
+        with app.app_context():
+            db.create_all()
+        results = bench_fanout(app, args.followers, args.fanouts)
+        results += bench_reads(app, args.authors, args.movies_per_author, args.concurrency, args.requests)
+    finally:
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+
+    emit(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark de throughput de login bajo concurrencia.
+
+Compara el hash en el hilo del request (PASSWORD_HASH_WORKERS=0) con el
+pool de procesos, usando el KDF de producción.
+
+Uso: python -m benchmarks.login [--concurrency 8] [--requests 10] [--output out.json]
+"""
+import argparse
+import os
+
+from app import create_app, db
+from benchmarks.common import BENCH_CONFIG, run_concurrent, summarize, temp_sqlite_uri, emit
+
+USER = {'username': 'bench', 'email': 'bench@example.com', 'password': 'password123'}
+
+
+def bench_login(workers, concurrency, requests_per_worker, method):
+    uri, path = temp_sqlite_uri()
+    app = create_app('testing', {
+        **BENCH_CONFIG,
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'PASSWORD_HASH_METHOD': method,
+        'PASSWORD_HASH_WORKERS': workers,
+        'PASSWORD_HASH_MAX_QUEUE': max(concurrency, 1),
+        'PASSWORD_HASH_QUEUE_TIMEOUT': 30
+    })
+    try:
+        with app.app_context():
+            db.create_all()
+        app.test_client().post('/api/auth/register', json=USER)
+
+        def make_worker():
+            client = app.test_client()
+            credentials = {'email': USER['email'], 'password': USER['password']}
+            return lambda: client.post('/api/auth/login', json=credentials).status_code == 200
+
+        latencies, errors, elapsed = run_concurrent(make_worker, concurrency, requests_per_worker)
+        return summarize(
+            'login', latencies, elapsed, errors,
+            hash_workers=workers, concurrency=concurrency, method=method
+        )
+    finally:
+        from app.utils.hashing import password_hasher
+        password_hasher.shutdown(app)
+        os.unlink(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--method', default='pbkdf2:sha256:600000')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    results = [
+        bench_login(0, args.concurrency, args.requests, args.method),
+        bench_login(args.workers, args.concurrency, args.requests, args.method)
+    ]
+    emit(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
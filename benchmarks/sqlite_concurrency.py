@@ -0,0 +1,109 @@
+"""
+Benchmark de lecturas concurrentes en SQLite mientras hay escrituras.
+
+Compara el journal por defecto (rollback) con SQLITE_WAL_MODE (WAL, PRAGMAs
+y pool de solo lectura para los GET).
+
+Uso: python -m benchmarks.sqlite_concurrency [--readers 8] [--duration 5] [--output out.json]
+"""
+import argparse
+import os
+import threading
+import time
+
+from app import create_app, db
+from benchmarks.common import BENCH_CONFIG, summarize, temp_sqlite_uri, emit
+
+USER = {'username': 'bench', 'email': 'bench@example.com', 'password': 'password123'}
+MOVIE = {'title': 'Bench Movie', 'year': 2001, 'director': 'Someone', 'genre': 'Drama'}
+
+
+def bench_mode(wal, readers, duration, seed_movies):
+    uri, path = temp_sqlite_uri()
+    app = create_app('testing', {
+        **BENCH_CONFIG,
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SQLITE_WAL_MODE': wal
+    })
+    try:
+        with app.app_context():
+            db.create_all()
+        client = app.test_client()
+        client.post('/api/auth/register', json=USER)
+        token = client.post('/api/auth/login', json={
+            'email': USER['email'], 'password': USER['password']
+        }).get_json()['data']['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        movie_ids = [
+            client.post('/api/movies/', json=MOVIE, headers=headers).get_json()['data']['id']
+            for _ in range(seed_movies)
+        ]
+
+        stop = threading.Event()
+        read_latencies, read_errors, writes = [], [0], [0]
+        lock = threading.Lock()
+
+        def writer():
+            writer_client = app.test_client()
+            while not stop.is_set():
+                response = writer_client.post('/api/movies/', json=MOVIE, headers=headers)
+                if response.status_code == 201:
+                    writes[0] += 1
+
+        def reader(offset):
+            reader_client = app.test_client()
+            latencies, errors, i = [], 0, offset
+            while not stop.is_set():
+                movie_id = movie_ids[i % len(movie_ids)]
+                start = time.perf_counter()
+                response = reader_client.get(f'/api/movies/{movie_id}', headers=headers)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+                i += 1
+            with lock:
+                read_latencies.extend(latencies)
+                read_errors[0] += errors
+
+        threads = [threading.Thread(target=writer)]
+        threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        return summarize(
+            'sqlite_reads_under_writes', read_latencies, elapsed, read_errors[0],
+            wal_mode=wal, readers=readers, writes=writes[0]
+        )
+    finally:
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--seed-movies', type=int, default=100)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    results = [
+        bench_mode(False, args.readers, args.duration, args.seed_movies),
+        bench_mode(True, args.readers, args.duration, args.seed_movies)
+    ]
+    emit(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark de arranque en frío: tiempo de importación, de create_app y del
+primer request, cada uno medido en un intérprete nuevo.
+
+Uso: python -m benchmarks.startup [--runs 5] [--output out.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.common import percentile, temp_sqlite_uri, emit
+
+# Se ejecuta en un proceso hijo para medir un arranque realmente en frío
+CHILD = r'''
+import json, os, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app('testing', {
+    'SQLALCHEMY_DATABASE_URI': sys.argv[1],
+    'DB_CREATE_ALL_ON_STARTUP': sys.argv[2] == '1',
+    'LOG_FILE': os.devnull
+})
+created = time.perf_counter()
+response = app.test_client().get('/api/movies/search?title=matrix')
+first = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    'import_s': imported - start,
+    'create_app_s': created - imported,
+    'first_request_s': first - created,
+    'total_s': first - start,
+    'modules': len(sys.modules)
+}))
+'''
+
+
+def measure(uri, create_all, runs):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = []
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, '-c', CHILD, uri, '1' if create_all else '0'],
+            cwd=root
+        )
+        samples.append(json.loads(output))
+
+    result = {'name': 'startup', 'create_all_on_startup': create_all, 'runs': runs}
+    for key in ('import_s', 'create_app_s', 'first_request_s', 'total_s'):
+        values = [sample[key] for sample in samples]
+        result[f'{key[:-2]}_p50_ms'] = round(percentile(values, 50) * 1000, 2)
+        result[f'{key[:-2]}_max_ms'] = round(max(values) * 1000, 2)
+    result['modules_loaded'] = samples[-1]['modules']
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    uri, path = temp_sqlite_uri()
+    try:
+        results = [measure(uri, True, args.runs), measure(uri, False, args.runs)]
+    finally:
+        os.unlink(path)
+    emit(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Suite de benchmarks de los endpoints principales con datos sintéticos.
+
+Genera una base SQLite con benchmarks.datagen, levanta el stub de TMDB y
+mide p50/p99 y throughput de login, list, detail, create, search y delete
+en varios niveles de concurrencia. La salida JSON incluye el commit para
+comparar versiones.
+
+Uso: python -m benchmarks.suite [--concurrency 1,4,16] [--requests 20] [--max-movies 100000]
+       [--tmdb-latency 0.05] [--tmdb-failure-rate 0.0] [--only list,search] [--output out.json]
+"""
+import argparse
+import itertools
+import os
+import random
+import threading
+
+from app import create_app, db
+from app.models import Movie
+from benchmarks.common import BENCH_CONFIG, run_concurrent, summarize, temp_sqlite_uri, emit
+from benchmarks.datagen import generate, bench_user
+from benchmarks.tmdb_stub import TMDbStubServer
+
+SCENARIOS = ('login', 'list', 'list_large', 'detail', 'detail_tmdb', 'create', 'search', 'delete')
+SEARCH_TERMS = ('matrix', 'star', 'night', 'blue city', 'the last', 'iron', 'ghost story', 'summer')
+NEW_MOVIE = {'title': 'Bench Movie', 'year': 2001, 'director': 'Someone', 'genre': 'Drama'}
+
+
+class BenchContext:
+    """Datos compartidos por los escenarios: usuarios, tokens e ids"""
+
+    def __init__(self, app, counts, seed):
+        self.app = app
+        self.rng = random.Random(seed)
+        self.user_ids = list(counts)
+        self.heavy_user = self.user_ids[0]
+        # Usuario "típico": la mediana de tamaño de biblioteca
+        self.typical_user = sorted(self.user_ids[1:] or self.user_ids, key=counts.get)[len(counts) // 2 - 1]
+        self.tokens = {}
+        self._lock = threading.Lock()
+
+        client = app.test_client()
+        for index, user_id in enumerate(self.user_ids):
+            credentials = bench_user(index)
+            response = client.post('/api/auth/login', json={
+                'email': credentials['email'], 'password': credentials['password']
+            })
+            self.tokens[user_id] = response.get_json()['data']['access_token']
+
+        with app.app_context():
+            self.movie_ids = [
+                movie_id for (movie_id,) in db.session.query(Movie.id)
+                .filter(Movie.user_id == self.heavy_user).limit(5000)
+            ]
+            self.tmdb_movie_ids = [
+                movie_id for (movie_id,) in db.session.query(Movie.id)
+                .filter(Movie.user_id == self.heavy_user, Movie.imdb_id.isnot(None)).limit(5000)
+            ]
+        self._users = itertools.cycle(range(len(self.user_ids)))
+
+    def headers(self, user_id):
+        return {'Authorization': f'Bearer {self.tokens[user_id]}'}
+
+    def next_user_index(self):
+        with self._lock:
+            return next(self._users)
+
+
+def make_worker_factory(ctx, scenario, requests_per_worker):
+    """Retorna make_worker() para run_concurrent según el escenario"""
+    app = ctx.app
+
+    def make_worker():
+        client = app.test_client()
+        rng = random.Random(ctx.rng.random())
+
+        if scenario == 'login':
+            credentials = bench_user(ctx.next_user_index())
+            body = {'email': credentials['email'], 'password': credentials['password']}
+            return lambda: client.post('/api/auth/login', json=body).status_code == 200
+
+        if scenario in ('list', 'list_large'):
+            user_id = ctx.heavy_user if scenario == 'list_large' else ctx.typical_user
+            headers = ctx.headers(user_id)
+            return lambda: client.get('/api/movies/', headers=headers).status_code == 200
+
+        headers = ctx.headers(ctx.heavy_user)
+
+        if scenario in ('detail', 'detail_tmdb'):
+            ids = ctx.movie_ids if scenario == 'detail' else ctx.tmdb_movie_ids
+            suffix = '' if scenario == 'detail' else '/details'
+            return lambda: client.get(
+                f'/api/movies/{rng.choice(ids)}{suffix}', headers=headers
+            ).status_code == 200
+
+        if scenario == 'create':
+            return lambda: client.post('/api/movies/', json=NEW_MOVIE, headers=headers).status_code == 201
+
+        if scenario == 'search':
+            return lambda: client.get(
+                '/api/movies/search', query_string={'title': rng.choice(SEARCH_TERMS)}
+            ).status_code == 200
+
+        if scenario == 'delete':
+            # Las películas a borrar se crean antes de medir
+            pending = [
+                client.post('/api/movies/', json=NEW_MOVIE, headers=headers).get_json()['data']['id']
+                for _ in range(requests_per_worker)
+            ]
+            return lambda: client.delete(f'/api/movies/{pending.pop()}', headers=headers).status_code == 200
+
+        raise ValueError(f'Escenario desconocido: {scenario}')
+
+    return make_worker
+
+
+def run_suite(args):
+    uri, path = temp_sqlite_uri()
+    stub = TMDbStubServer(
+        latency=args.tmdb_latency,
+        failure_rate=args.tmdb_failure_rate,
+        seed=args.seed
+    ).start()
+    app = create_app('testing', {
+        **BENCH_CONFIG,
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SQLITE_WAL_MODE': True,
+        'TMDB_API_KEY': 'bench',
+        'TMDB_BASE_URL': stub.base_url
+    })
+    results = []
+    try:
+        with app.app_context():
+            db.create_all()
+            counts = generate(args.users, args.max_movies, args.seed)
+        ctx = BenchContext(app, counts, args.seed)
+
+        scenarios = args.only.split(',') if args.only else SCENARIOS
+        for scenario in scenarios:
+            requests_per_worker = args.large_requests if scenario == 'list_large' else args.requests
+            for concurrency in args.concurrency:
+                latencies, errors, elapsed = run_concurrent(
+                    make_worker_factory(ctx, scenario, requests_per_worker),
+                    concurrency,
+                    requests_per_worker
+                )
+                results.append(summarize(
+                    scenario, latencies, elapsed, errors,
+                    concurrency=concurrency,
+                    movies=args.max_movies if scenario == 'list_large' else counts[ctx.typical_user],
+                    tmdb_latency_s=args.tmdb_latency
+                ))
+    finally:
+        stub.stop()
+        os.unlink(path)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--concurrency', type=lambda v: [int(c) for c in v.split(',')], default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=20, help='requests por worker')
+    parser.add_argument('--large-requests', type=int, default=2, help='requests por worker en list_large')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--max-movies', type=int, default=100000)
+    parser.add_argument('--tmdb-latency', type=float, default=0.05)
+    parser.add_argument('--tmdb-failure-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', help=f"subconjunto de: {','.join(SCENARIOS)}")
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    emit(run_suite(args), args.output)
+
+
+if __name__ == '__main__':
+    main()
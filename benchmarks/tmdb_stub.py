@@ -0,0 +1,203 @@
+"""
+Servidor local que imita la API de TMDB para tests y benchmarks.
+
+Latencia y tasa de fallos configurables; los datos son deterministas a
+partir del id. Rutas: /search/movie, /movie/<id>, /movie/<id>/credits
+y /movie/<id>/images, e imágenes en /t/p/<size>/<archivo>.
+
+Uso: python -m benchmarks.tmdb_stub [--port 8765] [--latency 0.05] [--failure-rate 0.0]
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+GENRES = ['Action', 'Comedy', 'Drama', 'Horror', 'Science Fiction', 'Thriller', 'Animation', 'Romance']
+
+
+def fake_details(movie_id):
+    """Detalles deterministas de una película"""
+    rng = random.Random(movie_id)
+    return {
+        'id': movie_id,
+        'title': f'Movie {movie_id}',
+        'original_title': f'Movie {movie_id}',
+        'release_date': f'{rng.randint(1950, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+        'overview': f'Overview of movie {movie_id}',
+        'poster_path': f'/poster{movie_id}.jpg',
+        'backdrop_path': f'/backdrop{movie_id}.jpg',
+        'vote_average': round(rng.uniform(1, 10), 1),
+        'runtime': rng.randint(80, 180),
+        'genres': [{'id': i, 'name': name} for i, name in enumerate(rng.sample(GENRES, 2))]
+    }
+
+
+def fake_credits(movie_id):
+    """Créditos deterministas (incluye un director)"""
+    return {
+        'id': movie_id,
+        'cast': [
+            {'id': movie_id * 100 + i, 'name': f'Actor {movie_id}-{i}', 'character': f'Role {i}', 'order': i}
+            for i in range(5)
+        ],
+        'crew': [
+            {'id': movie_id * 100 + 50, 'name': f'Director {movie_id}', 'job': 'Director', 'department': 'Directing'},
+            {'id': movie_id * 100 + 51, 'name': f'Writer {movie_id}', 'job': 'Screenplay', 'department': 'Writing'}
+        ]
+    }
+
+
+def fake_images(movie_id):
+    """Imágenes deterministas"""
+    return {
+        'id': movie_id,
+        'posters': [{'file_path': f'/poster{movie_id}-{i}.jpg', 'width': 500, 'height': 750} for i in range(3)],
+        'backdrops': [{'file_path': f'/backdrop{movie_id}-{i}.jpg', 'width': 1280, 'height': 720} for i in range(2)]
+    }
+
+
+def fake_image(size, filename):
+    """Bytes deterministas con cabecera JPEG (el tamaño escala con `size`)"""
+    width = 780 if size == 'original' else int(size[1:])
+    seed = zlib.crc32(f'{size}/{filename}'.encode('utf-8')).to_bytes(4, 'big')
+    return b'\xff\xd8\xff\xe0' + seed * (width * 4)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Handler HTTP del stub; la configuración vive en el servidor"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_bytes(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            server.paths.append(self.path)
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if server.failure_rate and server.rng.random() < server.failure_rate:
+            return self._send_json(503, {'status_message': 'Service unavailable (stub)'})
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        path = url.path
+
+        image = re.match(r'^/t/p/(w\d+|original)/([\w-]+\.jpg)$', path)
+        if image:
+            if image.group(2).startswith('missing'):
+                return self._send_json(404, {'status_message': 'Not found'})
+            return self._send_bytes(200, fake_image(*image.groups()), 'image/jpeg')
+
+        if path == '/search/movie':
+            title = query.get('query', [''])[0]
+            results = []
+            for i in range(1, 6):
+                movie_id = zlib.crc32(title.encode('utf-8')) % 10000 * 10 + i
+                details = fake_details(movie_id)
+                details['title'] = f'{title} {i}' if i > 1 else title
+                results.append(details)
+            return self._send_json(200, {'page': 1, 'results': results, 'total_results': len(results)})
+
+        match = re.match(r'^/movie/(\d+)(/credits|/images)?$', path)
+        if match:
+            movie_id = int(match.group(1))
+            if movie_id in server.missing_ids:
+                return self._send_json(404, {'status_message': 'The resource you requested could not be found.'})
+            if movie_id in server.malformed_ids:
+                # Como un proxy o CDN que responde 200 con una página HTML
+                return self._send_bytes(200, b'<html>Bad gateway</html>', 'text/html')
+
+            suffix = match.group(2)
+            if suffix == '/credits':
+                return self._send_json(200, fake_credits(movie_id))
+            if suffix == '/images':
+                return self._send_json(200, fake_images(movie_id))
+
+            details = fake_details(movie_id)
+            append = query.get('append_to_response', [''])[0].split(',')
+            if 'credits' in append:
+                details['credits'] = fake_credits(movie_id)
+            if 'images' in append:
+                details['images'] = fake_images(movie_id)
+            return self._send_json(200, details)
+
+        self._send_json(404, {'status_message': 'Not found'})
+
+
+class TMDbStubServer(ThreadingHTTPServer):
+    """Servidor stub de TMDB que corre en un hilo de fondo"""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, failure_rate=0.0, missing_ids=(), malformed_ids=(), seed=0):
+        super().__init__(('127.0.0.1', port), StubHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.missing_ids = set(missing_ids)
+        self.malformed_ids = set(malformed_ids)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.paths = []
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = TMDbStubServer(args.port, args.latency, args.failure_rate)
+    print(f'TMDB stub escuchando en {server.base_url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,35 @@
 import os
+import tempfile
 from datetime import timedelta
 from dotenv import load_dotenv
 
 load_dotenv()
 
+def _env_list(name, default=''):
+    """Lista separada por comas desde una variable de entorno"""
+    return [item.strip() for item in os.getenv(name, default).split(',') if item.strip()]
+
+def _pool_options():
+    """Opciones del pool de conexiones (SQLAlchemy / psycopg) desde el entorno"""
+    options = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        'pool_use_lifo': os.getenv('DB_POOL_USE_LIFO', 'false').lower() == 'true'
+    }
+    
+    # psycopg 3: ejecuciones antes de preparar una sentencia ('none' lo desactiva,
+    # necesario detrás de PgBouncer en modo transaction)
+    prepare_threshold = os.getenv('DB_PREPARE_THRESHOLD')
+    if prepare_threshold is not None:
+        options['connect_args'] = {
+            'prepare_threshold': None if prepare_threshold.lower() == 'none' else int(prepare_threshold)
+        }
+    
+    return options
+
 class Config:
     """Configuración base de la aplicación"""
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -11,7 +37,182 @@ class Config:
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     TMDB_API_KEY = os.getenv('TMDB_API_KEY', '')
+    TMDB_BASE_URL = os.getenv('TMDB_BASE_URL', 'https://api.themoviedb.org/3')
+    TMDB_TIMEOUT = float(os.getenv('TMDB_TIMEOUT', 5))
+    # Cliente asíncrono: llamadas simultáneas a TMDB por request
+    TMDB_MAX_CONCURRENCY = int(os.getenv('TMDB_MAX_CONCURRENCY', 8))
+    TMDB_IMAGE_URL = os.getenv('TMDB_IMAGE_URL', 'https://image.tmdb.org/t/p')
+    # Límite de llamadas salientes a TMDB (cliente asíncrono; 0 = sin límite)
+    TMDB_RATE_LIMIT = int(os.getenv('TMDB_RATE_LIMIT', 40))
+    TMDB_RATE_WINDOW = float(os.getenv('TMDB_RATE_WINDOW', 1))
+    # Máximo de ids por POST /api/movies/tmdb/resolve
+    TMDB_RESOLVE_MAX_IDS = int(os.getenv('TMDB_RESOLVE_MAX_IDS', 500))
+    # Caché de detalles de TMDB (con créditos) por TMDB ID
+    TMDB_DETAILS_CACHE_SIZE = int(os.getenv('TMDB_DETAILS_CACHE_SIZE', 2048))
+    TMDB_DETAILS_CACHE_TTL = int(os.getenv('TMDB_DETAILS_CACHE_TTL', 3600))
+    
+    # Proxy de posters (/api/posters/<size>/<archivo>) con caché LRU en disco
+    POSTER_SIZES = _env_list('POSTER_SIZES', 'w92,w154,w185,w342,w500,w780,original')
+    POSTER_CACHE_DIR = os.getenv('POSTER_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'movies-api-posters'))
+    POSTER_CACHE_MAX_BYTES = int(os.getenv('POSTER_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    POSTER_MAX_BYTES = int(os.getenv('POSTER_MAX_BYTES', 10 * 1024 * 1024))
+    POSTER_MAX_AGE = int(os.getenv('POSTER_MAX_AGE', 365 * 24 * 3600))
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000')
+    
+    # Crear tablas al arrancar cada proceso; si es False se usa `flask migrate`
+    DB_CREATE_ALL_ON_STARTUP = os.getenv('DB_CREATE_ALL_ON_STARTUP', 'true').lower() == 'true'
+    
+    # Réplica de lectura: los GET de auth/movies leen de aquí; el cliente que
+    # escribió lee del primario durante READ_YOUR_WRITES_WINDOW segundos (la
+    # respuesta de la escritura trae la cookie last_write y el header
+    # X-Last-Write; los clientes sin cookies reenvían el header)
+    DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+    READ_YOUR_WRITES_WINDOW = float(os.getenv('READ_YOUR_WRITES_WINDOW', 5))
+    
+    # SQLite de alta concurrencia: WAL, PRAGMAs y pool de solo lectura para GETs
+    SQLITE_WAL_MODE = os.getenv('SQLITE_WAL_MODE', 'false').lower() == 'true'
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', -64000))  # negativo = KiB
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))  # ms
+    SQLITE_READ_ONLY_POOL = os.getenv('SQLITE_READ_ONLY_POOL', 'true').lower() == 'true'
+    
+    # Usuarios con acceso a los endpoints internos (/api/internal)
+    ADMIN_EMAILS = _env_list('ADMIN_EMAILS')
+    
+    # Hash de contraseñas (método KDF de Werkzeug y pool de procesos)
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_HASH_SALT_LENGTH = int(os.getenv('PASSWORD_HASH_SALT_LENGTH', 16))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_QUEUE = int(os.getenv('PASSWORD_HASH_MAX_QUEUE', 16))
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', 2))
+    PASSWORD_HASH_START_METHOD = os.getenv('PASSWORD_HASH_START_METHOD', 'spawn')
+    
+    # Rate limiting: memory:// (por proceso) o sqlite:///ruta.db (compartido)
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'
+    RATELIMIT_STORAGE_URL = os.getenv('RATELIMIT_STORAGE_URL', 'memory://')
+    
+    # Proxies inversos delante de la app (ProxyFix): cuántos saltos de
+    # X-Forwarded-For / X-Forwarded-Proto son de confianza. Con 0 se usa la
+    # IP de la conexión; detrás de un balanceador todos los clientes anónimos
+    # compartirían su IP (y su límite). Nunca más saltos que proxies reales:
+    # el cliente podría falsificar su IP enviando el header
+    PROXY_FIX_X_FOR = int(os.getenv('PROXY_FIX_X_FOR', 0))
+    PROXY_FIX_X_PROTO = int(os.getenv('PROXY_FIX_X_PROTO', 0))
+    
+    # Caché por proceso del usuario autenticado
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))
+    USER_CACHE_TRUST_JWT_CLAIMS = os.getenv('USER_CACHE_TRUST_JWT_CLAIMS', 'false').lower() == 'true'
+    
+    # Revocación de tokens (filtro de Bloom reconstruido periódicamente)
+    TOKEN_BLOCKLIST_CAPACITY = int(os.getenv('TOKEN_BLOCKLIST_CAPACITY', 100000))
+    TOKEN_BLOCKLIST_ERROR_RATE = float(os.getenv('TOKEN_BLOCKLIST_ERROR_RATE', 0.001))
+    TOKEN_BLOCKLIST_REFRESH = int(os.getenv('TOKEN_BLOCKLIST_REFRESH', 30))
+    
+    # Compresión de respuestas (gzip; brotli si el paquete `brotli` está instalado)
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+    COMPRESS_MIMETYPES = _env_list('COMPRESS_MIMETYPES', 'application/json,text/html,text/plain,text/csv')
+    COMPRESS_CACHE_SIZE = int(os.getenv('COMPRESS_CACHE_SIZE', 64))
+    COMPRESS_CACHE_TTL = int(os.getenv('COMPRESS_CACHE_TTL', 300))
+    
+    # Métricas en /metrics; con varios workers cada proceso vuelca las suyas
+    # a METRICS_MULTIPROC_DIR (vaciarlo al desplegar)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+    
+    # Profiling bajo demanda (cProfile): muestra aleatoria o `X-Profile: 1` de admins
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+    PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(tempfile.gettempdir(), 'movies-api-profiles'))
+    PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', 50))
+    
+    # Logs JSON escritos por un hilo de fondo; auditoría de requests muestreada
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_JSON = os.getenv('LOG_JSON', 'true').lower() == 'true'
+    LOG_FILE = os.getenv('LOG_FILE')
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 0.1))
+    LOG_BODIES = os.getenv('LOG_BODIES', 'false').lower() == 'true'
+    LOG_BODY_MAX_BYTES = int(os.getenv('LOG_BODY_MAX_BYTES', 1024))
+    
+    # Inspector de consultas: log de consultas lentas con EXPLAIN y detección de N+1
+    QUERY_INSPECTOR_ENABLED = os.getenv('QUERY_INSPECTOR_ENABLED', 'true').lower() == 'true'
+    SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+    SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'
+    N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 10))
+    # Solo para tests: el error llega después de que la vista confirmó sus cambios
+    QUERY_INSPECTOR_RAISE = os.getenv('QUERY_INSPECTOR_RAISE', 'false').lower() == 'true'
+    
+    # Control de admisión: concurrencia por clase de ruta con límite adaptativo
+    # (AIMD según la latencia objetivo en s); sin hueco se espera en una cola
+    # acotada y, pasado el plazo, se responde 503 con Retry-After
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_QUEUE_SIZE = int(os.getenv('ADMISSION_QUEUE_SIZE', 64))
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 0.5))
+    ADMISSION_MIN_LIMIT = int(os.getenv('ADMISSION_MIN_LIMIT', 2))
+    ADMISSION_CLASSES = {
+        'default': {
+            'limit': int(os.getenv('ADMISSION_DEFAULT_LIMIT', 32)),
+            'max_limit': int(os.getenv('ADMISSION_DEFAULT_MAX_LIMIT', 256)),
+            'target_latency': float(os.getenv('ADMISSION_DEFAULT_TARGET_LATENCY', 0.25))
+        },
+        'auth': {
+            'limit': int(os.getenv('ADMISSION_AUTH_LIMIT', 8)),
+            'max_limit': int(os.getenv('ADMISSION_AUTH_MAX_LIMIT', 32)),
+            'target_latency': float(os.getenv('ADMISSION_AUTH_TARGET_LATENCY', 1.0))
+        },
+        'tmdb': {
+            'limit': int(os.getenv('ADMISSION_TMDB_LIMIT', 16)),
+            'max_limit': int(os.getenv('ADMISSION_TMDB_MAX_LIMIT', 64)),
+            'target_latency': float(os.getenv('ADMISSION_TMDB_TARGET_LATENCY', 2.0))
+        }
+    }
+    
+    # Idempotency-Key en POST /api/movies/ y /api/auth/register: respuestas
+    # guardadas IDEMPOTENCY_TTL s; los duplicados en curso esperan hasta
+    # IDEMPOTENCY_WAIT_TIMEOUT s; purga en lotes cada IDEMPOTENCY_PURGE_INTERVAL s.
+    # Una clave en curso queda reservada IDEMPOTENCY_LOCK_TIMEOUT s (más que
+    # el request más lento): si el worker muere, un reintento la retoma
+    IDEMPOTENCY_ENABLED = os.getenv('IDEMPOTENCY_ENABLED', 'true').lower() == 'true'
+    IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 24 * 3600))
+    IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', 10))
+    IDEMPOTENCY_LOCK_TIMEOUT = float(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+    IDEMPOTENCY_POLL_INTERVAL = float(os.getenv('IDEMPOTENCY_POLL_INTERVAL', 0.05))
+    IDEMPOTENCY_PURGE_INTERVAL = int(os.getenv('IDEMPOTENCY_PURGE_INTERVAL', 3600))
+    IDEMPOTENCY_PURGE_BATCH = int(os.getenv('IDEMPOTENCY_PURGE_BATCH', 1000))
+    
+    # Tareas de fondo (rebalanceo de colecciones, ...) en un hilo por proceso
+    JOBS_SYNC = os.getenv('JOBS_SYNC', 'false').lower() == 'true'
+    JOBS_QUEUE_SIZE = int(os.getenv('JOBS_QUEUE_SIZE', 1000))
+    
+    # Colecciones: al superar este largo de clave de orden se rebalancea en segundo plano
+    COLLECTION_RANK_MAX_LENGTH = int(os.getenv('COLLECTION_RANK_MAX_LENGTH', 24))
+    COLLECTION_PAGE_SIZE = int(os.getenv('COLLECTION_PAGE_SIZE', 50))
+    COLLECTION_MAX_PAGE_SIZE = int(os.getenv('COLLECTION_MAX_PAGE_SIZE', 200))
+    
+    # Historial de visualizaciones (paginado por cursor)
+    HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', 50))
+    HISTORY_MAX_PAGE_SIZE = int(os.getenv('HISTORY_MAX_PAGE_SIZE', 200))
+    
+    # Feed: desde este número de seguidores no se copia a cada timeline (se lee al pedir el feed)
+    FEED_CELEBRITY_THRESHOLD = int(os.getenv('FEED_CELEBRITY_THRESHOLD', 10000))
+    # Películas recientes que se copian al feed al empezar a seguir a alguien
+    FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', 50))
+    FEED_PAGE_SIZE = int(os.getenv('FEED_PAGE_SIZE', 30))
+    FEED_MAX_PAGE_SIZE = int(os.getenv('FEED_MAX_PAGE_SIZE', 100))
+    # Fan-outs y backfills perdidos (reinicio, cola llena) se repiten cada
+    # FEED_REPAIR_INTERVAL s (o con `flask repair-feed`): los que siguen
+    # pendientes FEED_REPAIR_GRACE s después de crearse y tienen menos de
+    # FEED_REPAIR_WINDOW s, de a FEED_REPAIR_BATCH
+    FEED_REPAIR_INTERVAL = int(os.getenv('FEED_REPAIR_INTERVAL', 300))
+    FEED_REPAIR_GRACE = int(os.getenv('FEED_REPAIR_GRACE', 60))
+    FEED_REPAIR_WINDOW = int(os.getenv('FEED_REPAIR_WINDOW', 24 * 3600))
+    FEED_REPAIR_BATCH = int(os.getenv('FEED_REPAIR_BATCH', 500))
 
 class DevelopmentConfig(Config):
     """Configuración para desarrollo"""
@@ -25,16 +226,25 @@ class ProductionConfig(Config):
     """Configuración para producción"""
     DEBUG = False
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
+    # Arranque rápido: el esquema se crea con `flask migrate` en el despliegue
+    DB_CREATE_ALL_ON_STARTUP = os.getenv('DB_CREATE_ALL_ON_STARTUP', 'false').lower() == 'true'
+    SQLALCHEMY_ENGINE_OPTIONS = _pool_options()
 
 class TestingConfig(Config):
     """Configuración para pruebas"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=5)
+    # KDF barato y sin pool de procesos para que los tests sean rápidos
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    PASSWORD_HASH_WORKERS = 0
+    QUERY_INSPECTOR_RAISE = True
+    # Las tareas de fondo corren en el mismo hilo del request
+    JOBS_SYNC = True
 
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
     'testing': TestingConfig,
     'default': DevelopmentConfig
-}
\ No newline at end of file
+}
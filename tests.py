@@ -1,18 +1,34 @@
+import threading
+from datetime import datetime
+import jwt as pyjwt
 import pytest
 from app import create_app, db
 from app.models import User, Movie
 
 
 @pytest.fixture
-def app():
-    """Crear app en modo testing"""
-    app = create_app('testing')
+def app_config():
+    """Overrides de configuración de la app (las clases lo redefinen)"""
+    return {}
+
+
+@pytest.fixture
+def app(request, app_config):
+    """
+    Crear app en modo testing. Sobre `app_config` se aplican los overrides
+    de `@pytest.mark.parametrize('app', [{...}], indirect=True)`.
+    """
+    app = create_app('testing', {**app_config, **getattr(request, 'param', {})})
     
     with app.app_context():
         db.create_all()
         yield app
         db.session.remove()
         db.drop_all()
+        for engine in db.engines.values():
+            engine.dispose()
+    # La metadata por bind vive en `db`, compartida con las demás apps
+    db.metadatas.pop('replica', None)
 
 
 @pytest.fixture
@@ -48,6 +64,36 @@ def auth_token(client, registered_user):
     return response.get_json()['data']['access_token']
 
 
+@pytest.fixture
+def auth_headers(client, user_data):
+    """
+    Registrar (una vez) e iniciar sesión; retorna el header Authorization.
+    Sin argumentos usa `user_data`; con un nombre crea `<nombre>@example.com`.
+    """
+    registered = set()
+    
+    def login(user=None):
+        if user is None:
+            user = user_data
+        elif isinstance(user, str):
+            user = {'username': user, 'email': f'{user}@example.com', 'password': 'password123'}
+        if user['email'] not in registered:
+            client.post('/api/auth/register', json=user)
+            registered.add(user['email'])
+        token = client.post('/api/auth/login', json={
+            'email': user['email'],
+            'password': user['password']
+        }).get_json()['data']['access_token']
+        return {'Authorization': f'Bearer {token}'}
+    
+    return login
+
+
+def decode_jti(token):
+    """Extraer el jti de un token sin verificarlo"""
+    return pyjwt.decode(token, options={'verify_signature': False})['jti']
+
+
 # ============= TESTS DE AUTENTICACIÓN =============
 
 class TestAuth:
@@ -295,4 +341,2131 @@ class TestMovies:
             f'/api/movies/{movie_id}',
             headers={'Authorization': f'Bearer {auth_token}'}
         )
-        assert get_response.status_code == 404
\ No newline at end of file
+        assert get_response.status_code == 404
+
+# ============= TESTS DE HASH DE CONTRASEÑAS =============
+
+class TestPasswordHashing:
+    """Tests para el subsistema de hash de contraseñas"""
+    
+    def test_normalize_hash_method(self):
+        """Los métodos abreviados se normalizan a la forma guardada"""
+        from app.utils.hashing import normalize_hash_method
+        assert normalize_hash_method('scrypt') == 'scrypt:32768:8:1'
+        assert normalize_hash_method('pbkdf2:sha256:1000') == 'pbkdf2:sha256:1000'
+        assert normalize_hash_method('pbkdf2').startswith('pbkdf2:sha256:')
+    
+    def test_rehash_on_login(self, app, client, registered_user):
+        """El hash se actualiza al iniciar sesión si cambió el coste"""
+        user = User.query.filter_by(email=registered_user['email']).first()
+        assert user.password_hash.startswith('pbkdf2:sha256:1000$')
+        
+        app.extensions['password_hasher'].method = 'pbkdf2:sha256:2000'
+        response = client.post('/api/auth/login', json={
+            'email': registered_user['email'],
+            'password': registered_user['password']
+        })
+        assert response.status_code == 200
+        
+        db.session.expire_all()
+        user = User.query.filter_by(email=registered_user['email']).first()
+        assert user.password_hash.startswith('pbkdf2:sha256:2000$')
+        assert user.check_password(registered_user['password'])
+    
+    def test_queue_full_returns_503(self, app, client, registered_user):
+        """Con la cola llena el login responde 503 rápido"""
+        state = app.extensions['password_hasher']
+        state.workers = 1
+        state.queue_timeout = 0.01
+        state.slots = threading.BoundedSemaphore(1)
+        state.slots.acquire()
+        
+        response = client.post('/api/auth/login', json={
+            'email': registered_user['email'],
+            'password': registered_user['password']
+        })
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+    
+    @pytest.mark.parametrize('app', [
+        {'PASSWORD_HASH_WORKERS': 1, 'PASSWORD_HASH_START_METHOD': 'fork'}
+    ], indirect=True)
+    def test_process_pool(self, app):
+        """El hash se calcula en el pool de procesos"""
+        from app.utils.hashing import password_hasher
+        pwhash = password_hasher.hash('secret')
+        assert password_hasher.verify(pwhash, 'secret')
+        assert not password_hasher.verify(pwhash, 'other')
+        password_hasher.shutdown(app)
+
+
+# ============= TESTS DE RATE LIMITING =============
+
+class TestRateLimit:
+    """Tests para el limitador de requests"""
+    
+    def test_gcra_allows_burst_then_blocks(self):
+        """GCRA permite una ráfaga de max_requests y luego bloquea"""
+        from app.utils.rate_limit import MemoryStore
+        store = MemoryStore()
+        results = [store.hit('k', 3, 60, now=1000.0) for _ in range(4)]
+        assert [r.allowed for r in results] == [True, True, True, False]
+        assert [r.remaining for r in results[:3]] == [2, 1, 0]
+        assert results[3].retry_after == pytest.approx(20.0)
+        # Tras un intervalo se libera un hueco
+        assert store.hit('k', 3, 60, now=1020.0).allowed
+    
+    def test_idle_keys_expire(self):
+        """Las claves inactivas se eliminan en el barrido"""
+        from app.utils.rate_limit import MemoryStore
+        store = MemoryStore(sweep_every=2)
+        store.hit('a', 10, 10, now=0.0)
+        store.hit('b', 10, 10, now=100.0)
+        assert len(store) == 1
+    
+    def test_sqlite_store_shared(self, tmp_path):
+        """Dos instancias sobre el mismo archivo comparten el estado"""
+        from app.utils.rate_limit import SQLiteStore
+        path = str(tmp_path / 'ratelimit.db')
+        first, second = SQLiteStore(path), SQLiteStore(path)
+        assert first.hit('k', 2, 60, now=0.0).allowed
+        assert second.hit('k', 2, 60, now=0.0).allowed
+        assert not first.hit('k', 2, 60, now=0.0).allowed
+    
+    def test_login_rate_limited(self, client, registered_user):
+        """El login responde 429 con headers X-RateLimit-*"""
+        credentials = {'email': registered_user['email'], 'password': 'wrongpassword'}
+        for _ in range(10):
+            response = client.post('/api/auth/login', json=credentials)
+            assert response.status_code == 401
+            assert 'X-RateLimit-Remaining' in response.headers
+        
+        response = client.post('/api/auth/login', json=credentials)
+        assert response.status_code == 429
+        assert response.headers['X-RateLimit-Remaining'] == '0'
+        assert int(response.headers['Retry-After']) >= 1
+    
+    @pytest.mark.parametrize('app, shared', [
+        ({}, True),
+        ({'PROXY_FIX_X_FOR': 1}, False)
+    ], indirect=['app'])
+    def test_forwarded_for_identity(self, client, shared):
+        """Con PROXY_FIX_X_FOR la IP anónima sale de X-Forwarded-For; sin él se ignora"""
+        credentials = {'email': 'nadie@example.com', 'password': 'wrongpassword'}
+        for _ in range(10):
+            client.post('/api/auth/login', json=credentials, headers={'X-Forwarded-For': '203.0.113.1'})
+        
+        response = client.post('/api/auth/login', json=credentials, headers={'X-Forwarded-For': '203.0.113.2'})
+        assert (response.status_code == 429) is shared
+
+
+# ============= TESTS DE CACHÉ DE USUARIOS =============
+
+class TestUserCache:
+    """Tests para la resolución cacheada del usuario autenticado"""
+    
+    def _me(self, client, token):
+        return client.get('/api/auth/me', headers={'Authorization': f'Bearer {token}'})
+    
+    def test_cache_hit_skips_database(self, app, client, auth_token):
+        """Un segundo request se resuelve desde la caché"""
+        assert self._me(client, auth_token).status_code == 200
+        
+        # Cambio directo en la BD (sin eventos ORM): la caché sigue vigente
+        db.session.execute(db.text("UPDATE users SET username = 'renamed'"))
+        db.session.commit()
+        assert self._me(client, auth_token).get_json()['data']['username'] == 'testuser'
+        assert app.extensions['user_cache'].hits >= 1
+    
+    def test_update_invalidates_cache(self, client, auth_token):
+        """Actualizar el usuario por el ORM invalida su entrada"""
+        self._me(client, auth_token)
+        
+        user = User.query.filter_by(username='testuser').first()
+        user.username = 'renamed'
+        db.session.commit()
+        
+        assert self._me(client, auth_token).get_json()['data']['username'] == 'renamed'
+    
+    def test_delete_invalidates_cache(self, client, auth_token):
+        """Eliminar el usuario invalida su entrada"""
+        self._me(client, auth_token)
+        
+        db.session.delete(User.query.filter_by(username='testuser').first())
+        db.session.commit()
+        
+        assert self._me(client, auth_token).status_code == 404
+    
+    def test_invalidated_after_commit(self, app, client, auth_token):
+        """La entrada se borra al confirmar, no en el flush; un rollback no la toca"""
+        self._me(client, auth_token)
+        cache = app.extensions['user_cache']
+        user = User.query.filter_by(username='testuser').first()
+        key = str(user.id)
+        stale = cache.get(key)
+        
+        user.username = 'discarded'
+        db.session.flush()
+        db.session.rollback()
+        assert cache.get(key) is stale
+        
+        user = User.query.filter_by(username='testuser').first()
+        user.username = 'renamed'
+        db.session.flush()
+        # Un request concurrente vuelve a cachear la fila vieja antes del commit
+        cache.set(key, stale)
+        db.session.commit()
+        
+        assert cache.get(key) is None
+        assert self._me(client, auth_token).get_json()['data']['username'] == 'renamed'
+    
+    def test_trust_jwt_claims(self, app, client, auth_token):
+        """Con claims de confianza no se consulta la base de datos"""
+        app.config['USER_CACHE_TRUST_JWT_CLAIMS'] = True
+        db.session.execute(db.text('DELETE FROM users'))
+        db.session.commit()
+        
+        response = self._me(client, auth_token)
+        assert response.status_code == 200
+        assert response.get_json()['data']['email'] == 'test@example.com'
+
+
+# ============= TESTS DE REVOCACIÓN DE TOKENS =============
+
+class TestTokenRevocation:
+    """Tests para logout y revocación de tokens"""
+    
+    def test_bloom_filter(self):
+        """El filtro no tiene falsos negativos"""
+        from app.utils.bloom import BloomFilter
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        items = [f'jti-{i}' for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        assert all(item in bloom for item in items)
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        assert false_positives < 300
+    
+    def test_logout_revokes_token(self, client, auth_token):
+        """Después del logout el token deja de ser válido"""
+        headers = {'Authorization': f'Bearer {auth_token}'}
+        assert client.post('/api/auth/logout', headers=headers).status_code == 200
+        assert client.get('/api/auth/me', headers=headers).status_code == 401
+    
+    def test_revoke_other_token(self, client, auth_headers):
+        """Un usuario puede revocar otro de sus tokens"""
+        stolen = auth_headers()
+        current = auth_headers()
+        
+        response = client.post(
+            '/api/auth/revoke',
+            json={'token': stolen['Authorization'].removeprefix('Bearer ')},
+            headers=current
+        )
+        assert response.status_code == 200
+        assert client.get('/api/auth/me', headers=stolen).status_code == 401
+        assert client.get('/api/auth/me', headers=current).status_code == 200
+    
+    def test_revoke_foreign_token_forbidden(self, client, auth_headers):
+        """No se pueden revocar tokens de otro usuario"""
+        other = auth_headers('other')
+        
+        response = client.post(
+            '/api/auth/revoke',
+            json={'token': other['Authorization'].removeprefix('Bearer ')},
+            headers=auth_headers()
+        )
+        assert response.status_code == 403
+    
+    def test_filter_miss_skips_database(self, app, client, auth_token):
+        """Un token no revocado se resuelve solo con el filtro"""
+        from app.services import TokenService
+        from app.models import RevokedToken
+        TokenService.rebuild_filter()
+        # Una fila insertada por fuera no es visible hasta reconstruir el filtro
+        db.session.add(RevokedToken(
+            jti=decode_jti(auth_token),
+            expires_at=datetime(2100, 1, 1)
+        ))
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {auth_token}'}
+        assert client.get('/api/auth/me', headers=headers).status_code == 200
+        
+        TokenService.rebuild_filter()
+        assert client.get('/api/auth/me', headers=headers).status_code == 401
+    
+    def test_revoke_during_rebuild_kept(self, app, monkeypatch):
+        """Una revocación entre la lectura y el cambio de filtro no se pierde"""
+        from datetime import timedelta
+        from app.services import TokenService
+        from app.services import token_service
+        
+        TokenService.rebuild_filter()
+        build_bloom = token_service.BloomFilter
+        
+        def revoke_then_build(*args):
+            TokenService.revoke('late-jti', datetime.utcnow() + timedelta(hours=1))
+            return build_bloom(*args)
+        
+        monkeypatch.setattr(token_service, 'BloomFilter', revoke_then_build)
+        TokenService.rebuild_filter()
+        state = app.extensions['token_blocklist']
+        assert 'late-jti' in state.filter
+        assert state.pending is None
+    
+    def test_first_filter_built_once(self, app, monkeypatch):
+        """Los primeros requests simultáneos construyen el filtro una sola vez"""
+        import time
+        from app.services import TokenService
+        from app.utils.bloom import BloomFilter
+        
+        state = app.extensions['token_blocklist']
+        state.filter = None
+        builds = []
+        
+        def slow_build(state):
+            builds.append(1)
+            time.sleep(0.05)
+            state.filter = BloomFilter(100, 0.01)
+        
+        monkeypatch.setattr(TokenService, '_build', staticmethod(slow_build))
+        
+        def check():
+            with app.app_context():
+                assert not TokenService.is_revoked('some-jti')
+        
+        threads = [threading.Thread(target=check) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(builds) == 1
+
+
+# ============= TESTS DE POOL DE CONEXIONES =============
+
+class TestDbPool:
+    """Tests para la instrumentación del pool de conexiones"""
+    
+    @pytest.fixture
+    def app_config(self, tmp_path):
+        return {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "pool.db"}',
+            'SQLALCHEMY_ENGINE_OPTIONS': {'pool_size': 2, 'max_overflow': 1}
+        }
+    
+    def test_pool_endpoint_requires_admin(self, client, auth_token):
+        """Solo los emails de ADMIN_EMAILS acceden a los endpoints internos"""
+        response = client.get(
+            '/api/internal/db/pool',
+            headers={'Authorization': f'Bearer {auth_token}'}
+        )
+        assert response.status_code == 403
+    
+    def test_pool_metrics(self, app, client, auth_headers, user_data):
+        """Se registran checkouts, conexiones y espera del pool"""
+        app.config['ADMIN_EMAILS'] = [user_data['email']]
+        
+        response = client.get('/api/internal/db/pool', headers=auth_headers())
+        assert response.status_code == 200
+        stats = response.get_json()['data']['default']
+        assert stats['pool_class'] == 'InstrumentedQueuePool'
+        assert stats['size'] == 2
+        assert stats['max_overflow'] == 1
+        assert stats['metrics']['checkouts'] >= 3
+        assert stats['metrics']['connects'] >= 1
+        assert stats['metrics']['checkout_wait']['count'] >= 3
+
+
+# ============= TESTS DE MODO SQLITE WAL =============
+
+class TestSqliteWalMode:
+    """Tests para el modo SQLite de alta concurrencia"""
+    
+    @pytest.fixture
+    def app_config(self, tmp_path):
+        return {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "wal.db"}',
+            'SQLITE_WAL_MODE': True,
+            'READ_YOUR_WRITES_WINDOW': 0
+        }
+    
+    def test_pragmas_applied(self, app):
+        """El primario usa WAL y la réplica es de solo lectura"""
+        with db.engines[None].connect() as conn:
+            assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+            assert conn.exec_driver_sql('PRAGMA synchronous').scalar() == 1  # NORMAL
+            assert conn.exec_driver_sql('PRAGMA busy_timeout').scalar() == 5000
+        with db.engines['replica'].connect() as conn:
+            assert conn.exec_driver_sql('PRAGMA query_only').scalar() == 1
+            with pytest.raises(Exception):
+                conn.exec_driver_sql("DELETE FROM users")
+    
+    def test_get_requests_use_read_only_pool(self, client, auth_headers):
+        """Los GET se atienden desde el pool de solo lectura"""
+        headers = auth_headers()
+        replica_metrics = db.engines['replica'].pool.metrics
+        before = replica_metrics.checkouts
+        
+        created = client.post('/api/movies/', json={
+            'title': 'WAL Movie', 'year': 2020, 'director': 'D', 'genre': 'Drama'
+        }, headers=headers)
+        assert created.status_code == 201
+        assert replica_metrics.checkouts == before
+        
+        response = client.get('/api/movies/', headers=headers)
+        assert response.get_json()['data']['total'] == 1
+        assert replica_metrics.checkouts > before
+
+
+# ============= TESTS DE RÉPLICAS DE LECTURA =============
+
+class TestReadReplica:
+    """Tests para el enrutamiento lectura/escritura con dos archivos SQLite"""
+    
+    @pytest.fixture
+    def app_config(self, tmp_path):
+        return {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "primary.db"}',
+            'DATABASE_REPLICA_URL': f'sqlite:///{tmp_path / "replica.db"}',
+            'READ_YOUR_WRITES_WINDOW': 60
+        }
+    
+    @pytest.fixture(autouse=True)
+    def replica_schema(self, app):
+        db.metadata.create_all(db.engines['replica'])
+    
+    def _titles(self, client, headers):
+        response = client.get('/api/movies/', headers=headers)
+        return [movie['title'] for movie in response.get_json()['data']['movies']]
+    
+    def test_reads_go_to_replica(self, client, auth_headers):
+        """Sin escrituras recientes los GET leen de la réplica"""
+        headers = auth_headers()
+        # Registro y login son escrituras de este cliente
+        client.delete_cookie('last_write', path='/api')
+        
+        with db.engines['replica'].begin() as conn:
+            conn.exec_driver_sql(
+                "INSERT INTO movies (title, year, director, genre, user_id, created_at, updated_at) "
+                "VALUES ('Replica Movie', 2000, 'D', 'Drama', 1, '2024-01-01', '2024-01-01')"
+            )
+        
+        assert self._titles(client, headers) == ['Replica Movie']
+    
+    def test_read_your_writes(self, app, client, auth_headers):
+        """Tras escribir, el cliente lee del primario durante la ventana"""
+        import time
+        headers = auth_headers()
+        
+        response = client.post('/api/movies/', json={
+            'title': 'Primary Movie', 'year': 2020, 'director': 'D', 'genre': 'Drama'
+        }, headers=headers)
+        assert response.status_code == 201
+        marker = response.headers['X-Last-Write']
+        assert self._titles(client, headers) == ['Primary Movie']
+        
+        # Sin la cookie vuelve a leer de la réplica (vacía)...
+        client.delete_cookie('last_write', path='/api')
+        assert self._titles(client, headers) == []
+        # ...salvo que el cliente reenvíe el header de la escritura
+        assert self._titles(client, {**headers, 'X-Last-Write': marker}) == ['Primary Movie']
+        
+        # Un marcador fuera de la ventana no cuenta
+        old = str(int((time.time() - 120) * 1000))
+        assert self._titles(client, {**headers, 'X-Last-Write': old}) == []
+
+
+# ============= TESTS DE CLIENTE ASÍNCRONO DE TMDB =============
+
+class TestAsyncTMDb:
+    """Tests para el cliente asíncrono de TMDB contra el servidor stub"""
+    
+    @pytest.fixture
+    def stub(self):
+        from benchmarks.tmdb_stub import TMDbStubServer
+        with TMDbStubServer(latency=0.3, missing_ids=(404,), malformed_ids=(502,)) as server:
+            yield server
+    
+    @pytest.fixture
+    def app_config(self, stub):
+        return {
+            'TMDB_API_KEY': 'test-key',
+            'TMDB_BASE_URL': stub.base_url,
+            'TMDB_TIMEOUT': 2
+        }
+    
+    def _movie_with_tmdb_id(self, client, headers, tmdb_id):
+        movie_id = client.post('/api/movies/', json={
+            'title': 'Matrix', 'year': 1999, 'director': 'Wachowski', 'genre': 'Sci-Fi'
+        }, headers=headers).get_json()['data']['id']
+        db.session.get(Movie, movie_id).imdb_id = str(tmdb_id)
+        db.session.commit()
+        return movie_id
+    
+    def test_search_uses_stub(self, client, stub):
+        """La búsqueda asíncrona devuelve resultados del stub"""
+        response = client.get('/api/movies/search?title=Matrix')
+        results = response.get_json()['results']
+        assert response.status_code == 200
+        assert results[0]['title'] == 'Matrix'
+        assert stub.request_count == 1
+    
+    def test_ssl_context_built_once(self, client, monkeypatch):
+        """El contexto TLS se crea una vez por proceso, no por request"""
+        import httpx
+        from app.services import tmdb_async
+        
+        calls = []
+        create = httpx.create_ssl_context
+        monkeypatch.setattr(httpx, 'create_ssl_context', lambda *a, **kw: calls.append(1) or create(*a, **kw))
+        tmdb_async._ssl_context.cache_clear()
+        
+        for _ in range(2):
+            assert client.get('/api/movies/search?title=Matrix').status_code == 200
+        assert len(calls) == 1
+    
+    def test_search_rate_limit_disabled(self, app, client):
+        """La vista async también funciona cuando rate_limit no limita"""
+        app.config['RATELIMIT_ENABLED'] = False
+        response = client.get('/api/movies/search?title=Matrix')
+        assert response.status_code == 200
+    
+    def test_details_fan_out_concurrently(self, client, auth_headers):
+        """La latencia es la de la llamada más lenta, no la suma"""
+        import time
+        headers = auth_headers()
+        movie_id = self._movie_with_tmdb_id(client, headers, 603)
+        
+        start = time.perf_counter()
+        response = client.get(f'/api/movies/{movie_id}/details', headers=headers)
+        elapsed = time.perf_counter() - start
+        
+        data = response.get_json()['data']
+        assert response.status_code == 200
+        assert data['movie']['title'] == 'Matrix'
+        assert data['tmdb']['details']['id'] == 603
+        assert data['tmdb']['credits']['crew'][0]['job'] == 'Director'
+        assert len(data['tmdb']['images']['posters']) == 3
+        assert data['tmdb_errors'] == {}
+        # Tres llamadas de 0.3s en serie tardarían 0.9s
+        assert elapsed < 0.75
+    
+    def test_details_reports_tmdb_errors(self, client, auth_headers):
+        """Los fallos de TMDB se reportan sin romper la respuesta"""
+        headers = auth_headers()
+        movie_id = self._movie_with_tmdb_id(client, headers, 404)
+        
+        response = client.get(f'/api/movies/{movie_id}/details', headers=headers)
+        data = response.get_json()['data']
+        assert response.status_code == 200
+        assert data['movie']['id'] == movie_id
+        assert set(data['tmdb_errors']) == {'details', 'credits', 'images'}
+    
+    def test_per_call_timeout(self, app, client, auth_headers):
+        """Cada llamada respeta TMDB_TIMEOUT"""
+        app.config['TMDB_TIMEOUT'] = 0.05
+        headers = auth_headers()
+        movie_id = self._movie_with_tmdb_id(client, headers, 603)
+        
+        response = client.get(f'/api/movies/{movie_id}/details', headers=headers)
+        errors = response.get_json()['data']['tmdb_errors']
+        assert 'Timeout' in errors['details']
+    
+    def test_malformed_response_reported(self, client, auth_headers):
+        """Un 200 que no es JSON (proxy, CDN) es un error de TMDB, no un 500"""
+        headers = auth_headers()
+        movie_id = self._movie_with_tmdb_id(client, headers, 502)
+        
+        response = client.get(f'/api/movies/{movie_id}/details', headers=headers)
+        errors = response.get_json()['data']['tmdb_errors']
+        assert response.status_code == 200
+        assert 'Respuesta inválida' in errors['details']
+    
+    def test_gather_isolates_unexpected_errors(self, app):
+        """Un error inesperado se reporta solo para su llamada"""
+        import asyncio
+        from app.services import AsyncTMDbClient
+        
+        async def works():
+            return 'ok'
+        
+        async def breaks():
+            raise RuntimeError('boom')
+        
+        results, errors = asyncio.run(AsyncTMDbClient.gather(works=works(), breaks=breaks()))
+        assert results == {'works': 'ok'}
+        assert set(errors) == {'breaks'}
+    
+    def test_shared_rate_limit_store_off_event_loop(self, app, tmp_path):
+        """El limitador en SQLite se consulta en un hilo; el de memoria, en el loop"""
+        import asyncio
+        from app.services import AsyncTMDbClient
+        from app.utils.rate_limit import MemoryStore, SQLiteStore
+        
+        def hit_thread(store):
+            threads = []
+            hit = store.hit
+            store.hit = lambda *args: threads.append(threading.get_ident()) or hit(*args)
+            
+            async def throttle():
+                client = AsyncTMDbClient('http://tmdb', 'key', rate_limit=10, rate_limit_store=store)
+                await client._throttle()
+                return threading.get_ident()
+            
+            loop_thread = asyncio.run(throttle())
+            return threads[0] != loop_thread
+        
+        assert hit_thread(SQLiteStore(str(tmp_path / 'ratelimit.db')))
+        assert not hit_thread(MemoryStore())
+    
+    def test_details_not_found(self, client, auth_token):
+        """Película inexistente"""
+        response = client.get('/api/movies/999/details', headers={'Authorization': f'Bearer {auth_token}'})
+        assert response.status_code == 404
+
+
+# ============= TESTS DE COMPRESIÓN =============
+
+class TestCompression:
+    """Tests para la compresión de respuestas"""
+    
+    def _library(self, app, client, auth_token, count=60):
+        user_id = client.get('/api/auth/me', headers={'Authorization': f'Bearer {auth_token}'}).get_json()['data']['id']
+        db.session.add_all([
+            Movie(title=f'Movie {i}', year=2000, director='Director', genre='Drama', user_id=user_id)
+            for i in range(count)
+        ])
+        db.session.commit()
+    
+    def test_gzip_large_payload(self, app, client, auth_token):
+        """Payloads grandes se comprimen con gzip"""
+        import gzip
+        import json
+        self._library(app, client, auth_token)
+        
+        response = client.get('/api/movies/', headers={
+            'Authorization': f'Bearer {auth_token}',
+            'Accept-Encoding': 'gzip'
+        })
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        body = gzip.decompress(response.get_data())
+        assert len(json.loads(body)['data']['movies']) == 60
+        assert int(response.headers['Content-Length']) < len(body)
+    
+    def test_small_payload_not_compressed(self, client, auth_token):
+        """Cuerpos bajo COMPRESS_MIN_SIZE se envían sin comprimir"""
+        response = client.get('/api/auth/me', headers={
+            'Authorization': f'Bearer {auth_token}',
+            'Accept-Encoding': 'gzip'
+        })
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_json()['success'] is True
+    
+    def test_identity_without_accept_encoding(self, app, client, auth_token):
+        """Sin Accept-Encoding la respuesta no se comprime"""
+        self._library(app, client, auth_token)
+        response = client.get('/api/movies/', headers={'Authorization': f'Bearer {auth_token}'})
+        assert 'Content-Encoding' not in response.headers
+        assert len(response.get_json()['data']['movies']) == 60
+    
+    def test_brotli_preferred(self, app, client, auth_token):
+        """Con brotli instalado se prefiere br"""
+        brotli = pytest.importorskip('brotli')
+        self._library(app, client, auth_token)
+        response = client.get('/api/movies/', headers={
+            'Authorization': f'Bearer {auth_token}',
+            'Accept-Encoding': 'gzip, br'
+        })
+        assert response.headers['Content-Encoding'] == 'br'
+        assert b'Movie 59' in brotli.decompress(response.get_data())
+    
+    def test_compressed_bytes_reused(self, app, client, auth_token):
+        """El mismo cuerpo no se vuelve a comprimir"""
+        self._library(app, client, auth_token)
+        headers = {'Authorization': f'Bearer {auth_token}', 'Accept-Encoding': 'gzip'}
+        cache = app.extensions['compression_cache']
+        
+        first = client.get('/api/movies/', headers=headers)
+        second = client.get('/api/movies/', headers=headers)
+        assert first.get_data() == second.get_data()
+        assert cache.hits == 1
+    
+    def test_streamed_response(self, app):
+        """Las respuestas en streaming se comprimen por chunks"""
+        import gzip
+        from flask import Response
+        from app.middleware import CompressionHandler
+        
+        def generate():
+            for i in range(100):
+                yield f'line {i}\n'
+        
+        with app.test_request_context('/', headers={'Accept-Encoding': 'gzip'}):
+            response = CompressionHandler.compress(Response(generate(), mimetype='text/plain'))
+            assert response.headers['Content-Encoding'] == 'gzip'
+            assert 'Content-Length' not in response.headers
+            body = gzip.decompress(b''.join(response.response))
+        assert body.decode().splitlines()[-1] == 'line 99'
+
+
+# ============= TESTS DE MÉTRICAS =============
+
+class TestMetrics:
+    """Tests para el endpoint /metrics"""
+    
+    def test_request_metrics(self, client, auth_token):
+        """Latencia, status y SQL por ruta en formato Prometheus"""
+        client.get('/api/movies/', headers={'Authorization': f'Bearer {auth_token}'})
+        client.get('/api/movies/999', headers={'Authorization': f'Bearer {auth_token}'})
+        
+        response = client.get('/metrics')
+        text = response.get_data(as_text=True)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        assert '# TYPE http_request_duration_seconds histogram' in text
+        assert ('http_requests_total{blueprint="movies",route="/api/movies/",'
+                'method="GET",status="200"} 1') in text
+        assert 'status="404"} 1' in text
+        assert 'http_request_duration_seconds_count{blueprint="movies",route="/api/movies/",method="GET"} 1' in text
+        assert 'http_request_db_queries_count{route="/api/movies/"} 1' in text
+        assert 'db_queries_total ' in text
+    
+    def test_thread_shards_aggregated(self, app):
+        """Los contadores de cada hilo se suman en el scrape"""
+        registry = app.extensions['metrics']
+        
+        def work():
+            for _ in range(100):
+                registry.inc('db_queries_total')
+        
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        counters, _ = registry.collect()
+        assert counters[('db_queries_total', ())] >= 400
+    
+    def test_multiprocess_aggregation(self, tmp_path):
+        """Con METRICS_MULTIPROC_DIR se suman los snapshots de todos los procesos"""
+        from app.utils.metrics import MetricsRegistry
+        
+        workers = []
+        for _ in range(2):
+            registry = MetricsRegistry(multiproc_dir=str(tmp_path))
+            registry.counter('jobs_total', 'Jobs')
+            registry.histogram('job_seconds', 'Duración', buckets=(0.1, 1))
+            workers.append(registry)
+        
+        # Simular dos procesos: cada registro escribe su archivo
+        workers[0].inc('jobs_total', amount=3)
+        workers[0].observe('job_seconds', 0.05)
+        workers[0].flush(force=True)
+        workers[1].pid = -1
+        workers[1].inc('jobs_total', amount=4)
+        workers[1].observe('job_seconds', 0.5)
+        
+        text = workers[1].render()
+        assert 'jobs_total 7' in text
+        assert 'job_seconds_bucket{le="0.1"} 1' in text
+        assert 'job_seconds_bucket{le="+Inf"} 2' in text
+        assert 'job_seconds_count 2' in text
+    
+    def test_tmdb_metrics(self, app):
+        """Latencia y errores de llamadas a TMDB"""
+        from benchmarks.tmdb_stub import TMDbStubServer
+        from app.services import TMDbService
+        
+        with TMDbStubServer(missing_ids=(404,)) as stub:
+            app.config.update(TMDB_API_KEY='test-key', TMDB_BASE_URL=stub.base_url)
+            assert TMDbService.get_movie_details(603)['id'] == 603
+            assert TMDbService.get_movie_details(404) is None
+        
+        text = app.extensions['metrics'].render()
+        assert 'tmdb_request_duration_seconds_count{endpoint="/movie/{id}"} 2' in text
+        assert 'tmdb_errors_total{endpoint="/movie/{id}"} 1' in text
+
+
+# ============= TESTS DE PROFILING =============
+
+class TestProfiling:
+    """Tests para el profiling bajo demanda"""
+    
+    @pytest.fixture
+    def app_config(self, tmp_path, user_data):
+        return {
+            'PROFILING_ENABLED': True,
+            'PROFILING_DIR': str(tmp_path / 'profiles'),
+            'PROFILING_MAX_FILES': 3,
+            'ADMIN_EMAILS': [user_data['email']]
+        }
+    
+    def test_admin_marked_request_profiled(self, client, auth_headers):
+        """X-Profile de un admin genera un perfil descargable"""
+        headers = auth_headers()
+        
+        response = client.get('/api/movies/', headers={**headers, 'X-Profile': '1'})
+        profile_id = response.headers['X-Profile-Id']
+        
+        listing = client.get('/api/internal/profiles', headers=headers).get_json()['data']
+        assert listing[0]['id'] == profile_id
+        assert listing[0]['endpoint'] == 'movies.get_movies'
+        
+        download = client.get(f'/api/internal/profiles/{profile_id}', headers=headers)
+        assert download.status_code == 200
+        assert download.mimetype == 'application/octet-stream'
+        
+        text = client.get(f'/api/internal/profiles/{profile_id}?format=text', headers=headers)
+        assert 'function calls' in text.get_data(as_text=True)
+    
+    def test_non_admin_header_ignored(self, app, client, auth_headers):
+        """X-Profile de un usuario normal no perfila"""
+        app.config['ADMIN_EMAILS'] = []
+        headers = auth_headers()
+        
+        response = client.get('/api/movies/', headers={**headers, 'X-Profile': '1'})
+        assert 'X-Profile-Id' not in response.headers
+    
+    def test_ring_is_bounded(self, app, client, auth_headers):
+        """Se conservan solo los PROFILING_MAX_FILES más recientes"""
+        headers = auth_headers()
+        
+        for _ in range(5):
+            client.get('/api/movies/', headers={**headers, 'X-Profile': '1'})
+        
+        assert len(app.extensions['profile_store'].list()) == 3
+    
+    def test_invalid_profile_id(self, client, auth_headers):
+        """Ids que no siguen el formato no llegan al disco"""
+        headers = auth_headers()
+        response = client.get('/api/internal/profiles/..%2Fsecret', headers=headers)
+        assert response.status_code == 404
+
+
+
+# ============= TESTS DE LOGGING ESTRUCTURADO =============
+
+class TestRequestLogging:
+    """Tests para los logs JSON de requests"""
+    
+    @pytest.fixture
+    def app_config(self, tmp_path):
+        return {'LOG_FILE': str(tmp_path / 'app.log'), 'LOG_SAMPLE_RATE': 1.0}
+    
+    def _records(self, app, tmp_path):
+        """Detener el listener (vacía la cola) y leer las líneas JSON"""
+        import json
+        from app.utils.structured_logging import _stop_listener
+        _stop_listener(app.extensions['log_handler'].listener)
+        with open(tmp_path / 'app.log') as f:
+            return [json.loads(line) for line in f]
+    
+    def test_request_id_header(self, client):
+        """Se devuelve el X-Request-ID recibido o uno nuevo"""
+        response = client.get('/api/movies/search?title=', headers={'X-Request-ID': 'abc-123'})
+        assert response.headers['X-Request-ID'] == 'abc-123'
+        assert len(client.get('/api/movies/search?title=').headers['X-Request-ID']) == 32
+    
+    def test_request_logged_as_json(self, app, client, tmp_path, user_data):
+        """Cada request muestreado produce una línea JSON de auditoría"""
+        client.post('/api/auth/register', json=user_data)
+        response = client.get('/api/movies/search?title=', headers={'X-Request-ID': 'req-1'})
+        
+        records = [r for r in self._records(app, tmp_path) if r['logger'] == 'app.requests']
+        assert [r['status'] for r in records] == [201, 400]
+        assert records[1]['request_id'] == 'req-1'
+        assert records[1]['path'] == '/api/movies/search'
+        assert 'request_body' not in records[1]
+        assert response.headers['X-Request-ID'] == 'req-1'
+    
+    @pytest.mark.parametrize('app', [{'LOG_SAMPLE_RATE': 0.0}], indirect=True)
+    def test_sampling(self, app, client, tmp_path):
+        """Con LOG_SAMPLE_RATE 0 no se registran requests exitosos"""
+        for _ in range(5):
+            client.get('/api/movies/search?title=')
+        assert self._records(app, tmp_path) == []
+    
+    @pytest.mark.parametrize('app', [{'LOG_BODIES': True, 'LOG_BODY_MAX_BYTES': 10}], indirect=True)
+    def test_bodies_truncated(self, app, client, tmp_path, user_data):
+        """Con LOG_BODIES los cuerpos se truncan"""
+        client.post('/api/auth/register', json=user_data)
+        
+        record = self._records(app, tmp_path)[0]
+        assert record['request_body'].startswith('{"')
+        assert record['request_body'].endswith('bytes)')
+        assert len(record['response_body'].split('...')[0]) == 10
+    
+    def test_service_logs_carry_request_id(self, app, client, tmp_path):
+        """Los logs de los servicios llevan el id del request"""
+        from benchmarks.tmdb_stub import TMDbStubServer
+        
+        with TMDbStubServer(failure_rate=1.0) as stub:
+            app.config.update(TMDB_API_KEY='test-key', TMDB_BASE_URL=stub.base_url)
+            response = client.get('/api/movies/search?title=Matrix')
+        
+        errors = [r for r in self._records(app, tmp_path) if r['level'] == 'ERROR']
+        assert errors[0]['request_id'] == response.headers['X-Request-ID']
+        assert 'Error searching TMDB' in errors[0]['message']
+
+
+# ============= TESTS DE INSPECTOR DE CONSULTAS =============
+
+class TestQueryInspector:
+    """Tests para el log de consultas lentas y la detección de N+1"""
+    
+    def _run_in_request(self, app, queries):
+        """Ejecutar consultas dentro de un request con sus hooks"""
+        from flask import Response
+        with app.test_request_context('/api/movies/'):
+            app.preprocess_request()
+            for movie_id in range(queries):
+                Movie.query.filter_by(id=movie_id).first()
+            return app.process_response(Response())
+    
+    def test_fingerprint_ignores_literals(self):
+        """Consultas que solo difieren en literales comparten huella"""
+        from app.utils.query_inspector import fingerprint, normalize_statement
+        assert fingerprint("SELECT * FROM movies WHERE id = 1") == fingerprint("SELECT *  FROM movies WHERE id = 42")
+        assert fingerprint("SELECT 1 WHERE t = 'a'") == fingerprint("SELECT 2 WHERE t = 'b'")
+        assert normalize_statement('SELECT * FROM movies WHERE id IN (?, ?, ?)') == 'SELECT * FROM movies WHERE id IN (?)'
+    
+    def test_n_plus_one_raises_in_testing(self, app):
+        """En tests un N+1 hace fallar el request"""
+        from app.utils.query_inspector import NPlusOneError
+        with pytest.raises(NPlusOneError):
+            self._run_in_request(app, app.config['N_PLUS_ONE_THRESHOLD'] + 1)
+    
+    def test_under_threshold_ok(self, app):
+        """Repetir una consulta hasta el umbral no es un N+1"""
+        response = self._run_in_request(app, app.config['N_PLUS_ONE_THRESHOLD'])
+        assert response.status_code == 200
+    
+    def test_n_plus_one_logged_and_counted(self, app, caplog):
+        """Sin QUERY_INSPECTOR_RAISE se registra un warning y una métrica"""
+        app.config['QUERY_INSPECTOR_RAISE'] = False
+        self._run_in_request(app, 15)
+        
+        warnings = [r for r in caplog.records if r.getMessage() == 'Probable N+1 query']
+        assert len(warnings) == 1
+        assert 'FROM movies' in warnings[0].statement
+        counters, _ = app.extensions['metrics'].collect()
+        assert counters[('db_n_plus_one_total', (('route', '/api/movies/'),))] == 1
+    
+    def test_slow_query_explained(self, app, caplog):
+        """Las consultas lentas se registran con su EXPLAIN QUERY PLAN"""
+        app.config['SLOW_QUERY_THRESHOLD_MS'] = 0
+        Movie.query.filter_by(title='Matrix').all()
+        
+        slow = [r for r in caplog.records if r.getMessage() == 'Slow query' and 'FROM movies' in r.statement]
+        assert 'ix_movies_title' in slow[-1].plan
+
+
+# ============= TESTS DE PROXY DE POSTERS =============
+
+class TestPosterProxy:
+    """Tests para /api/posters con caché en disco"""
+    
+    @pytest.fixture
+    def stub(self):
+        from benchmarks.tmdb_stub import TMDbStubServer
+        with TMDbStubServer() as server:
+            yield server
+    
+    @pytest.fixture
+    def app_config(self, stub, tmp_path):
+        return {
+            'TMDB_IMAGE_URL': f'{stub.base_url}/t/p',
+            'POSTER_CACHE_DIR': str(tmp_path / 'posters'),
+            'POSTER_CACHE_MAX_BYTES': 5000
+        }
+    
+    def test_fetched_once_and_cached(self, client, stub):
+        """La imagen se descarga una vez y luego se sirve del disco"""
+        from benchmarks.tmdb_stub import fake_image
+        
+        first = client.get('/api/posters/w92/abc.jpg')
+        second = client.get('/api/posters/w92/abc.jpg')
+        assert first.status_code == second.status_code == 200
+        assert first.get_data() == second.get_data() == fake_image('w92', 'abc.jpg')
+        assert first.mimetype == 'image/jpeg'
+        assert 'immutable' in first.headers['Cache-Control']
+        assert first.headers['ETag']
+        assert stub.request_count == 1
+    
+    def test_conditional_and_range(self, client):
+        """ETag (304) y Range (206)"""
+        etag = client.get('/api/posters/w92/abc.jpg').headers['ETag']
+        
+        assert client.get('/api/posters/w92/abc.jpg', headers={'If-None-Match': etag}).status_code == 304
+        partial = client.get('/api/posters/w92/abc.jpg', headers={'Range': 'bytes=0-9'})
+        assert partial.status_code == 206
+        assert len(partial.get_data()) == 10
+    
+    def test_invalid_requests(self, client, stub):
+        """Tamaño o archivo inválidos no llegan a TMDB"""
+        assert client.get('/api/posters/w9999/abc.jpg').status_code == 400
+        assert client.get('/api/posters/w92/abc.exe').status_code == 400
+        assert stub.request_count == 0
+        assert client.get('/api/posters/w92/missing.jpg').status_code == 404
+    
+    def test_lru_eviction(self, app, client, stub):
+        """Al superar POSTER_CACHE_MAX_BYTES se evictan los menos usados"""
+        import time
+        
+        # Cada imagen w92 ocupa ~1.5 KB; caben tres en 5000 bytes
+        for name in ('a', 'b', 'c', 'd'):
+            client.get(f'/api/posters/w92/{name}.jpg')
+            time.sleep(0.01)
+        
+        cache = app.extensions['poster_cache']
+        assert cache.total_bytes <= 5000
+        assert cache.get('w92/a.jpg') is None
+        assert cache.get('w92/d.jpg') is not None
+        
+        client.get('/api/posters/w92/a.jpg')
+        assert stub.request_count == 5
+    
+    def test_workers_share_directory_budget(self, tmp_path, monkeypatch):
+        """Dos workers sobre el mismo directorio comparten un solo presupuesto"""
+        import os
+        import time
+        from app.utils.poster_cache import PosterCache
+        
+        first = PosterCache(str(tmp_path), max_bytes=250)
+        second = PosterCache(str(tmp_path), max_bytes=250)
+        for cache, key in ((first, 'a'), (second, 'b'), (first, 'c')):
+            cache.put(key, key.encode() * 100)
+            time.sleep(0.01)
+        
+        # 'a' era el menos usado del directorio, aunque 'b' lo escribió el otro worker
+        assert first.total_bytes == second.total_bytes == 200
+        assert second.get('a') is None
+        assert second.get('b') is not None and first.get('c') is not None
+        assert len(os.listdir(tmp_path / 'refs')) == 2
+        
+        # Bajo el presupuesto un put no recorre el directorio
+        def no_listing(path):
+            raise AssertionError(f'listdir({path})')
+        
+        monkeypatch.setattr(os, 'listdir', no_listing)
+        second.put('d', b'd' * 10)
+        monkeypatch.undo()
+        assert first.total_bytes == 210
+        
+        # Un worker nuevo toma el total compartido sin recontar
+        assert PosterCache(str(tmp_path), max_bytes=250).total_bytes == 210
+    
+    def test_schema_emits_proxy_urls(self, client, auth_headers):
+        """?poster_size hace que poster_url apunte al proxy"""
+        headers = auth_headers()
+        
+        movie_id = client.post('/api/movies/', json={
+            'title': 'Matrix', 'year': 1999, 'director': 'Wachowski', 'genre': 'Sci-Fi'
+        }, headers=headers).get_json()['data']['id']
+        movie = db.session.get(Movie, movie_id)
+        movie.poster_url = 'https://image.tmdb.org/t/p/w500/abc.jpg'
+        db.session.commit()
+        
+        listing = client.get('/api/movies/?poster_size=w185', headers=headers).get_json()
+        assert listing['data']['movies'][0]['poster_url'] == '/api/posters/w185/abc.jpg'
+        detail = client.get(f'/api/movies/{movie_id}', headers=headers).get_json()
+        assert detail['data']['poster_url'] == 'https://image.tmdb.org/t/p/w500/abc.jpg'
+        assert client.get('/api/movies/?poster_size=huge', headers=headers).status_code == 400
+
+
+# ============= TESTS DE BÚSQUEDA UNIFICADA =============
+
+class TestMergedSearch:
+    """Tests para /api/movies/search?mode=merged"""
+    
+    @pytest.fixture
+    def stub(self):
+        from benchmarks.tmdb_stub import TMDbStubServer
+        with TMDbStubServer() as server:
+            yield server
+    
+    @pytest.fixture
+    def app_config(self, stub):
+        return {'TMDB_API_KEY': 'test-key', 'TMDB_BASE_URL': stub.base_url}
+    
+    def _setup_library(self, client, headers):
+        import zlib
+        
+        # Ids que el stub devuelve para "Matrix"
+        tmdb_ids = [zlib.crc32(b'Matrix') % 10000 * 10 + i for i in range(1, 6)]
+        for title, tmdb_id in (('Matrix 2', tmdb_ids[1]), ('The Matrix Reloaded', None), ('Alien', None)):
+            client.post('/api/movies/', json={
+                'title': title, 'year': 2000, 'director': 'D', 'genre': 'Sci-Fi',
+                'tmdb_id': str(tmdb_id) if tmdb_id else None
+            }, headers=headers)
+        return tmdb_ids
+    
+    def test_merged_ranked_with_in_library(self, client, auth_headers):
+        """Un solo listado ordenado con in_library"""
+        headers = auth_headers()
+        tmdb_ids = self._setup_library(client, headers)
+        
+        response = client.get('/api/movies/search?title=Matrix&mode=merged', headers=headers)
+        results = response.get_json()['results']
+        assert response.status_code == 200
+        
+        titles = [r.get('title') or r['library_movie']['title'] for r in results]
+        assert titles == ['Matrix', 'Matrix 2', 'Matrix 3', 'Matrix 4', 'Matrix 5', 'The Matrix Reloaded']
+        assert [r['in_library'] for r in results] == [False, True, False, False, False, True]
+        assert results[1]['library_movie']['imdb_id'] == str(tmdb_ids[1])
+        assert results[-1]['source'] == 'library'
+    
+    def test_merged_requires_token(self, client):
+        """mode=merged requiere JWT; el modo TMDB sigue siendo público"""
+        assert client.get('/api/movies/search?title=Matrix&mode=merged').status_code == 401
+        assert client.get('/api/movies/search?title=Matrix').status_code == 200
+        assert client.get('/api/movies/search?title=Matrix&mode=other').status_code == 400
+    
+    def test_merged_tmdb_failure(self, client, stub, auth_headers):
+        """Si TMDB falla se devuelven los resultados de la biblioteca"""
+        headers = auth_headers()
+        self._setup_library(client, headers)
+        stub.failure_rate = 1.0
+        
+        data = client.get('/api/movies/search?title=Matrix&mode=merged', headers=headers).get_json()
+        assert data['tmdb_error']
+        assert [r['library_movie']['title'] for r in data['results']] == ['Matrix 2', 'The Matrix Reloaded']
+
+
+# ============= TESTS DE ALTA DESDE TMDB =============
+
+class TestCreateFromTMDb:
+    """Tests para crear películas solo con tmdb_id"""
+    
+    @pytest.fixture
+    def stub(self):
+        from benchmarks.tmdb_stub import TMDbStubServer
+        with TMDbStubServer(missing_ids=(404,)) as server:
+            yield server
+    
+    @pytest.fixture
+    def app_config(self, stub):
+        return {'TMDB_API_KEY': 'test-key', 'TMDB_BASE_URL': stub.base_url}
+    
+    def test_create_from_tmdb_id(self, client, stub, auth_headers):
+        """Todos los campos se completan con una sola llamada a TMDB"""
+        from benchmarks.tmdb_stub import fake_details
+        headers = auth_headers()
+        stub.paths.clear()
+        
+        response = client.post('/api/movies/', json={'tmdb_id': '603'}, headers=headers)
+        data = response.get_json()['data']
+        details = fake_details(603)
+        assert response.status_code == 201
+        assert data['title'] == 'Movie 603'
+        assert data['year'] == int(details['release_date'][:4])
+        assert data['director'] == 'Director 603'
+        assert data['genre'] == details['genres'][0]['name']
+        assert data['poster_url'].endswith('/poster603.jpg')
+        assert data['imdb_id'] == '603'
+        assert len(stub.paths) == 1
+        assert 'append_to_response=credits' in stub.paths[0]
+        
+        # Tras borrarla, volver a agregarla sale de la caché de detalles
+        client.delete(f"/api/movies/{data['id']}", headers=headers)
+        response = client.post('/api/movies/', json={'tmdb_id': '603', 'title': 'Mi copia'}, headers=headers)
+        assert response.status_code == 201
+        assert response.get_json()['data']['title'] == 'Mi copia'
+        assert len(stub.paths) == 1
+    
+    def test_explicit_fields_win(self, client, auth_headers):
+        """Los campos enviados no se sobrescriben"""
+        headers = auth_headers()
+        
+        response = client.post('/api/movies/', json={
+            'tmdb_id': '603', 'title': 'The Matrix', 'director': 'Wachowski'
+        }, headers=headers)
+        data = response.get_json()['data']
+        assert data['title'] == 'The Matrix'
+        assert data['director'] == 'Wachowski'
+        assert data['genre']
+    
+    def test_duplicate_tmdb_id_conflict(self, client, auth_headers):
+        """El mismo tmdb_id dos veces en la biblioteca responde 409"""
+        headers = auth_headers()
+        
+        assert client.post('/api/movies/', json={'tmdb_id': '603'}, headers=headers).status_code == 201
+        response = client.post('/api/movies/', json={'tmdb_id': '603'}, headers=headers)
+        assert response.status_code == 409
+        assert response.get_json()['success'] is False
+        assert client.get('/api/movies/', headers=headers).get_json()['data']['total'] == 1
+        # Otro usuario sí puede agregarla
+        assert client.post('/api/movies/', json={'tmdb_id': '603'}, headers=auth_headers('otro')).status_code == 201
+    
+    def test_other_integrity_errors_not_reported_as_duplicate(self, client, auth_headers):
+        """Otra restricción violada no se presenta como película repetida (409)"""
+        # Base sin migrar: UNIQUE (imdb_id) global del esquema original
+        db.session.execute(db.text('CREATE UNIQUE INDEX legacy_movies_imdb_id ON movies (imdb_id)'))
+        db.session.commit()
+        
+        assert client.post('/api/movies/', json={'tmdb_id': '603'}, headers=auth_headers()).status_code == 201
+        response = client.post('/api/movies/', json={'tmdb_id': '603'}, headers=auth_headers('otro'))
+        assert response.status_code == 500
+        assert 'Ya tienes' not in response.get_json()['error']
+    
+    def test_unknown_tmdb_id(self, client, auth_headers):
+        """Sin datos de TMDB y sin campos, la película no se crea"""
+        headers = auth_headers()
+        
+        response = client.post('/api/movies/', json={'tmdb_id': '404'}, headers=headers)
+        assert response.status_code == 422
+        assert 'title' in response.get_json()['error']
+        assert client.get('/api/movies/', headers=headers).get_json()['data']['total'] == 0
+    
+    def test_fields_required_without_tmdb_id(self, client, auth_headers):
+        """Sin tmdb_id se siguen exigiendo todos los campos"""
+        headers = auth_headers()
+        
+        response = client.post('/api/movies/', json={'title': 'Solo título'}, headers=headers)
+        details = response.get_json()['details']
+        assert response.status_code == 400
+        assert details['year'] == ['El año es requerido']
+        assert set(details) == {'year', 'director', 'genre'}
+
+
+# ============= TESTS DE RESOLUCIÓN DE TMDB IDS =============
+
+class TestTMDbResolve:
+    """Tests para POST /api/movies/tmdb/resolve"""
+    
+    @pytest.fixture
+    def stub(self):
+        from benchmarks.tmdb_stub import TMDbStubServer
+        with TMDbStubServer(latency=0.2, missing_ids=(404,), malformed_ids=(502,)) as server:
+            yield server
+    
+    @pytest.fixture
+    def app_config(self, stub):
+        return {
+            'TMDB_API_KEY': 'test-key',
+            'TMDB_BASE_URL': stub.base_url,
+            'TMDB_MAX_CONCURRENCY': 64,
+            'TMDB_RATE_LIMIT': 0
+        }
+    
+    def test_resolve_parallel_dedup_and_cache(self, app, client, stub, auth_headers):
+        """Ids deduplicados, en paralelo y con la caché de detalles"""
+        import time
+        headers = auth_headers()
+        app.extensions['tmdb_details_cache'].set('1', {'id': 1, 'title': 'Cached', 'release_date': '1999-03-31'})
+        stub.paths.clear()
+        
+        ids = list(range(1, 51)) + [7, 7, 404]
+        start = time.perf_counter()
+        response = client.post('/api/movies/tmdb/resolve', json={'ids': ids}, headers=headers)
+        elapsed = time.perf_counter() - start
+        data = response.get_json()
+        
+        assert response.status_code == 200
+        assert len(stub.paths) == 50  # 49 sin caché + el 404
+        assert elapsed < 0.2 * 5  # bastante menos que 50 llamadas en serie
+        assert len(data['results']) == 50
+        assert data['cached'] == 1
+        assert data['results']['1']['title'] == 'Cached'
+        assert data['results']['7']['director'] == 'Director 7'
+        assert list(data['errors']) == ['404']
+        
+        # La segunda vez todo sale de caché salvo el id que falló
+        stub.paths.clear()
+        data = client.post('/api/movies/tmdb/resolve', json={'ids': ids}, headers=headers).get_json()
+        assert data['cached'] == 50
+        assert len(stub.paths) == 1
+    
+    def test_malformed_response_fails_only_its_id(self, app, client, auth_headers):
+        """Un id con respuesta que no es JSON no tira el lote"""
+        headers = auth_headers()
+        app.extensions['tmdb_details_cache'].set('1', {'id': 1, 'title': 'Cached', 'release_date': '1999-03-31'})
+        
+        response = client.post('/api/movies/tmdb/resolve', json={'ids': [1, 7, 502]}, headers=headers)
+        data = response.get_json()
+        assert response.status_code == 200
+        assert set(data['results']) == {'1', '7'}
+        assert data['results']['1']['title'] == 'Cached'
+        assert data['cached'] == 1
+        assert 'Respuesta inválida' in data['errors']['502']
+    
+    def test_resolve_respects_tmdb_rate_limit(self, app, client, stub, auth_headers):
+        """Las llamadas salientes respetan TMDB_RATE_LIMIT"""
+        import time
+        app.config.update(TMDB_RATE_LIMIT=5, TMDB_RATE_WINDOW=1)
+        stub.latency = 0
+        headers = auth_headers()
+        
+        start = time.perf_counter()
+        data = client.post('/api/movies/tmdb/resolve', json={'ids': list(range(100, 110))}, headers=headers).get_json()
+        assert len(data['results']) == 10
+        # Ráfaga de 5 y luego una cada 0.2s
+        assert time.perf_counter() - start >= 0.8
+    
+    def test_resolve_validation(self, app, client, auth_headers):
+        """Lista de enteros requerida, con tope de ids"""
+        app.config['TMDB_RESOLVE_MAX_IDS'] = 3
+        headers = auth_headers()
+        
+        for body in ({}, {'ids': []}, {'ids': ['abc']}, {'ids': [1, 2, 3, 4]}):
+            response = client.post('/api/movies/tmdb/resolve', json=body, headers=headers)
+            assert response.status_code == 400
+        assert client.post('/api/movies/tmdb/resolve', json={'ids': [1]}).status_code == 401
+
+
+# ============= TESTS DE CONCURRENCIA OPTIMISTA =============
+
+class TestOptimisticConcurrency:
+    """Tests para If-Match / ETag en PUT /api/movies/<id>"""
+    
+    def _create(self, client, auth_token):
+        headers = {'Authorization': f'Bearer {auth_token}'}
+        response = client.post('/api/movies/', json={
+            'title': 'Original', 'year': 2020, 'director': 'D', 'genre': 'Drama'
+        }, headers=headers)
+        return response, headers
+    
+    def test_etag_and_version(self, client, auth_token):
+        """Cada actualización incrementa la versión y el ETag"""
+        response, headers = self._create(client, auth_token)
+        movie_id = response.get_json()['data']['id']
+        assert response.get_json()['data']['version'] == 1
+        assert response.headers['ETag'] == '"1"'
+        
+        response = client.put(f'/api/movies/{movie_id}', json={'title': 'Nuevo'}, headers=headers)
+        assert response.get_json()['data']['version'] == 2
+        assert client.get(f'/api/movies/{movie_id}', headers=headers).headers['ETag'] == '"2"'
+    
+    def test_if_match_conflict(self, client, auth_token):
+        """Dos dispositivos con la misma versión: el segundo recibe 412"""
+        response, headers = self._create(client, auth_token)
+        movie_id = response.get_json()['data']['id']
+        etag = response.headers['ETag']
+        
+        first = client.put(f'/api/movies/{movie_id}', json={'title': 'Móvil'},
+                           headers={**headers, 'If-Match': etag})
+        assert first.status_code == 200
+        assert first.headers['ETag'] == '"2"'
+        
+        second = client.put(f'/api/movies/{movie_id}', json={'title': 'Tablet'},
+                            headers={**headers, 'If-Match': etag})
+        assert second.status_code == 412
+        assert second.get_json()['current_version'] == 2
+        assert second.headers['ETag'] == '"2"'
+        
+        movie = client.get(f'/api/movies/{movie_id}', headers=headers).get_json()['data']
+        assert movie['title'] == 'Móvil'
+        
+        # Reintento con el ETag actual
+        retry = client.put(f'/api/movies/{movie_id}', json={'title': 'Tablet'},
+                           headers={**headers, 'If-Match': second.headers['ETag']})
+        assert retry.status_code == 200
+        assert retry.get_json()['data']['version'] == 3
+    
+    def test_if_match_variants(self, client, auth_token):
+        """*, versión sin comillas, ETag débil y película inexistente"""
+        response, headers = self._create(client, auth_token)
+        movie_id = response.get_json()['data']['id']
+        
+        assert client.put(f'/api/movies/{movie_id}', json={'year': 2021},
+                          headers={**headers, 'If-Match': '*'}).status_code == 200
+        assert client.put(f'/api/movies/{movie_id}', json={'year': 2022},
+                          headers={**headers, 'If-Match': '2'}).status_code == 200
+        assert client.put(f'/api/movies/{movie_id}', json={'year': 2023},
+                          headers={**headers, 'If-Match': 'W/"3"'}).status_code == 412
+        assert client.put('/api/movies/99999', json={'year': 2023},
+                          headers={**headers, 'If-Match': '"1"'}).status_code == 404
+    
+    def test_conditional_update_sql(self, app, client, auth_token):
+        """Un UPDATE condicional por versión, sin SELECT ... FOR UPDATE"""
+        from sqlalchemy import event
+        response, headers = self._create(client, auth_token)
+        movie_id = response.get_json()['data']['id']
+        
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            client.put(f'/api/movies/{movie_id}', json={'title': 'X'}, headers={**headers, 'If-Match': '"1"'})
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        
+        updates = [s for s in statements if s.startswith('UPDATE movies')]
+        assert len(updates) == 1
+        assert 'movies.version IN' in updates[0]
+        assert not any('FOR UPDATE' in s for s in statements)
+    
+    def test_migrate_adds_version_column(self, app):
+        """flask migrate agrega la columna version a tablas existentes"""
+        from app.cli import add_missing_columns
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('DROP TABLE movies')
+            conn.exec_driver_sql(
+                'CREATE TABLE movies (id INTEGER PRIMARY KEY, title VARCHAR(255) NOT NULL, '
+                'year INTEGER NOT NULL, director VARCHAR(255) NOT NULL, genre VARCHAR(255) NOT NULL, '
+                'poster_url VARCHAR(500), imdb_id VARCHAR(20), user_id INTEGER NOT NULL, '
+                'created_at DATETIME, updated_at DATETIME)'
+            )
+            conn.exec_driver_sql("INSERT INTO movies (title, year, director, genre, user_id) VALUES ('Vieja', 1990, 'D', 'G', 1)")
+        
+        assert add_missing_columns(db.engine, db.metadata) == ['movies.version', 'movies.fanned_out_at']
+        with db.engine.connect() as conn:
+            assert conn.exec_driver_sql('SELECT version FROM movies').scalar() == 1
+        assert add_missing_columns(db.engine, db.metadata) == []
+
+
+# ============= TESTS DE COLECCIONES =============
+
+class TestRankKeys:
+    """Tests de claves de orden fraccionarias"""
+    
+    def test_key_between_keeps_order(self):
+        """Inserciones aleatorias siempre quedan ordenadas"""
+        import random
+        from app.utils.rank import key_between
+        rng = random.Random(0)
+        keys = []
+        for _ in range(2000):
+            index = rng.randint(0, len(keys))
+            before = keys[index - 1] if index > 0 else None
+            after = keys[index] if index < len(keys) else None
+            key = key_between(before, after)
+            assert (before is None or before < key) and (after is None or key < after)
+            keys.insert(index, key)
+        assert keys == sorted(keys)
+        
+        with pytest.raises(ValueError):
+            key_between('b', 'a')
+        with pytest.raises(ValueError):
+            key_between('a0')
+    
+    def test_spread_keys(self):
+        """Claves equidistantes, únicas y con espacio entre vecinas"""
+        from app.utils.rank import key_between, spread_keys
+        keys = spread_keys(1000)
+        assert keys == sorted(keys) and len(set(keys)) == 1000
+        assert max(len(key) for key in keys) <= 3
+        assert len(key_between(keys[0], keys[1])) <= 3
+
+
+class TestCollections:
+    """Tests para /api/collections"""
+    
+    def _setup(self, client, auth_token, movies=3):
+        headers = {'Authorization': f'Bearer {auth_token}'}
+        movie_ids = [
+            client.post('/api/movies/', json={
+                'title': f'Movie {i}', 'year': 2000 + i, 'director': 'D', 'genre': 'Drama'
+            }, headers=headers).get_json()['data']['id']
+            for i in range(movies)
+        ]
+        collection_id = client.post('/api/collections/', json={'name': 'Watch next'},
+                                    headers=headers).get_json()['data']['id']
+        return headers, collection_id, movie_ids
+    
+    def _order(self, client, headers, collection_id):
+        items = client.get(f'/api/collections/{collection_id}/items', headers=headers).get_json()['data']['items']
+        return [item['movie']['title'] for item in items]
+    
+    def test_add_and_move(self, client, auth_token):
+        """Agregar al final, al inicio y mover"""
+        headers, collection_id, movie_ids = self._setup(client, auth_token)
+        url = f'/api/collections/{collection_id}/items'
+        
+        first = client.post(url, json={'movie_id': movie_ids[0]}, headers=headers).get_json()['data']
+        client.post(url, json={'movie_id': movie_ids[1]}, headers=headers)
+        third = client.post(url, json={'movie_id': movie_ids[2], 'after_item_id': None}, headers=headers)
+        assert third.status_code == 201
+        assert self._order(client, headers, collection_id) == ['Movie 2', 'Movie 0', 'Movie 1']
+        
+        # Mover al final y después de otro elemento
+        client.post(f"{url}/{first['id']}/move", json={}, headers=headers)
+        assert self._order(client, headers, collection_id) == ['Movie 2', 'Movie 1', 'Movie 0']
+        third_id = third.get_json()['data']['id']
+        response = client.post(f"{url}/{third_id}/move", json={'after_item_id': first['id']}, headers=headers)
+        assert response.status_code == 200
+        assert self._order(client, headers, collection_id) == ['Movie 1', 'Movie 0', 'Movie 2']
+        
+        collections = client.get('/api/collections/', headers=headers).get_json()['data']
+        assert collections[0]['total_items'] == 3
+    
+    def test_move_updates_one_row(self, app, client, auth_token):
+        """Reordenar escribe una sola fila"""
+        from sqlalchemy import event
+        headers, collection_id, movie_ids = self._setup(client, auth_token)
+        url = f'/api/collections/{collection_id}/items'
+        item_ids = [
+            client.post(url, json={'movie_id': movie_id}, headers=headers).get_json()['data']['id']
+            for movie_id in movie_ids
+        ]
+        
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            client.post(f'{url}/{item_ids[2]}/move', json={'after_item_id': None}, headers=headers)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        
+        writes = [s for s in statements if s.startswith(('UPDATE', 'INSERT', 'DELETE'))]
+        assert len(writes) == 1
+        assert writes[0].startswith('UPDATE collection_items SET rank')
+    
+    def test_pagination(self, client, auth_token):
+        """Paginación por cursor en orden"""
+        headers, collection_id, movie_ids = self._setup(client, auth_token, movies=5)
+        url = f'/api/collections/{collection_id}/items'
+        for movie_id in movie_ids:
+            client.post(url, json={'movie_id': movie_id}, headers=headers)
+        
+        titles, cursor = [], None
+        while True:
+            params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+            data = client.get(url, query_string=params, headers=headers).get_json()['data']
+            titles += [item['movie']['title'] for item in data['items']]
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        assert titles == [f'Movie {i}' for i in range(5)]
+        assert client.get(url, query_string={'cursor': 'xx'}, headers=headers).status_code == 400
+    
+    def test_rebalance_in_background(self, app, client, auth_token):
+        """Claves largas disparan un rebalanceo que conserva el orden"""
+        app.config['COLLECTION_RANK_MAX_LENGTH'] = 3
+        headers, collection_id, movie_ids = self._setup(client, auth_token, movies=30)
+        url = f'/api/collections/{collection_id}/items'
+        
+        # Insertar siempre después del primero alarga las claves
+        first_id = client.post(url, json={'movie_id': movie_ids[0]}, headers=headers).get_json()['data']['id']
+        for movie_id in reversed(movie_ids[1:]):
+            client.post(url, json={'movie_id': movie_id, 'after_item_id': first_id}, headers=headers)
+        
+        items = client.get(url, query_string={'limit': 100}, headers=headers).get_json()['data']['items']
+        assert [item['movie']['title'] for item in items] == [f'Movie {i}' for i in range(30)]
+        assert max(len(item['rank']) for item in items) <= 4
+        assert 'jobs_total{job="rebalance",status="ok"}' in app.extensions['metrics'].render()
+    
+    def test_errors_and_ownership(self, client, auth_token, auth_headers):
+        """Duplicados, películas ajenas y colecciones de otro usuario"""
+        headers, collection_id, movie_ids = self._setup(client, auth_token, movies=1)
+        url = f'/api/collections/{collection_id}/items'
+        
+        assert client.post(url, json={'movie_id': movie_ids[0]}, headers=headers).status_code == 201
+        assert client.post(url, json={'movie_id': movie_ids[0]}, headers=headers).status_code == 409
+        assert client.post(url, json={'movie_id': 99999}, headers=headers).status_code == 404
+        assert client.post(url, json={'movie_id': 'x'}, headers=headers).status_code == 400
+        
+        assert client.get(url, headers=auth_headers('otro')).status_code == 404
+    
+    def test_delete_movie_and_collection(self, client, auth_token):
+        """Borrar la película la quita de la colección"""
+        headers, collection_id, movie_ids = self._setup(client, auth_token, movies=2)
+        url = f'/api/collections/{collection_id}/items'
+        for movie_id in movie_ids:
+            client.post(url, json={'movie_id': movie_id}, headers=headers)
+        
+        client.delete(f'/api/movies/{movie_ids[0]}', headers=headers)
+        assert self._order(client, headers, collection_id) == ['Movie 1']
+        
+        assert client.delete(f'/api/collections/{collection_id}', headers=headers).status_code == 200
+        assert client.get(url, headers=headers).status_code == 404
+    
+    def test_job_runner_background(self, app):
+        """El runner corre en segundo plano y deduplica por clave"""
+        import threading
+        from app.utils.jobs import JobRunner
+        runner = JobRunner(app, sync=False)
+        release, calls = threading.Event(), []
+        
+        def slow_job(value):
+            release.wait(5)
+            calls.append(value)
+        
+        assert runner.submit('k', slow_job, 1)
+        assert not runner.submit('k', slow_job, 2)
+        release.set()
+        runner.join()
+        assert calls == [1]
+        assert runner.submit('k', slow_job, 3)
+        runner.join()
+        runner.stop()
+        assert calls == [1, 3]
+
+
+# ============= TESTS DE PUNTUACIONES E HISTORIAL =============
+
+class TestActivity:
+    """Tests para puntuaciones, visualizaciones y agregados por título"""
+    
+    def _add_matrix(self, client, headers):
+        return client.post('/api/movies/', json={
+            'title': 'The Matrix', 'year': 1999, 'director': 'Wachowski', 'genre': 'Sci-Fi', 'tmdb_id': '603'
+        }, headers=headers).get_json()['data']['id']
+    
+    def _stats(self, client):
+        return client.get('/api/titles/603/stats').get_json()['data']
+    
+    def test_ratings_update_aggregates(self, client, auth_headers):
+        """Promedio e histograma por título entre usuarios"""
+        ana = auth_headers('ana')
+        ana_movie = self._add_matrix(client, ana)
+        luis = auth_headers('luis')
+        luis_movie = self._add_matrix(client, luis)
+        
+        assert client.put(f'/api/movies/{ana_movie}/rating', json={'score': 8}, headers=ana).status_code == 201
+        assert client.put(f'/api/movies/{luis_movie}/rating', json={'score': 6}, headers=luis).status_code == 201
+        stats = self._stats(client)
+        assert stats['rating_count'] == 2
+        assert stats['average_rating'] == 7.0
+        assert stats['histogram']['8'] == 1 and stats['histogram']['6'] == 1
+        
+        # Cambiar la puntuación mueve el histograma sin sumar votos
+        assert client.put(f'/api/movies/{ana_movie}/rating', json={'score': 10}, headers=ana).status_code == 200
+        stats = self._stats(client)
+        assert stats['rating_count'] == 2
+        assert stats['average_rating'] == 8.0
+        assert stats['histogram']['8'] == 0 and stats['histogram']['10'] == 1
+        
+        assert client.delete(f'/api/movies/{luis_movie}/rating', headers=luis).status_code == 200
+        assert client.get(f'/api/movies/{luis_movie}/rating', headers=luis).status_code == 404
+        assert self._stats(client)['average_rating'] == 10.0
+        
+        assert client.put(f'/api/movies/{ana_movie}/rating', json={'score': 11}, headers=ana).status_code == 400
+    
+    def test_watches_history_and_most_watched(self, client, auth_headers):
+        """Historial paginado y títulos más vistos"""
+        ana = auth_headers('ana')
+        movie_id = self._add_matrix(client, ana)
+        url = f'/api/movies/{movie_id}/watches'
+        client.post(url, json={'watched_at': '2024-01-01T20:00:00'}, headers=ana)
+        client.post(url, json={'watched_at': '2024-03-01T21:00:00+01:00'}, headers=ana)
+        last = client.post(url, headers=ana).get_json()['data']
+        
+        data = client.get('/api/history', query_string={'limit': 2}, headers=ana).get_json()['data']
+        assert [w['id'] for w in data['watches']][0] == last['id']
+        older = client.get('/api/history', query_string={'cursor': data['next_cursor']}, headers=ana).get_json()['data']
+        assert [w['watched_at'] for w in older['watches']] == ['2024-01-01T20:00:00']
+        assert older['next_cursor'] is None
+        assert data['watches'][1]['watched_at'] == '2024-03-01T20:00:00'
+        
+        assert self._stats(client)['watch_count'] == 3
+        top = client.get('/api/titles/most-watched').get_json()['data']
+        assert top[0]['tmdb_id'] == '603' and top[0]['watch_count'] == 3
+        
+        assert client.delete(f"{url}/{last['id']}", headers=ana).status_code == 200
+        assert self._stats(client)['watch_count'] == 2
+        assert client.get('/api/history', query_string={'cursor': 'x'}, headers=ana).status_code == 400
+    
+    def test_stats_read_is_single_row(self, app, client, auth_headers):
+        """Leer los agregados de un título es una consulta por clave primaria"""
+        from sqlalchemy import event
+        ana = auth_headers('ana')
+        movie_id = self._add_matrix(client, ana)
+        client.put(f'/api/movies/{movie_id}/rating', json={'score': 9}, headers=ana)
+        
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            self._stats(client)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        
+        assert len(statements) == 1
+        assert 'FROM title_stats' in statements[0] and 'ratings' not in statements[0]
+    
+    def test_delete_movie_and_reconcile(self, app, client, auth_headers):
+        """Borrar la película descuenta su actividad; reconcile corrige desvíos"""
+        from app.models import TitleStats
+        from app.services import ActivityService
+        ana = auth_headers('ana')
+        ana_movie = self._add_matrix(client, ana)
+        luis = auth_headers('luis')
+        luis_movie = self._add_matrix(client, luis)
+        client.put(f'/api/movies/{ana_movie}/rating', json={'score': 4}, headers=ana)
+        client.put(f'/api/movies/{luis_movie}/rating', json={'score': 10}, headers=luis)
+        client.post(f'/api/movies/{ana_movie}/watches', headers=ana)
+        
+        client.delete(f'/api/movies/{ana_movie}', headers=ana)
+        stats = self._stats(client)
+        assert stats['rating_count'] == 1 and stats['watch_count'] == 0
+        assert stats['histogram']['4'] == 0
+        
+        # Desvío manual: reconcile lo reconstruye desde cero
+        db.session.get(TitleStats, '603').rating_sum = 999
+        db.session.add(TitleStats(tmdb_id='999', watch_count=5))
+        db.session.commit()
+        
+        result = app.test_cli_runner().invoke(args=['reconcile-stats'])
+        assert 'Títulos corregidos: 2' in result.output
+        assert self._stats(client)['average_rating'] == 10.0
+        assert client.get('/api/titles/999/stats').status_code == 404
+        
+        # Fila perdida: se recrea con los contadores reales
+        db.session.execute(db.text("DELETE FROM title_stats"))
+        db.session.commit()
+        assert ActivityService.reconcile() == 1
+        stats = self._stats(client)
+        assert stats['rating_count'] == 1 and stats['histogram']['10'] == 1
+    
+    def test_migrate_makes_tmdb_id_unique_per_user(self, app):
+        """flask migrate cambia el UNIQUE (imdb_id) del esquema original por (user_id, imdb_id)"""
+        from sqlalchemy import inspect
+        from sqlalchemy.exc import IntegrityError
+        
+        insert = (
+            "INSERT INTO movies (title, year, director, genre, imdb_id, user_id) "
+            "VALUES ('Matrix', 1999, 'Wachowski', 'Sci-Fi', '603', {})"
+        )
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('DROP TABLE movies')
+            conn.exec_driver_sql(
+                'CREATE TABLE movies (id INTEGER NOT NULL, title VARCHAR(255) NOT NULL, '
+                'year INTEGER NOT NULL, director VARCHAR(255) NOT NULL, genre VARCHAR(255) NOT NULL, '
+                'poster_url VARCHAR(500), imdb_id VARCHAR(20), user_id INTEGER NOT NULL, '
+                'created_at DATETIME, updated_at DATETIME, PRIMARY KEY (id), UNIQUE (imdb_id), '
+                'FOREIGN KEY(user_id) REFERENCES users (id))'
+            )
+            conn.exec_driver_sql('CREATE INDEX ix_movies_title ON movies (title)')
+            conn.exec_driver_sql(insert.format(1))
+        
+        runner = app.test_cli_runner()
+        output = runner.invoke(args=['migrate']).output
+        assert 'Restricción actualizada: movies: -UNIQUE (imdb_id)' in output
+        assert 'Restricción actualizada: movies: +UNIQUE (imdb_id, user_id)' in output
+        
+        # Otro usuario puede tener el mismo título; el mismo usuario no
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql(insert.format(2))
+        with pytest.raises(IntegrityError):
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql(insert.format(1))
+        
+        with db.engine.connect() as conn:
+            assert conn.exec_driver_sql('SELECT title, version FROM movies WHERE id = 1').one() == ('Matrix', 1)
+        indexes = {index['name'] for index in inspect(db.engine).get_indexes('movies')}
+        assert {'ix_movies_title', 'ix_movies_user_created', 'ix_movies_imdb_id'} <= indexes
+        assert 'Restricción' not in runner.invoke(args=['migrate']).output
+
+
+# ============= TESTS DE FEED =============
+
+class TestFeed:
+    """Tests para seguimientos y feed (fan-out on write y lectura de autores populares)"""
+    
+    def _user_id(self, client, headers):
+        return client.get('/api/auth/me', headers=headers).get_json()['data']['id']
+    
+    def _add_movie(self, client, headers, title):
+        return client.post('/api/movies/', json={
+            'title': title, 'year': 2000, 'director': 'Director', 'genre': 'Drama'
+        }, headers=headers).get_json()['data']['id']
+    
+    def _feed(self, client, headers, **params):
+        return client.get('/api/feed', query_string=params, headers=headers).get_json()['data']
+    
+    def test_follow_fan_out_and_pagination(self, client, auth_headers):
+        """Las películas nuevas llegan al feed de los seguidores, más reciente primero"""
+        ana = auth_headers('ana')
+        ana_id = self._user_id(client, ana)
+        luis = auth_headers('luis')
+        luis_id = self._user_id(client, luis)
+        old = self._add_movie(client, ana, 'Anterior')
+        
+        assert client.post(f'/api/users/{ana_id}/follow', headers=luis).status_code == 201
+        assert client.post(f'/api/users/{ana_id}/follow', headers=luis).status_code == 200
+        assert client.post(f'/api/users/{luis_id}/follow', headers=luis).status_code == 400
+        assert client.post('/api/users/999/follow', headers=luis).status_code == 404
+        
+        # Al seguir se copian las películas recientes
+        assert [m['id'] for m in self._feed(client, luis)['movies']] == [old]
+        
+        new = [self._add_movie(client, ana, f'Nueva {i}') for i in range(3)]
+        page = self._feed(client, luis, limit=2)
+        assert [m['id'] for m in page['movies']] == [new[2], new[1]]
+        assert page['movies'][0]['added_by'] == 'ana'
+        rest = self._feed(client, luis, cursor=page['next_cursor'])
+        assert [m['id'] for m in rest['movies']] == [new[0], old]
+        assert rest['next_cursor'] is None
+        
+        # El autor no ve sus propias películas en su feed
+        assert self._feed(client, ana)['movies'] == []
+        assert client.get('/api/feed', query_string={'cursor': 'x'}, headers=luis).status_code == 400
+        
+        client.delete(f'/api/movies/{new[2]}', headers=ana)
+        assert new[2] not in [m['id'] for m in self._feed(client, luis)['movies']]
+        
+        assert client.delete(f'/api/users/{ana_id}/follow', headers=luis).status_code == 200
+        assert client.delete(f'/api/users/{ana_id}/follow', headers=luis).status_code == 404
+        assert self._feed(client, luis)['movies'] == []
+    
+    def test_popular_authors_are_read_on_demand(self, app, client, auth_headers):
+        """Sobre el umbral no se copian filas: el feed las lee y las mezcla por fecha"""
+        from app.models import TimelineEntry
+        
+        app.config['FEED_CELEBRITY_THRESHOLD'] = 2
+        star = auth_headers('star')
+        star_id = self._user_id(client, star)
+        friend = auth_headers('friend')
+        friend_id = self._user_id(client, friend)
+        fan = auth_headers('fan')
+        other = auth_headers('other')
+        client.post(f'/api/users/{star_id}/follow', headers=fan)
+        client.post(f'/api/users/{star_id}/follow', headers=other)
+        client.post(f'/api/users/{friend_id}/follow', headers=fan)
+        
+        first = self._add_movie(client, star, 'Estreno')
+        second = self._add_movie(client, friend, 'Casera')
+        third = self._add_movie(client, star, 'Secuela')
+        
+        assert TimelineEntry.query.filter_by(actor_id=star_id).count() == 0
+        assert TimelineEntry.query.filter_by(movie_id=second).count() == 1
+        
+        page = self._feed(client, fan, limit=2)
+        assert [m['id'] for m in page['movies']] == [third, second]
+        rest = self._feed(client, fan, limit=2, cursor=page['next_cursor'])
+        assert [m['id'] for m in rest['movies']] == [first]
+        assert rest['next_cursor'] is None
+    
+    def test_repair_replays_lost_jobs(self, app, client, auth_headers, monkeypatch):
+        """Un fan-out o backfill que no llegó a ejecutarse se repite con repair-feed"""
+        ana = auth_headers('ana')
+        ana_id = self._user_id(client, ana)
+        luis = auth_headers('luis')
+        old = self._add_movie(client, ana, 'Anterior')
+        assert db.session.get(Movie, old).fanned_out_at is not None
+        
+        # Cola llena o proceso reiniciado: las tareas se pierden
+        monkeypatch.setattr(app.extensions['jobs'], 'submit', lambda *args, **kwargs: False)
+        client.post(f'/api/users/{ana_id}/follow', headers=luis)
+        new = self._add_movie(client, ana, 'Nueva')
+        assert self._feed(client, luis)['movies'] == []
+        monkeypatch.undo()
+        
+        # Dentro del margen aún pueden estar en la cola: no se tocan
+        runner = app.test_cli_runner()
+        assert 'Fan-outs repetidos: 0, backfills repetidos: 0' in runner.invoke(args=['repair-feed']).output
+        
+        app.config['FEED_REPAIR_GRACE'] = 0
+        assert 'Fan-outs repetidos: 1, backfills repetidos: 1' in runner.invoke(args=['repair-feed']).output
+        assert [m['id'] for m in self._feed(client, luis)['movies']] == [new, old]
+        assert 'Fan-outs repetidos: 0, backfills repetidos: 0' in runner.invoke(args=['repair-feed']).output
+
+
+# ============= TESTS DE CONTROL DE ADMISIÓN =============
+
+class TestAdmission:
+    """Tests para el control de admisión con límites adaptativos por clase de ruta"""
+    
+    def _limiter(self, **overrides):
+        from app.utils.admission import AdaptiveLimiter
+        
+        options = {'limit': 4, 'min_limit': 1, 'max_limit': 8, 'target_latency': 0.1,
+                   'max_queue': 0, 'queue_timeout': 0.01}
+        options.update(overrides)
+        return AdaptiveLimiter(**options)
+    
+    def test_aimd_adjusts_limit(self):
+        """Crece de a poco con el límite en uso y cae rápido con latencia alta"""
+        limiter = self._limiter()
+        for _ in range(4):
+            assert limiter.acquire()
+        assert not limiter.acquire()
+        
+        for _ in range(4):
+            limiter.release(0.01)
+        assert 4 < limiter.limit < 5
+        
+        limiter.acquire()
+        limiter.release(0.5)
+        assert limiter.limit < 4
+        # Una sola disminución por intervalo de latencia objetivo
+        limiter.acquire()
+        limiter.release(0.5)
+        assert limiter.snapshot()['limit'] == 3
+        assert limiter.snapshot()['rejected'] == 1
+    
+    def test_queued_request_waits_for_slot(self):
+        """Con cola, un request espera a que se libere un hueco antes del plazo"""
+        import threading
+        
+        limiter = self._limiter(limit=1, max_queue=1, queue_timeout=2)
+        assert limiter.acquire()
+        threading.Timer(0.05, limiter.release, args=(0.01,)).start()
+        assert limiter.acquire()
+        
+        # La cola está llena: se rechaza sin esperar
+        limiter = self._limiter(limit=1, max_queue=0, queue_timeout=2)
+        limiter.acquire()
+        assert not limiter.acquire()
+    
+    @pytest.fixture
+    def app_config(self, user_data):
+        return {
+            'ADMISSION_QUEUE_SIZE': 0,
+            'ADMISSION_MIN_LIMIT': 1,
+            'ADMISSION_CLASSES': {
+                'default': {'limit': 1, 'max_limit': 1, 'target_latency': 1},
+                'auth': {'limit': 1, 'max_limit': 1, 'target_latency': 1},
+                'tmdb': {'limit': 1, 'max_limit': 1, 'target_latency': 1}
+            },
+            'ADMIN_EMAILS': [user_data['email']]
+        }
+    
+    def test_saturated_class_sheds_load(self, app, client, auth_headers):
+        """Una clase sin huecos responde 503 rápido sin afectar a las demás"""
+        headers = auth_headers()
+        
+        # Cada request libera su hueco al terminar
+        assert client.get('/api/movies/', headers=headers).status_code == 200
+        assert client.get('/api/movies/', headers=headers).status_code == 200
+        
+        tmdb = app.extensions['admission']['tmdb']
+        assert tmdb.acquire()
+        response = client.get('/api/movies/search', query_string={'title': 'matrix'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        assert response.get_json()['success'] is False
+        
+        # Lecturas baratas y endpoints internos siguen respondiendo
+        assert client.get('/api/movies/', headers=headers).status_code == 200
+        app.extensions['admission']['default'].acquire()
+        stats = client.get('/api/internal/admission', headers=headers).get_json()['data']
+        assert stats['tmdb']['in_flight'] == 1
+        assert stats['tmdb']['rejected'] == 1
+        assert client.get('/metrics').status_code == 200
+    
+    def test_health_check_exempt(self, app, client):
+        """El health check (registrado en run.py) responde aunque todo esté saturado"""
+        app.add_url_rule('/api/health', 'health_check', lambda: {'status': 'ok'})
+        for limiter in app.extensions['admission'].values():
+            limiter.acquire()
+        
+        assert client.get('/api/movies/').status_code == 503
+        assert client.get('/api/health').status_code == 200
+
+
+# ============= TESTS DE IDEMPOTENCIA =============
+
+class TestIdempotency:
+    """Tests para el header Idempotency-Key en POST /api/movies/ y /api/auth/register"""
+    
+    MOVIE = {'title': 'Alien', 'year': 1979, 'director': 'Ridley Scott', 'genre': 'Sci-Fi'}
+    
+    @pytest.fixture
+    def app_config(self, tmp_path):
+        # Un archivo: los requests en paralelo usan conexiones distintas
+        return {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "idem.db"}'}
+    
+    def _count_creates(self, monkeypatch):
+        from app.services import MovieService
+        
+        calls = []
+        original = MovieService.create_movie
+        
+        def counting(*args, **kwargs):
+            calls.append(kwargs)
+            return original(*args, **kwargs)
+        
+        monkeypatch.setattr(MovieService, 'create_movie', staticmethod(counting))
+        return calls
+    
+    def test_retry_replays_stored_response(self, client, auth_token, monkeypatch):
+        """El reintento recibe la misma respuesta sin volver a crear la película"""
+        calls = self._count_creates(monkeypatch)
+        headers = {'Authorization': f'Bearer {auth_token}', 'Idempotency-Key': 'abc-123'}
+        
+        first = client.post('/api/movies/', json=self.MOVIE, headers=headers)
+        retry = client.post('/api/movies/', json=self.MOVIE, headers=headers)
+        assert first.status_code == retry.status_code == 201
+        assert retry.get_json() == first.get_json()
+        assert retry.headers['ETag'] == first.headers['ETag']
+        assert retry.headers['Idempotent-Replayed'] == 'true'
+        assert 'Idempotent-Replayed' not in first.headers
+        assert len(calls) == 1
+        
+        # Otra clave u otro cuerpo con la misma clave
+        other = client.post('/api/movies/', json=self.MOVIE, headers={**headers, 'Idempotency-Key': 'def'})
+        assert other.status_code == 201 and len(calls) == 2
+        changed = client.post('/api/movies/', json={**self.MOVIE, 'year': 1986}, headers=headers)
+        assert changed.status_code == 422
+        assert client.post('/api/movies/', json=self.MOVIE, headers={
+            **headers, 'Idempotency-Key': 'x' * 256
+        }).status_code == 400
+    
+    def test_keys_are_scoped_per_user(self, client, auth_headers):
+        """La misma clave de otro usuario no reproduce la respuesta ajena"""
+        mine = client.post('/api/movies/', json=self.MOVIE, headers={
+            **auth_headers(), 'Idempotency-Key': 'same'
+        })
+        theirs = client.post('/api/movies/', json=self.MOVIE, headers={
+            **auth_headers('otro'), 'Idempotency-Key': 'same'
+        })
+        assert theirs.status_code == 201
+        assert 'Idempotent-Replayed' not in theirs.headers
+        assert theirs.get_json()['data']['id'] != mine.get_json()['data']['id']
+    
+    def test_register_retry(self, client, user_data):
+        """Un registro reintentado no responde 'usuario ya existe'"""
+        headers = {'Idempotency-Key': 'register-1'}
+        first = client.post('/api/auth/register', json=user_data, headers=headers)
+        retry = client.post('/api/auth/register', json=user_data, headers=headers)
+        assert first.status_code == retry.status_code == 201
+        assert retry.headers['Idempotent-Replayed'] == 'true'
+        assert retry.get_json() == first.get_json()
+    
+    def test_server_errors_are_not_stored(self, client, auth_token, monkeypatch):
+        """Tras un 5xx la clave se libera y el reintento se ejecuta"""
+        from app.services import MovieService
+        
+        original = MovieService.create_movie
+        monkeypatch.setattr(MovieService, 'create_movie', staticmethod(
+            lambda *args, **kwargs: (_ for _ in ()).throw(RuntimeError('caída'))
+        ))
+        headers = {'Authorization': f'Bearer {auth_token}', 'Idempotency-Key': 'flaky'}
+        assert client.post('/api/movies/', json=self.MOVIE, headers=headers).status_code == 500
+        
+        monkeypatch.setattr(MovieService, 'create_movie', staticmethod(original))
+        retry = client.post('/api/movies/', json=self.MOVIE, headers=headers)
+        assert retry.status_code == 201
+        assert 'Idempotent-Replayed' not in retry.headers
+    
+    def test_in_flight_duplicate_times_out(self, app, client, auth_token):
+        """Si el primero no termina a tiempo el duplicado responde 409"""
+        import json
+        from datetime import datetime, timedelta
+        from app.models import IdempotencyKey
+        from app.services import IdempotencyService
+        
+        app.config['IDEMPOTENCY_WAIT_TIMEOUT'] = 0.1
+        body = json.dumps(self.MOVIE).encode()
+        db.session.add(IdempotencyKey(
+            scope='user:1', key='slow',
+            fingerprint=IdempotencyService.fingerprint('POST', '/api/movies/', body),
+            expires_at=datetime.utcnow() + timedelta(hours=1)
+        ))
+        db.session.commit()
+        
+        response = client.post('/api/movies/', data=body, content_type='application/json', headers={
+            'Authorization': f'Bearer {auth_token}', 'Idempotency-Key': 'slow'
+        })
+        assert response.status_code == 409
+        assert response.headers['Retry-After'] == '1'
+    
+    def test_orphaned_key_taken_over(self, app, client, auth_token):
+        """Con la reserva vencida un reintento retoma la clave y el dueño anterior no la pisa"""
+        import json
+        from datetime import datetime, timedelta
+        from app.models import IdempotencyKey
+        from app.services import IdempotencyService
+        
+        body = json.dumps(self.MOVIE).encode()
+        stale_lease = datetime.utcnow() - timedelta(seconds=1)
+        orphan = IdempotencyKey(
+            scope='user:1', key='orphan',
+            fingerprint=IdempotencyService.fingerprint('POST', '/api/movies/', body),
+            locked_until=stale_lease,
+            expires_at=datetime.utcnow() + timedelta(hours=1)
+        )
+        db.session.add(orphan)
+        db.session.commit()
+        orphan_id = orphan.id
+        
+        headers = {'Authorization': f'Bearer {auth_token}', 'Idempotency-Key': 'orphan'}
+        response = client.post('/api/movies/', data=body, content_type='application/json', headers=headers)
+        assert response.status_code == 201
+        assert 'Idempotent-Replayed' not in response.headers
+        
+        # El worker original (reserva vencida) ya no puede liberar la clave
+        IdempotencyService.release(orphan_id, stale_lease)
+        retry = client.post('/api/movies/', data=body, content_type='application/json', headers=headers)
+        assert retry.headers['Idempotent-Replayed'] == 'true'
+        assert retry.get_json() == response.get_json()
+        assert IdempotencyKey.query.filter_by(key='orphan').one().id == orphan_id
+    
+    def test_concurrent_duplicates_wait_for_first(self, app, auth_headers, monkeypatch):
+        """Duplicados simultáneos esperan al primero y reciben su respuesta"""
+        import threading
+        import time
+        from app.services import MovieService
+        
+        auth = auth_headers()
+        calls = []
+        original = MovieService.create_movie
+        
+        def slow_create(*args, **kwargs):
+            calls.append(kwargs)
+            time.sleep(0.3)
+            return original(*args, **kwargs)
+        
+        monkeypatch.setattr(MovieService, 'create_movie', staticmethod(slow_create))
+        headers = {**auth, 'Idempotency-Key': 'double-tap'}
+        responses = []
+        
+        def post():
+            responses.append(app.test_client().post('/api/movies/', json=self.MOVIE, headers=headers))
+        
+        threads = [threading.Thread(target=post) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert len(calls) == 1
+        assert [r.status_code for r in responses] == [201, 201, 201]
+        assert len({r.get_json()['data']['id'] for r in responses}) == 1
+        assert sum('Idempotent-Replayed' in r.headers for r in responses) == 2
+    
+    def test_expired_keys_purged(self, app, client, auth_token):
+        """Las claves expiradas se vuelven a ejecutar y se purgan en lotes"""
+        from datetime import datetime, timedelta
+        from app.models import IdempotencyKey
+        
+        headers = {'Authorization': f'Bearer {auth_token}', 'Idempotency-Key': 'old'}
+        first = client.post('/api/movies/', json=self.MOVIE, headers=headers)
+        IdempotencyKey.query.update({'expires_at': datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+        
+        again = client.post('/api/movies/', json=self.MOVIE, headers=headers)
+        assert again.status_code == 201
+        assert again.get_json()['data']['id'] != first.get_json()['data']['id']
+        
+        app.config['IDEMPOTENCY_PURGE_BATCH'] = 2
+        for index in range(5):
+            db.session.add(IdempotencyKey(
+                scope='anon', key=f'k{index}', fingerprint='x',
+                expires_at=datetime.utcnow() - timedelta(minutes=1)
+            ))
+        db.session.commit()
+        
+        result = app.test_cli_runner().invoke(args=['purge-idempotency-keys'])
+        assert 'Claves eliminadas: 5' in result.output
+        assert IdempotencyKey.query.count() == 1
+        
+        # La purga programada corre al pasar el intervalo
+        db.session.add(IdempotencyKey(
+            scope='anon', key='stale', fingerprint='x',
+            expires_at=datetime.utcnow() - timedelta(minutes=1)
+        ))
+        db.session.commit()
+        app.extensions['idempotency'].interval = 0
+        client.post('/api/movies/', json=self.MOVIE, headers={**headers, 'Idempotency-Key': 'new'})
+        assert IdempotencyKey.query.filter_by(key='stale').count() == 0
+    
+    def test_migrate_adds_lock_column(self, app):
+        """flask migrate agrega locked_until (nullable) a una tabla existente"""
+        from app.cli import add_missing_columns
+        from app.models import IdempotencyKey
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('DROP TABLE idempotency_keys')
+            conn.exec_driver_sql(
+                'CREATE TABLE idempotency_keys (id INTEGER PRIMARY KEY, scope VARCHAR(64) NOT NULL, '
+                'key VARCHAR(255) NOT NULL, fingerprint VARCHAR(64) NOT NULL, status_code INTEGER, '
+                'response_body TEXT, response_headers TEXT, created_at DATETIME, expires_at DATETIME NOT NULL)'
+            )
+        
+        assert add_missing_columns(db.engine, db.metadata) == ['idempotency_keys.locked_until']
+        assert IdempotencyKey.query.count() == 0